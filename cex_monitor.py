@@ -9,11 +9,18 @@ CEX 每日情报监控系统
 import os
 import json
 import subprocess
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional, Set
 from dataclasses import dataclass, asdict, field
 
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from fingerprints import FingerprintIndex
+from records import fingerprint
+from schema import CATEGORY_ALIASES, normalize, normalize_alert
+from store import DayStore
+
 
 @dataclass
 class IntelItem:
@@ -43,12 +50,15 @@ class CEXMonitor:
     
     TARGET_EXCHANGES = ["Binance", "OKX", "Coinbase", "Bybit", "Bitget", "Kraken", "KuCoin", "Gate.io", "MEXC"]
     DATA_DIR = Path("/Users/neo/.openclaw/workspace-cex-intelligence/data/intelligence")
+    # 新增判断的回溯天数（None 表示全部历史）
+    LOOKBACK_DAYS = 30
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, lookback_days: Optional[int] = LOOKBACK_DAYS):
         self.api_key = api_key or os.getenv("XAI_API_KEY")
         self.model = "grok-4-1-fast-reasoning"
         self.today = datetime.now().strftime("%Y-%m-%d")
         self.yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        self.lookback_days = lookback_days
         
     def _call_grok(self, prompt: str, tools: List[Dict]) -> Dict:
         """调用 Grok API"""
@@ -234,11 +244,9 @@ Return [] if nothing found."""
     
     def save_intel(self, intel: DailyIntel):
         """保存情报到本地"""
-        self.DATA_DIR.mkdir(parents=True, exist_ok=True)
-        
-        filepath = self.DATA_DIR / f"{intel.date}.json"
+        store = DayStore(self.DATA_DIR)
         
-        # 转换为可序列化格式
+        # 转换为规范日报格式
         data = {
             "date": intel.date,
             "collected_at": intel.collected_at,
@@ -246,39 +254,56 @@ Return [] if nothing found."""
             "items": [asdict(item) for item in intel.items],
             "summary": intel.summary
         }
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 合并进当天已有的情报，同一天多次采集不会互相覆盖
+        store.upsert(normalize(data, date=intel.date), source="cex_monitor")
+        filepath = store.path(intel.date)
         
         print(f"💾 已保存: {filepath}")
         return filepath
     
     def load_intel(self, date: str) -> Optional[DailyIntel]:
         """加载指定日期的情报"""
-        filepath = self.DATA_DIR / f"{date}.json"
-        
-        if not filepath.exists():
+        day = DayStore(self.DATA_DIR).read(date)
+        if day is None:
             return None
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        items = [IntelItem(**item) for item in data.get("items", [])]
+        # 规范警报 → IntelItem（IntelItem 的原分类保存在 subcategory 中）
+        items = [
+            IntelItem(
+                source=a.source,
+                exchange=a.exchange,
+                title=a.title,
+                content=a.description,
+                url=a.url,
+                timestamp=a.discovered_at,
+                severity=a.severity or "low",
+                category=a.subcategory if a.subcategory in CATEGORY_ALIASES else ""
+            )
+            for a in day["alerts"]
+        ]
         
         return DailyIntel(
-            date=data["date"],
-            collected_at=data["collected_at"],
-            exchanges=data["exchanges"],
+            date=day["date"],
+            collected_at=day["collected_at"],
+            exchanges=[e["exchange"] for e in day["exchanges"]],
             items=items,
-            summary=data.get("summary", "")
+            summary=day["briefing"]
         )
     
+    def _as_alert(self, item: IntelItem):
+        return normalize_alert(asdict(item), self.today)
+    
     def compare_with_yesterday(self, today_intel: DailyIntel) -> Dict:
-        """与昨日数据比对，找出新增内容"""
-        yesterday_intel = self.load_intel(self.yesterday)
-        
-        if not yesterday_intel:
-            print(f"⚠️ 未找到昨日数据 ({self.yesterday})，全部视为新增")
+        """与历史数据比对，找出新增内容
+
+        新增：回溯窗口（lookback_days 天，None 为全部历史）内从未出现过的警报，由持久化指纹索引判断；
+        可能已解决：昨日有、今日无
+        """
+        index = FingerprintIndex(DayStore(self.DATA_DIR))
+        index.refresh()
+        
+        if not index.has_history(self.today):
+            print(f"⚠️ 未找到历史数据，全部视为新增")
             return {
                 "new_items": today_intel.items,
                 "resolved_items": [],
@@ -286,30 +311,14 @@ Return [] if nothing found."""
                 "is_first_run": True
             }
         
-        # 获取昨日内容指纹（标题+内容前50字符）
-        yesterday_fingerprints = set()
-        for item in yesterday_intel.items:
-            fp = f"{item.exchange}:{item.title}:{item.content[:50]}"
-            yesterday_fingerprints.add(fp)
-        
-        # 找出新增
-        new_items = []
-        for item in today_intel.items:
-            fp = f"{item.exchange}:{item.title}:{item.content[:50]}"
-            if fp not in yesterday_fingerprints:
-                new_items.append(item)
+        new_items = [item for item in today_intel.items
+                     if index.is_new(self._as_alert(item), self.today, self.lookback_days)]
         
         # 找出可能已解决的（昨日有，今日无）
-        today_fingerprints = set()
-        for item in today_intel.items:
-            fp = f"{item.exchange}:{item.title}:{item.content[:50]}"
-            today_fingerprints.add(fp)
-        
-        resolved_items = []
-        for item in yesterday_intel.items:
-            fp = f"{item.exchange}:{item.title}:{item.content[:50]}"
-            if fp not in today_fingerprints:
-                resolved_items.append(item)
+        yesterday_intel = self.load_intel(self.yesterday)
+        today_fingerprints = {fingerprint(self._as_alert(item)) for item in today_intel.items}
+        resolved_items = [item for item in (yesterday_intel.items if yesterday_intel else [])
+                          if fingerprint(self._as_alert(item)) not in today_fingerprints]
         
         return {
             "new_items": new_items,
@@ -391,7 +400,7 @@ Return [] if nothing found."""
         # 2. 保存到本地
         self.save_intel(today_intel)
         
-        # 3. 与昨日比对
+        # 3. 与历史比对
         comparison = self.compare_with_yesterday(today_intel)
         print(f"\n📊 比对结果: 新增 {len(comparison['new_items'])} 条")
         
@@ -410,10 +419,12 @@ def main():
     parser.add_argument("--collect-only", action="store_true", help="仅采集数据")
     parser.add_argument("--history", action="store_true", help="查看历史数据")
     parser.add_argument("--date", help="查看指定日期数据 (YYYY-MM-DD)")
+    parser.add_argument("--lookback", type=int, default=CEXMonitor.LOOKBACK_DAYS,
+                        help=f"新增判断的回溯天数，0 表示全部历史 (默认 {CEXMonitor.LOOKBACK_DAYS})")
     
     args = parser.parse_args()
     
-    monitor = CEXMonitor()
+    monitor = CEXMonitor(lookback_days=args.lookback or None)
     
     if args.run:
         briefing = monitor.run()
@@ -424,10 +435,10 @@ def main():
     elif args.history:
         # 列出最近7天的数据
         print("📚 最近7天数据:")
+        store = DayStore(monitor.DATA_DIR)
         for i in range(7):
             date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-            filepath = monitor.DATA_DIR / f"{date}.json"
-            status = "✅" if filepath.exists() else "❌"
+            status = "✅" if store.path(date) else "❌"
             print(f"   {status} {date}")
     elif args.date:
         intel = monitor.load_intel(args.date)
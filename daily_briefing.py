@@ -8,9 +8,16 @@ CEX 每日简报生成器 - 中文版（分批采集版）
 import os
 import json
 import subprocess
+import sys
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from anomalies import describe, detect_day, strongest
+from incidents import collapse
+from schema import normalize
+from store import DayStore
+
 def call_grok(prompt: str, tools: list, timeout: int = 120) -> dict:
     """调用 Grok API"""
     api_key = os.getenv("XAI_API_KEY")
@@ -214,55 +221,57 @@ def generate_summary(alerts: list) -> str:
 
 def save_intel(data: dict):
     """保存情报到文件"""
-    # 项目目录
-    data_dir = Path("/Users/neo/.openclaw/workspace-cex-intelligence/data/intelligence")
-    data_dir.mkdir(parents=True, exist_ok=True)
-    
-    # web 目录（用于部署）
+    # web 目录（用于部署）：日报写入对象存储，只存一份
     web_data_dir = Path("/Users/neo/.openclaw/workspace-cex-intelligence/web/data/intelligence")
-    web_data_dir.mkdir(parents=True, exist_ok=True)
+    store = DayStore(web_data_dir)
     
     date = data['date']
+    # 转换为规范日报格式
+    day = normalize(data, date=date)
     
-    # 保存到两个位置
-    for dir_path in [data_dir, web_data_dir]:
-        filepath = dir_path / f"{date}.json"
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"💾 已保存: {filepath}")
+    # 合并进当天的日报（按警报指纹去重，记录每次采集），写入对象并更新 refs.json
+    day = store.upsert(day, source="daily_briefing")
+    filepath = store.path(date)
+    print(f"💾 已保存: {filepath}")
     
     # 同时保存为最新简报
     briefing_file = Path("/Users/neo/.openclaw/workspace-cex-intelligence/data/last_briefing.txt")
     with open(briefing_file, 'w', encoding='utf-8') as f:
-        f.write(format_discord_message(data))
+        f.write(format_discord_message(day, strongest(detect_day(store, date))))
     
     return filepath
 
-def format_discord_message(data: dict) -> str:
-    """格式化为 Discord 消息"""
-    lines = [f"## 🎯 CEX 情报每日简报\n📅 {data['date']}\n"]
+def format_discord_message(day: dict, anomalies: list = ()) -> str:
+    """格式化为 Discord 消息（输入为规范日报，anomalies 为 anomalies.detect 的结果）"""
+    lines = [f"## 🎯 CEX 情报每日简报\n📅 {day['date']}\n"]
     
-    alerts = data.get("alerts", [])
-    critical = [a for a in alerts if a.get("severity") == "critical"]
-    high = [a for a in alerts if a.get("severity") == "high"]
+    # 同一事件的多条报道只列一次
+    alerts = collapse(day["alerts"])
+    critical = [a for a in alerts if a.severity == "critical"]
+    high = [a for a in alerts if a.severity == "high"]
     
     if critical:
         lines.append("🚨 **严重警报**")
         for a in critical[:2]:
-            lines.append(f"🔴 **{a['exchange']}**: {a['title']}")
+            lines.append(f"🔴 **{a.exchange}**: {a.title}")
     
     if high:
         lines.append("\n⚠️ **高风险事件**")
         for a in high[:3]:
-            lines.append(f"🟠 **{a['exchange']}**: {a['title']}")
+            lines.append(f"🟠 **{a.exchange}**: {a.title}")
+    
+    if anomalies:
+        lines.append("\n📈 **异常波动**")
+        for anomaly in anomalies[:3]:
+            lines.append(f"📈 **{anomaly.exchange}**: {describe(anomaly)}")
     
     lines.append("\n📊 **交易所状态概览**")
-    for ex, info in list(data.get("exchange_status", {}).items())[:5]:
-        emoji = {"normal": "🟢", "warning": "🟡", "critical": "🔴"}.get(info.get("status"), "⚪")
+    for info in day["exchanges"][:5]:
+        emoji = {"none": "🟢", "low": "🟢", "medium": "🟡", "high": "🟠", "critical": "🔴"}.get(info["alert_level"], "⚪")
         notes = info.get("notes", "")[:30]
-        lines.append(f"{emoji} **{ex}**: {notes if notes else '正常'}")
+        lines.append(f"{emoji} **{info['exchange']}**: {notes if notes else '正常'}")
     
-    lines.append(f"\n💡 **摘要**: {data.get('summary', '')[:100]}...")
+    lines.append(f"\n💡 **摘要**: {day['briefing'][:100]}...")
     lines.append("\n—")
     lines.append("🔗 查看详情: https://cex-intelligence-production.up.railway.app")
     
@@ -6,6 +6,7 @@
 
 import json
 import shutil
+import sys
 from datetime import datetime
 from pathlib import Path
 
@@ -324,10 +325,16 @@ briefing_text = f"""🎯 CEX 每日简报 - {datetime.now().strftime('%Y-%m-%d')
 with open('site/briefing.txt', 'w', encoding='utf-8') as f:
     f.write(briefing_text)
 
+# 增量导出完整网站（Dashboard/警报/交易所/日期页 + JSON API），只重建输入变化的页面
+sys.path.insert(0, str(Path(__file__).parent / 'web'))
+from static_export import export_site
+export_site(Path('site'))
+
 print('✅ 网站文件已生成:')
 print(f'  - site/index.html (包含今日简报)')
 print(f'  - site/data.json (原始数据)')
 print(f'  - site/briefing.txt (Discord简报)')
+print(f'  - site/dashboard, alerts, exchange/*, date/*, api/* (完整网站)')
 print(f'\n📊 简报摘要:')
 print(f'  • 交易所: {total_exchanges} 个')
 print(f'  • 警报: {len(alerted_exchanges)} 个')
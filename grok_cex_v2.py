@@ -7,11 +7,15 @@ Grok CEX 情报采集器 v2.1
 import os
 import json
 import subprocess
+import sys
 from datetime import datetime
 from typing import List, Dict, Optional
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from incidents import IncidentClusterer, alert_text
+
 
 @dataclass
 class IntelligenceAlert:
@@ -246,12 +250,17 @@ Return as JSON array with fields: category, subcategory, severity, title, descri
         # 检查 FinTelegram
         print("\n🔍 检查 FinTelegram 曝光...")
         ft_alerts = self.check_fintelegram()
-        # 去重：避免与已采集的重复
-        existing_exchanges = {a.exchange for a in all_alerts}
+        # 去重：只丢弃与已采集内容近似重复的报道（同一交易所的其他 FinTelegram 报道保留）
+        clusterer = IncidentClusterer()
+        for i, alert in enumerate(all_alerts):
+            clusterer.add(alert.exchange, alert_text(alert), i)
+        added = 0
         for alert in ft_alerts:
-            if alert.exchange not in existing_exchanges:
+            if clusterer.match(alert.exchange, alert_text(alert)) is None:
+                clusterer.add(alert.exchange, alert_text(alert), len(all_alerts))
                 all_alerts.append(alert)
-        print(f"   ✅ FinTelegram 新增 {len([a for a in ft_alerts if a.exchange not in existing_exchanges])} 条")
+                added += 1
+        print(f"   ✅ FinTelegram 新增 {added} 条")
         
         # 按分类统计
         categories = {
@@ -1,79 +1,63 @@
 #!/usr/bin/env python3
 """
-数据迁移脚本 - 为历史数据添加 category 字段
+数据迁移脚本 - 为历史数据补全分类（大类 / 子类别）
+迁移登记在 web/migrations.py，按编号增量执行：清单 migrations.manifest 记录每一天已应用的迁移，
+只处理内容变化或尚未应用最新迁移的日期；多进程并行，结果原子发布，可在 web 服务运行时执行。
+尚未收入对象存储的旧 <日期>.json 一并转换为规范日报并收入存储（web/store.py）。
+
+用法:
+    python migrate_categories.py                  # 迁移 web/data/intelligence 到最新编号
+    python migrate_categories.py --dir DIR        # 迁移指定目录（可重复指定）
+    python migrate_categories.py --jobs 8         # 工作进程数（默认 CPU 核数）
+    python migrate_categories.py --to 1           # 只迁移到指定编号
+    python migrate_categories.py --dry-run        # 只统计，不写入
+    python migrate_categories.py --list           # 列出已登记的迁移
 """
 
-import json
+import argparse
+import sys
+import time
 from pathlib import Path
 
-# 关键词映射
-category_keywords = {
-    'security_attack': [
-        'hack', 'hacked', 'breach', 'exploit', 'stolen', 'drain', 'theft',
-        'ddos', 'ransomware', 'malware', 'phishing',
-        'vulnerability', 'bug', 'glitch', 'exploit',
-        'unauthorized access', 'private key', 'wallet compromised',
-        '黑客', '被盗', '漏洞', '攻击'
-    ],
-    'operational_risk': [
-        'ceo arrested', 'founder detained', 'executive arrested',
-        'bankruptcy', 'insolvency', 'liquidation',
-        'withdrawal suspended', 'liquidity crisis', 'run on',
-        'massive layoff', 'office closed', 'shutdown',
-        'system down', 'maintenance', 'outage',
-        '创始人被捕', '破产', '挤兑', '裁员', '跑路'
-    ],
-    'dispute_compliance': [
-        'regulatory', 'compliance', 'fine', 'penalty', 'sanction',
-        'license revoked', 'suspended', 'banned', 'blacklist',
-        'aml', 'kyc', 'money laundering',
-        'frozen', 'seized', 'confiscated',
-        'lawsuit', 'legal action', 'investigation',
-        'user complaint', 'controversy', 'fud',
-        '牌照', '监管', '冻结', '合规', '诉讼', '争议'
-    ]
-}
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from migrations import MIGRATIONS, latest_version, run
 
-def classify_alert(alert):
-    """根据标题和描述自动分类"""
-    text = (alert.get('title', '') + ' ' + alert.get('description', '')).lower()
-    
-    for category, keywords in category_keywords.items():
-        for keyword in keywords:
-            if keyword.lower() in text:
-                return category
-    
-    # 默认为合规争议
-    return 'dispute_compliance'
+DEFAULT_DIR = Path(__file__).parent / "web" / "data" / "intelligence"
 
-def migrate_data():
-    """迁移数据文件"""
-    data_dir = Path(__file__).parent / "web" / "data" / "intelligence"
-    
-    for json_file in data_dir.glob("*.json"):
-        if json_file.stem.startswith('historical'):
-            continue
-            
-        print(f"处理: {json_file.name}")
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # 为每个警报添加分类
-        if 'alerts' in data:
-            for alert in data['alerts']:
-                if 'category' not in alert:
-                    alert['category'] = classify_alert(alert)
-                # 添加子分类（简化版）
-                if 'subcategory' not in alert:
-                    alert['subcategory'] = ''
-        
-        # 保存
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        print(f"  ✓ 已更新 {len(data.get('alerts', []))} 条警报")
 
-if __name__ == "__main__":
-    migrate_data()
+def migrate_data(data_dir=DEFAULT_DIR, target=None, jobs=None, dry_run=False):
+    """迁移一个数据目录"""
+    print(f"📂 {data_dir}")
+    started = time.perf_counter()
+    checked, migrated, touched, skipped = run(data_dir, target=target, jobs=jobs, dry_run=dry_run)
+    elapsed = time.perf_counter() - started
+    if not checked:
+        print("✅ 已是最新迁移")
+        return
+    action = "需要迁移" if dry_run else "已迁移"
+    print(f"  ✓ 检查 {checked} 天，{action} {migrated} 天，修改 {touched} 条警报 ({elapsed:.1f}s)")
+    if skipped:
+        print(f"  ⚠️ {len(skipped)} 天在迁移期间被写入，下次运行再处理: {', '.join(skipped)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为历史数据补全分类（增量迁移）")
+    parser.add_argument("--dir", action="append", type=Path, help="数据目录（可重复指定）")
+    parser.add_argument("--jobs", type=int, help="工作进程数 (默认 CPU 核数)")
+    parser.add_argument("--to", type=int, dest="target", help=f"迁移到的编号 (默认最新: {latest_version()})")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    parser.add_argument("--list", action="store_true", help="列出已登记的迁移")
+    args = parser.parse_args()
+
+    if args.list:
+        for number, description, _ in MIGRATIONS:
+            print(f"{number:>3}  {description}")
+        return
+    for data_dir in args.dir or [DEFAULT_DIR]:
+        if data_dir.exists():
+            migrate_data(data_dir, args.target, args.jobs, args.dry_run)
     print("\n✅ 数据迁移完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+数据迁移脚本 - 把历史日报文件统一转换为规范格式 (web/schema.py)
+- 去掉 alerts / key_alerts / categories 中的重复副本，警报只存一份
+- 紧凑写入（无缩进），逐个文件原子替换（写临时文件 + fsync + rename），转换期间持有目录写锁
+- 已是当前版本的文件直接跳过，可重复执行
+
+用法:
+    python migrate_schema.py                      # 转换 web/data/intelligence 和 data/intelligence
+    python migrate_schema.py --dir /path/to/dir   # 转换指定目录
+    python migrate_schema.py --dry-run            # 只统计，不写入
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from atomic import write_lock
+from cache import bump_generation
+from records import dumps
+from schema import SCHEMA_VERSION, encode_day, normalize, write_day
+from store import DayStore
+
+DEFAULT_DIRS = [
+    Path(__file__).parent / "web" / "data" / "intelligence",
+    Path(__file__).parent / "data" / "intelligence",
+]
+
+
+def migrate_dir(data_dir, dry_run=False):
+    """转换目录下所有日报，返回 (转换文件数, 转换前字节数, 转换后字节数)"""
+    # 持有目录写锁，避免与同时运行的采集任务交错改写同一文件
+    with write_lock(data_dir):
+        return _migrate_files(data_dir, dry_run)
+
+
+def _migrate_files(data_dir, dry_run):
+    converted, before, after = 0, 0, 0
+    # 对象存储中的日报已是规范格式，只处理旧的 <日期>.json（不含 refs.json）
+    for json_file in sorted(DayStore(data_dir).legacy_files()):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('schema') == SCHEMA_VERSION:
+            continue
+
+        size = json_file.stat().st_size
+        day = normalize(data, date=data.get('date') or json_file.stem)
+        if dry_run:
+            new_size = len(dumps(encode_day(day)).encode('utf-8'))
+        else:
+            write_day(json_file, day)
+            new_size = json_file.stat().st_size
+        converted += 1
+        before += size
+        after += new_size
+        print(f"  ✓ {json_file.name}: {len(day['alerts'])} 条警报, {size} → {new_size} 字节")
+
+    if converted and not dry_run:
+        # 通知 web 进程刷新索引和缓存
+        bump_generation(data_dir)
+    return converted, before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把历史日报转换为规范格式")
+    parser.add_argument("--dir", action="append", type=Path, help="数据目录（可重复指定）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    args = parser.parse_args()
+
+    for data_dir in args.dir or DEFAULT_DIRS:
+        if not data_dir.exists():
+            continue
+        print(f"📂 {data_dir}")
+        converted, before, after = migrate_dir(data_dir, args.dry_run)
+        if converted:
+            print(f"📊 转换 {converted} 个文件: {before} → {after} 字节 ({after / before:.0%})")
+        else:
+            print("✅ 已是最新格式")
+
+
+if __name__ == "__main__":
+    main()
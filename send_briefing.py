@@ -3,69 +3,78 @@
 发送CEX简报到Discord
 """
 
-import json
 import subprocess
+import sys
 from datetime import datetime
 from pathlib import Path
 
-def load_today_briefing() -> dict:
-    """加载今日简报数据"""
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from anomalies import describe, detect_day, strongest
+from incidents import collapse
+from store import DayStore
+
+def load_today_briefing() -> tuple:
+    """加载今日简报数据及当天的异常波动"""
     today = datetime.now().strftime("%Y-%m-%d")
-    data_file = Path(f"/Users/neo/.openclaw/workspace-cex-intelligence/data/intelligence/{today}.json")
-    
-    if not data_file.exists():
-        return None
-    
-    with open(data_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    store = DayStore("/Users/neo/.openclaw/workspace-cex-intelligence/web/data/intelligence")
+    return store.read(today), strongest(detect_day(store, today))
 
-def format_discord_message(data: dict) -> str:
-    """格式化为Discord消息"""
+def format_discord_message(data: dict, anomalies: list = ()) -> str:
+    """格式化为Discord消息（输入为规范日报，anomalies 为 anomalies.detect 的结果）"""
     lines = []
     lines.append("## 🎯 CEX 情报每日简报")
     lines.append(f"📅 {data['date']} | ⏰ {data['collected_at'][:16]}")
     lines.append("")
     
     # 关键警报
-    alerts = data.get("alerts", [])
-    critical = [a for a in alerts if a.get("severity") == "critical"]
-    high = [a for a in alerts if a.get("severity") == "high"]
-    medium = [a for a in alerts if a.get("severity") == "medium"]
+    # 同一事件的多条报道只列一次
+    alerts = collapse(data["alerts"])
+    critical = [a for a in alerts if a.severity == "critical"]
+    high = [a for a in alerts if a.severity == "high"]
+    medium = [a for a in alerts if a.severity == "medium"]
     
     if critical:
         lines.append("### 🚨 严重警报")
         for a in critical:
-            lines.append(f"🔴 **{a['exchange']}**: {a['title']}")
-            desc = a.get('description', '')[:200]
+            lines.append(f"🔴 **{a.exchange}**: {a.title}")
+            desc = a.description[:200]
             lines.append(f"> {desc}...")
         lines.append("")
     
     if high:
         lines.append("### ⚠️ 高风险事件")
         for a in high:
-            lines.append(f"🟠 **{a['exchange']}**: {a['title']}")
+            lines.append(f"🟠 **{a.exchange}**: {a.title}")
         lines.append("")
     
     if medium and not critical and not high:
         lines.append("### 📊 中风险关注")
         for a in medium[:2]:
-            lines.append(f"🟡 **{a['exchange']}**: {a['title']}")
+            lines.append(f"🟡 **{a.exchange}**: {a.title}")
+        lines.append("")
+    
+    # 警报量 / 严重度明显高于自身基线的交易所
+    if anomalies:
+        lines.append("### 📈 异常波动")
+        for anomaly in anomalies[:5]:
+            lines.append(f"📈 **{anomaly.exchange}**: {describe(anomaly)}")
         lines.append("")
     
     # 交易所状态
     lines.append("### 📊 交易所状态")
-    status_emoji = {"normal": "🟢", "warning": "🟡", "critical": "🔴"}
+    level_emoji = {"none": "🟢", "low": "🟢", "medium": "🟡", "high": "🟠", "critical": "🔴"}
     
-    for ex, info in data.get("exchange_status", {}).items():
-        emoji = status_emoji.get(info.get("status", "normal"), "⚪")
+    for info in data["exchanges"]:
+        ex = info["exchange"]
+        emoji = level_emoji.get(info["alert_level"], "⚪")
         notes = info.get("notes", "")
-        if notes and info.get("status") != "normal":
+        if notes and info["alert_level"] != "none":
             lines.append(f"{emoji} **{ex}**: {notes[:80]}{'...' if len(notes) > 80 else ''}")
-        elif info.get("status") == "normal":
+        elif info["alert_level"] == "none":
             lines.append(f"{emoji} **{ex}**: 正常")
     
     # FinTelegram
-    ft = data.get("fintelegram_highlights", [])
+    ft = data["fintelegram"]
     if ft:
         lines.append("")
         lines.append(f"### 🔍 FinTelegram ({len(ft)} 条)")
@@ -73,9 +82,9 @@ def format_discord_message(data: dict) -> str:
             lines.append(f"• {item[:100]}{'...' if len(item) > 100 else ''}")
     
     # 摘要
-    if data.get("summary"):
+    if data["briefing"]:
         lines.append("")
-        lines.append(f"**💡 摘要**: {data['summary'][:200]}{'...' if len(data['summary']) > 200 else ''}")
+        lines.append(f"**💡 摘要**: {data['briefing'][:200]}{'...' if len(data['briefing']) > 200 else ''}")
     
     return "\n".join(lines)
 
@@ -98,13 +107,13 @@ def send_to_discord(message: str):
 
 def main():
     """主入口"""
-    data = load_today_briefing()
+    data, anomalies = load_today_briefing()
     
     if not data:
         print("❌ 未找到今日简报数据。请先运行 daily_briefing.py")
         return
     
-    message = format_discord_message(data)
+    message = format_discord_message(data, anomalies)
     send_to_discord(message)
 
 if __name__ == "__main__":
@@ -6,10 +6,14 @@
 """
 
 import json
-import shutil
+import sys
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from schema import normalize, normalize_alert, summarize
+from store import DayStore
+
 def sync_data():
     """同步数据到网站目录"""
     
@@ -35,63 +39,54 @@ def sync_data():
     
     # 生成日期格式的文件名 (YYYY-MM-DD.json)
     today = datetime.now().strftime("%Y-%m-%d")
-    target_file = web_data_dir / f"{today}.json"
+    store = DayStore(web_data_dir)
     
     # 当前发现时间（系统采集时间）
     discovered_at = data.get("timestamp", datetime.now().isoformat())
     
+    # 统一转换为规范日报（旧采集格式中警报的 date 即事件发生时间，转换后为 event_date）
+    day = normalize(data, date=today)
+    
     # 处理关键警报，添加双时间字段
     key_alerts = []
-    for alert in data.get("key_alerts", []):
-        # 事件发生时间（从alert中获取，如果没有则使用发现时间）
-        event_date = alert.get("date", discovered_at[:10])
-        
+    for alert in day['alerts']:
         processed_alert = {
-            "exchange": alert.get("exchange"),
-            "severity": alert.get("severity", "medium"),
-            "title": alert.get("title"),
-            "description": alert.get("description"),
-            "source": alert.get("source", "Unknown"),
-            "url": alert.get("url", ""),
+            "exchange": alert.exchange,
+            "severity": alert.severity or "medium",
+            "title": alert.title,
+            "description": alert.description,
+            "source": alert.source or "Unknown",
+            "url": alert.url,
             "urls": alert.get("urls", []),
-            "event_date": event_date,  # 事件发生时间
+            "event_date": alert.event_date or discovered_at[:10],  # 事件发生时间
             "discovered_at": discovered_at,  # 我们发现的时间
-            "tags": alert.get("tags", ["security"])
+            "tags": list(alert.tags) or ["security"]
         }
         key_alerts.append(processed_alert)
     
-    # 转换数据格式以适应网站
-    web_data = {
-        "date": today,
-        "timestamp": discovered_at,
-        "collected_at": discovered_at,
-        "discovered_at": discovered_at,  # 发现时间（系统时间）
-        "summary": {
-            "total_exchanges": len(data.get("exchanges", [])),
-            "alerted_exchanges": len([e for e in data.get("exchanges", []) if e.get("alert_level") != "none"]),
-            "critical_alerts": len([a for a in key_alerts if a.get("severity") == "critical"]),
-            "high_alerts": len([a for a in key_alerts if a.get("severity") == "high"])
-        },
-        "exchanges": data.get("exchanges", []),
-        "key_alerts": key_alerts,
-        "alerts": key_alerts
+    # 警报只存一份，统计按交易所警报级别计算
+    day['alerts'] = [normalize_alert(a, today) for a in key_alerts]
+    day['collected_at'] = discovered_at
+    day['summary'] = {
+        **summarize(day['alerts'], day['exchanges']),
+        "alerted_exchanges": len([e for e in day['exchanges'] if e.get("alert_level") != "none"]),
     }
     
-    # 保存到网站目录
-    with open(target_file, 'w', encoding='utf-8') as f:
-        json.dump(web_data, f, ensure_ascii=False, indent=2)
+    # 合并进当天的日报（上午采集到、晚上没采集到的警报不会丢失），写入网站目录的对象存储
+    day = store.upsert(day, source=latest.name)
+    target_file = store.path(today)
     
     print(f"✅ 数据已同步: {latest} → {target_file}")
     print(f"📊 独立警报数量: {len(key_alerts)}")
     for a in key_alerts:
         print(f"  - [事件:{a['event_date']}] [发现:{a['discovered_at'][:10]}] {a['title']}")
     
-    # 同时复制到 site/ 目录
+    # 同时写入 site/ 目录
     site_data_dir = Path(__file__).parent / "site"
     site_data_dir.mkdir(exist_ok=True)
     
-    with open(site_data_dir / "latest.json", 'w', encoding='utf-8') as f:
-        json.dump(web_data, f, ensure_ascii=False, indent=2)
+    # 硬链接到同一个对象，不再另写一份
+    store.link(today, site_data_dir / "latest.json")
     
     print(f"✅ 静态数据已更新: site/latest.json")
     
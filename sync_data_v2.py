@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 """
 数据同步脚本 v2
-处理带分类的新数据结构
+处理带分类的新数据结构，以规范日报格式（web/schema.py）紧凑、原子地写入
 """
 
 import json
-import shutil
+import sys
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "web"))
+from anomalies import describe, detect_day, strongest
+from incidents import collapse
+from schema import by_category, normalize, summarize
+from store import DayStore
+
 
 def sync_data():
     """同步数据到网站目录"""
@@ -29,110 +35,53 @@ def sync_data():
     latest = files[-1]
     print(f"📂 读取源数据: {latest}")
     
-    # 读取数据
+    # 读取数据（任意采集格式统一转换为规范日报，缺少分类的警报按关键词归类）
     with open(latest, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
     # 生成日期格式的文件名
     today = datetime.now().strftime("%Y-%m-%d")
-    target_file = web_data_dir / f"{today}.json"
-    
-    # 处理警报数据，确保每个都有 category
-    all_alerts = data.get('all_alerts', data.get('alerts', []))
-    
-    # 为没有 category 的警报添加默认值
-    for alert in all_alerts:
-        if 'category' not in alert:
-            # 基于关键词简单分类
-            title_desc = (alert.get('title', '') + ' ' + alert.get('description', '')).lower()
-            if any(k in title_desc for k in ['hack', 'stolen', 'breach', 'ddos', '漏洞', '攻击']):
-                alert['category'] = 'security_attack'
-            elif any(k in title_desc for k in ['破产', '被捕', '挤兑', '宕机']):
-                alert['category'] = 'operational_risk'
-            else:
-                alert['category'] = 'dispute_compliance'
-        
-        # 确保有 discovered_at
-        if 'discovered_at' not in alert:
-            alert['discovered_at'] = data.get('timestamp', datetime.now().isoformat())
-    
-    # 按分类统计
-    categories = {
-        'security_attack': [],
-        'dispute_compliance': [],
-        'operational_risk': []
-    }
-    
-    for alert in all_alerts:
-        cat = alert.get('category', 'dispute_compliance')
-        if cat in categories:
-            categories[cat].append(alert)
-    
-    # 构建 web 数据格式
-    web_data = {
-        'date': today,
-        'timestamp': data.get('timestamp', datetime.now().isoformat()),
-        'collected_at': data.get('timestamp', datetime.now().isoformat()),
-        'discovered_at': datetime.now().isoformat(),
-        'summary': {
-            'total_exchanges': 30,
-            'total_alerts': len(all_alerts),
-            'alerted_exchanges': len(set(a.get('exchange') for a in all_alerts)),
-            'critical_alerts': len([a for a in all_alerts if a.get('severity') == 'critical']),
-            'high_alerts': len([a for a in all_alerts if a.get('severity') == 'high'])
-        },
-        'categories': {
-            'security_attack': {
-                'count': len(categories['security_attack']),
-                'alerts': categories['security_attack']
-            },
-            'dispute_compliance': {
-                'count': len(categories['dispute_compliance']),
-                'alerts': categories['dispute_compliance']
-            },
-            'operational_risk': {
-                'count': len(categories['operational_risk']),
-                'alerts': categories['operational_risk']
-            }
-        },
-        'alerts': all_alerts,
-        'key_alerts': all_alerts,  # 兼容旧模板
-        'exchanges': data.get('exchanges', [])
-    }
-    
-    # 保存到网站目录
-    with open(target_file, 'w', encoding='utf-8') as f:
-        json.dump(web_data, f, ensure_ascii=False, indent=2)
+    store = DayStore(web_data_dir)
+    
+    # 警报只存一份；分类视图、统计在读取时计算
+    day = normalize(data, date=today)
+    day['summary'] = summarize(day['alerts'], day['exchanges'], total_exchanges=30)
+    day['meta']['synced_at'] = datetime.now().isoformat()
+    
+    # 合并进当天的日报（上午采集到、晚上没采集到的警报不会丢失），写入网站目录的对象存储
+    day = store.upsert(day, source=latest.name)
+    target_file = store.path(today)
+    categories = by_category(day['alerts'])
     
     print(f"✅ 数据已同步: {latest} → {target_file}")
     print(f"📊 统计:")
-    print(f"   总警报: {len(all_alerts)}")
+    print(f"   总警报: {len(day['alerts'])}")
     print(f"   🔴 攻击事件: {len(categories['security_attack'])}")
     print(f"   🟠 合规争议: {len(categories['dispute_compliance'])}")
     print(f"   🟡 运营风险: {len(categories['operational_risk'])}")
     
-    # 同时复制到 site/ 目录
+    # 同时写入 site/ 目录
     site_data_dir = Path(__file__).parent / "site"
     site_data_dir.mkdir(exist_ok=True)
     
-    with open(site_data_dir / "latest.json", 'w', encoding='utf-8') as f:
-        json.dump(web_data, f, ensure_ascii=False, indent=2)
+    # 硬链接到同一个对象，不再另写一份
+    store.link(today, site_data_dir / "latest.json")
     
     print(f"✅ 静态数据已更新: site/latest.json")
     
     # 生成简报文本
-    generate_briefing(web_data, site_data_dir)
+    generate_briefing(day, site_data_dir, strongest(detect_day(store, today)))
     
     return True
 
 
-def generate_briefing(data: dict, output_dir: Path):
-    """生成简报文本"""
+def generate_briefing(day: dict, output_dir: Path, anomalies: list = ()):
+    """生成简报文本（输入为规范日报，anomalies 为 anomalies.detect 的结果）"""
     
-    summary = data.get('summary', {})
-    categories = data.get('categories', {})
+    summary = day['summary']
+    categories = by_category(day['alerts'])
     
-    briefing = f"""🎯 CEX 每日简报 - {data.get('date', datetime.now().strftime('%Y-%m-%d'))}
+    briefing = f"""🎯 CEX 每日简报 - {day['date']}
 
 📊 今日概况
 • 监控交易所: {summary.get('total_exchanges', 30)} 个
@@ -140,15 +89,14 @@ def generate_briefing(data: dict, output_dir: Path):
 • 总情报数: {summary.get('total_alerts', 0)} 条
 
 📈 分类统计
-• 🔴 网络攻击事件: {categories.get('security_attack', {}).get('count', 0)} 条
-• 🟠 合规争议问题: {categories.get('dispute_compliance', {}).get('count', 0)} 条
-• 🟡 运营风险事件: {categories.get('operational_risk', {}).get('count', 0)} 条
+• 🔴 网络攻击事件: {len(categories['security_attack'])} 条
+• 🟠 合规争议问题: {len(categories['dispute_compliance'])} 条
+• 🟡 运营风险事件: {len(categories['operational_risk'])} 条
 
 """
     
-    # 添加关键警报
-    alerts = data.get('alerts', [])
-    critical_high = [a for a in alerts if a.get('severity') in ['critical', 'high']]
+    # 添加关键警报（同一事件的多条报道只列一次）
+    critical_high = [a for a in collapse(day['alerts']) if a.severity in ['critical', 'high']]
     
     if critical_high:
         briefing += "🚨 重点关注\n"
@@ -157,13 +105,19 @@ def generate_briefing(data: dict, output_dir: Path):
                 'security_attack': '🔴',
                 'dispute_compliance': '🟠',
                 'operational_risk': '🟡'
-            }.get(alert.get('category'), '⚪')
-            briefing += f"{cat_emoji} [{alert.get('exchange')}] {alert.get('title', '')}\n"
+            }.get(alert.category, '⚪')
+            briefing += f"{cat_emoji} [{alert.exchange}] {alert.title}\n"
     else:
         briefing += "✅ 今日无重大风险事件\n"
     
+    # 警报量 / 严重度明显高于自身基线的交易所
+    if anomalies:
+        briefing += "\n📈 异常波动\n"
+        for anomaly in anomalies[:5]:
+            briefing += f"• [{anomaly.exchange}] {describe(anomaly)}\n"
+    
     briefing += f"""
-⏰ 生成时间: {data.get('timestamp', datetime.now().isoformat())}
+⏰ 生成时间: {day['collected_at'] or datetime.now().isoformat()}
 🔗 详细报告: https://cex-intelligence-production.up.railway.app
 """
     
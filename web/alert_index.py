@@ -0,0 +1,384 @@
+"""
+警报索引
+- 全部历史警报按 (日期倒序, 警报ID) 排序，游标分页在新数据写入时保持稳定
+- 按交易所 / 严重度 / 分类维护倒排列表，筛选直接在索引上完成
+- 按发布序号排序的事件流，供 SSE 断线重连时按 Last-Event-ID 补发
+- ExchangeTimeline：全部警报按 (交易所, 日期倒序) 排成一个数组，每个交易所占连续的一段（偏移表），
+  历史汇总文件在构建时按事件日期并入；按时间范围查询只需在该段内二分查找再切片，与历史长度无关；
+  同一事件的多条警报在查询范围内去重（incidents.py）
+
+索引以紧凑的只读形式存放：警报编码为紧凑 JSON 数组后拼接为一个 bytes，其余字段均为 array，
+对象数量与警报数无关。gunicorn 预加载时在 fork 前构建，各 worker 以写时复制方式共享内存页。
+"""
+
+import hashlib
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from dataclasses import replace
+from datetime import date
+
+from incidents import incident_of
+from records import decode_alert, encode_alert, to_alert
+from schema import ALERT_LEVELS
+
+# 排序键 = 7位倒序日期 + 12位警报ID
+_MAX_ORDINAL = date.max.toordinal()
+_ID_PATTERN = re.compile(r'^[0-9a-f]{12}$')
+_EVENT_PATTERN = re.compile(r'^\d{10}\|[^|]*\|[0-9a-f]{12}$')
+
+
+def alert_id(alert):
+    """警报ID：12位十六进制（交易所 + 标题 + 链接的哈希；已有合规 id 字段时直接使用）"""
+    existing = alert.get('id')
+    if existing and _ID_PATTERN.match(str(existing)):
+        return str(existing)
+    raw = existing or f"{alert.get('exchange', '')}|{alert.get('title', '')}|{alert.get('url', '')}"
+    return hashlib.sha1(str(raw).encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(date_str, aid):
+    """游标 = 上一页最后一条警报的 日期~ID"""
+    return f"{date_str}~{aid}"
+
+
+def decode_cursor(cursor):
+    """解析游标为索引排序键，格式错误时抛出 ValueError"""
+    date_str, sep, aid = cursor.partition('~')
+    if not sep or not _ID_PATTERN.match(aid):
+        raise ValueError(f"无效游标: {cursor}")
+    return _sort_key(date.fromisoformat(date_str).toordinal(), aid)
+
+
+def publish_seq(alert, runs):
+    """警报首次发布的序号：采集到它的批次中最小的 seq（日报 runs 没有记录时为 0）"""
+    return min((runs[i].get('seq', 0) for i in alert.runs if i < len(runs)), default=0)
+
+
+def event_id(alert, date_str, seq=0):
+    """SSE 事件ID = 发布序号|发现时间|警报ID，按字符串排序即为发布顺序
+
+    按发现时间排序时，后来合并进日报、但发现时间更早的警报会排在客户端的 Last-Event-ID 之前而漏推；
+    发布序号只增不减，晚到的警报一定排在已推送的事件之后
+    """
+    seen = alert.get('discovered_at') or f"{date_str}T00:00:00"
+    return f"{seq:010d}|{seen}|{alert_id(alert)}"
+
+
+def is_event_id(value):
+    """是否为当前格式的事件ID（旧格式 发现时间|警报ID 的 Last-Event-ID 视为无效）"""
+    return bool(_EVENT_PATTERN.match(value))
+
+
+def _sort_key(ordinal, aid=''):
+    return f"{_MAX_ORDINAL - ordinal:07d}{aid}"
+
+
+def _date_ordinal(date_str):
+    return date.fromisoformat(date_str).toordinal()
+
+
+def _event_ordinal(alert):
+    """历史警报的事件日期（YYYY-MM 记为当月 1 日）→ 序数；无法解析时返回 None"""
+    value = (alert.event_date or "")[:10]
+    if len(value) == 7:
+        value += "-01"
+    try:
+        return _date_ordinal(value)
+    except ValueError:
+        return None
+
+
+def _severity_rank(severity):
+    return ALERT_LEVELS.index(severity) if severity in ALERT_LEVELS else 0
+
+
+class StringTable:
+    """紧凑的只读字符串序列：UTF-8 拼接 + 偏移数组，支持 bisect"""
+
+    def __init__(self, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        self._blob = b''.join(encoded)
+        self._offsets = array('q', [0])
+        total = 0
+        for item in encoded:
+            total += len(item)
+            self._offsets.append(total)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+
+class AlertIndex:
+    """全部历史警报的只读索引"""
+
+    def __init__(self, days):
+        """days: [(date_str, alerts[, runs]), ...]，顺序不限；alerts 可为 Alert 或字典，runs 为日报的采集批次"""
+        entries = []
+        for date_str, alerts, *rest in days:
+            runs = rest[0] if rest else ()
+            ordinal = _date_ordinal(date_str)
+            seen = set()
+            for alert in map(to_alert, alerts):
+                aid = alert_id(alert)
+                # 同一天内的重复条目（如 alerts 与分类副本）只保留一条
+                if aid in seen:
+                    continue
+                seen.add(aid)
+                entries.append((_sort_key(ordinal, aid), ordinal, alert, publish_seq(alert, runs)))
+        entries.sort(key=lambda e: e[0])
+
+        self._keys = StringTable(e[0] for e in entries)
+        self._ordinals = array('i', (e[1] for e in entries))
+        self._alerts = StringTable(encode_alert(e[2]) for e in entries)
+
+        # 交易所 / 严重度 / 分类编码为小整数
+        self._exchange_names, self._severity_names, self._category_names = [], [], []
+        self._exchange_codes, self._severity_codes, self._category_codes = {}, {}, {}
+        self._exchange = array('H')
+        self._severity = array('B')
+        self._category = array('B')
+        self.by_exchange, self.by_severity, self.by_category = {}, {}, {}
+        for pos, (_, _, alert, _) in enumerate(entries):
+            exchange = alert.exchange
+            severity = alert.severity
+            category = alert.category
+            ex = _code(self._exchange_codes, self._exchange_names, exchange)
+            self._exchange.append(ex)
+            self._severity.append(_code(self._severity_codes, self._severity_names, severity))
+            self._category.append(_code(self._category_codes, self._category_names, category))
+            self.by_exchange.setdefault(exchange, array('i')).append(pos)
+            self.by_severity.setdefault(severity, array('i')).append(pos)
+            self.by_category.setdefault(category, array('i')).append(pos)
+
+        # 事件流：按发布序号排序的 (事件ID, 位置)
+        feed = sorted((event_id(e[2], date.fromordinal(e[1]).isoformat(), e[3]), pos)
+                      for pos, e in enumerate(entries))
+        self._event_ids = StringTable(e[0] for e in feed)
+        self._event_positions = array('i', (e[1] for e in feed))
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def exchanges(self):
+        """索引中出现过的所有交易所"""
+        return [ex for ex in self._exchange_names if ex]
+
+    def date_of(self, pos):
+        return date.fromordinal(self._ordinals[pos]).isoformat()
+
+    def encoded(self, pos):
+        """索引中警报的紧凑 JSON 编码（不含 date）"""
+        return self._alerts[pos]
+
+    def item(self, pos):
+        """返回带 date 的警报记录"""
+        return decode_alert(self._alerts[pos], self.date_of(pos))
+
+    def latest_event_id(self):
+        """最新一条事件ID（无数据时为空字符串）"""
+        return self._event_ids[len(self._event_ids) - 1] if len(self._event_ids) else ''
+
+    def events_since(self, last_event_id, limit=100):
+        """返回事件ID大于 last_event_id 的警报 [(事件ID, 警报)]，按发布顺序"""
+        i = bisect_right(self._event_ids, last_event_id)
+        return [(self._event_ids[j], self.item(self._event_positions[j]))
+                for j in range(i, min(i + limit, len(self._event_ids)))]
+
+    def pages(self, limit=50):
+        """不加筛选时逐页产出 (游标, 起始位置, 结束位置)，首页游标为 None；与 query 的分页一致"""
+        for start in range(0, len(self._keys), limit):
+            cursor = encode_cursor(self.date_of(start - 1), self._keys[start - 1][7:]) if start else None
+            yield cursor, start, min(start + limit, len(self._keys))
+
+    def _position_range(self, date_from=None, date_to=None, cursor=None):
+        """把日期范围和游标转换为索引位置区间 [start, end)"""
+        start, end = 0, len(self._keys)
+        if date_to:
+            start = bisect_left(self._keys, _sort_key(_date_ordinal(date_to)))
+        if date_from:
+            end = bisect_left(self._keys, _sort_key(_date_ordinal(date_from) - 1))
+        if cursor:
+            start = max(start, bisect_right(self._keys, decode_cursor(cursor)))
+        return start, end
+
+    def query(self, exchange=None, severity=None, category=None,
+              date_from=None, date_to=None, cursor=None, limit=50):
+        """按条件查询一页警报，返回 (警报列表, 下一页游标)
+
+        severity / category 可传单个值或集合；日期为 YYYY-MM-DD，闭区间；limit=None 返回全部。
+        参数格式错误时抛出 ValueError。
+        """
+        severities = {severity} if isinstance(severity, str) else (set(severity) if severity else None)
+        categories = {category} if isinstance(category, str) else (set(category) if category else None)
+        start, end = self._position_range(date_from, date_to, cursor)
+
+        # 条件转换为编码；索引中不存在的取值直接返回空结果
+        exchange_code = self._exchange_codes.get(exchange) if exchange else None
+        severity_codes = {self._severity_codes[s] for s in severities if s in self._severity_codes} if severities else None
+        category_codes = {self._category_codes[c] for c in categories if c in self._category_codes} if categories else None
+        if (exchange and exchange_code is None) or severity_codes == set() or category_codes == set():
+            return [], None
+
+        # 选择最短的倒排列表作为候选，其余条件逐条校验
+        candidates = []
+        if exchange:
+            candidates.append(self.by_exchange.get(exchange, array('i')))
+        if severities and len(severities) == 1:
+            candidates.append(self.by_severity.get(next(iter(severities)), array('i')))
+        if categories and len(categories) == 1:
+            candidates.append(self.by_category.get(next(iter(categories)), array('i')))
+
+        if candidates:
+            positions = min(candidates, key=len)
+            i = bisect_left(positions, start)
+            stop = bisect_left(positions, end)
+            scan = (positions[j] for j in range(i, stop))
+        else:
+            scan = iter(range(start, end))
+
+        results = []
+        last_pos = None
+        for pos in scan:
+            if exchange and self._exchange[pos] != exchange_code:
+                continue
+            if severity_codes and self._severity[pos] not in severity_codes:
+                continue
+            if category_codes and self._category[pos] not in category_codes:
+                continue
+            if len(results) == limit:
+                return results, encode_cursor(self.date_of(last_pos), self._keys[last_pos][7:])
+            results.append(self.item(pos))
+            last_pos = pos
+        return results, None
+
+
+def _code(codes, names, value):
+    """取值 → 小整数编码"""
+    if value not in codes:
+        codes[value] = len(names)
+        names.append(value)
+    return codes[value]
+
+
+class ExchangeTimeline:
+    """每个交易所按日期排列的警报（含历史汇总文件）的只读索引
+
+    数组保留全部警报；同一事件的多条警报在每次查询的日期范围内去重，只保留范围内最新的一条
+    （与 collapse 按天去重相同，范围内只出现一次的旧报告不会被更新的报告挤掉）
+    """
+
+    def __init__(self, days, historical=()):
+        """days: [(date_str, alerts[, runs]), ...] 每日情报；historical: [alerts, ...] 历史汇总文件
+
+        历史警报按事件日期归入时间线，带 is_historical 标记；各文件中同一交易所同一天的事件只保留最严重的一条
+        """
+        entries = []
+        for date_str, alerts, *_ in days:
+            ordinal = _date_ordinal(date_str)
+            for alert in map(to_alert, alerts):
+                entries.append((alert.exchange, _sort_key(ordinal, alert_id(alert)), ordinal, alert))
+        best = {}
+        for alerts in historical:
+            for alert in map(to_alert, alerts):
+                ordinal = _event_ordinal(alert)
+                if ordinal is None or not alert.exchange:
+                    continue
+                key = (alert.exchange, ordinal)
+                if key not in best or _severity_rank(alert.severity) > _severity_rank(best[key].severity):
+                    best[key] = alert
+        for (exchange, ordinal), alert in best.items():
+            alert = replace(alert, extra=alert.extra + (('is_historical', True),))
+            entries.append((exchange, _sort_key(ordinal, alert_id(alert)), ordinal, alert))
+        entries.sort(key=lambda e: (e[0], e[1]))
+
+        keys, ordinals, encoded = [], array('i'), []
+        self._severity_names, self._category_names = [], []
+        severity_codes, category_codes = {}, {}
+        self._severity = array('B')
+        self._category = array('B')
+        self._offsets = {}  # 交易所 → (起始位置, 结束位置)
+        self._newer = array('i')  # 同一交易所同一事件更新一条的位置（没有时为 -1）
+        latest = {}
+        for exchange, key, ordinal, alert in entries:
+            # 同一天的重复条目只保留一条
+            if keys and keys[-1] == key and self._offsets.get(exchange, (0, 0))[1] == len(keys):
+                continue
+            incident = (exchange, incident_of(alert))
+            self._newer.append(latest.get(incident, -1))
+            latest[incident] = len(keys)
+            start, _ = self._offsets.get(exchange, (len(keys), 0))
+            keys.append(key)
+            ordinals.append(ordinal)
+            encoded.append(encode_alert(alert))
+            self._severity.append(_code(severity_codes, self._severity_names, alert.severity))
+            self._category.append(_code(category_codes, self._category_names, alert.category))
+            self._offsets[exchange] = (start, len(keys))
+        self._keys = StringTable(keys)
+        self._ordinals = ordinals
+        self._alerts = StringTable(encoded)
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def exchanges(self):
+        return [ex for ex in self._offsets if ex]
+
+    def item(self, pos):
+        return decode_alert(self._alerts[pos], date.fromordinal(self._ordinals[pos]).isoformat())
+
+    def _range(self, exchange, date_from=None, date_to=None, cursor=None):
+        """交易所在 [date_from, date_to] 内的位置区间，返回 (范围起点, 游标之后的起点, 终点)"""
+        lo, hi = self._offsets.get(exchange, (0, 0))
+        first, end = lo, hi
+        if date_to:
+            first = bisect_left(self._keys, _sort_key(_date_ordinal(date_to)), lo, hi)
+        if date_from:
+            end = bisect_left(self._keys, _sort_key(_date_ordinal(date_from) - 1), lo, hi)
+        start = first
+        if cursor:
+            start = max(start, bisect_right(self._keys, decode_cursor(cursor), lo, hi))
+        return first, start, end
+
+    def _unique(self, first, start, end):
+        """[start, end) 中在范围 [first, end) 内是该事件最新一条的位置"""
+        newer = self._newer
+        return (pos for pos in range(start, end) if newer[pos] < first)
+
+    def first_date(self, exchange):
+        """交易所最早一条警报的日期（没有时为 None）"""
+        start, end = self._offsets.get(exchange, (0, 0))
+        return date.fromordinal(self._ordinals[end - 1]).isoformat() if end > start else None
+
+    def count(self, exchange, date_from=None, date_to=None):
+        """范围内各严重度的警报数 {严重度: 数量}（按事件去重，不解码警报）"""
+        first, start, end = self._range(exchange, date_from, date_to)
+        severity = self._severity
+        counts = Counter(severity[pos] for pos in self._unique(first, start, end))
+        return {self._severity_names[code]: n for code, n in counts.items()}
+
+    def query(self, exchange, severity=None, category=None,
+              date_from=None, date_to=None, cursor=None, limit=50):
+        """按条件查询交易所的一页警报（日期倒序），返回 (警报列表, 下一页游标)；参数同 AlertIndex.query"""
+        severities = {severity} if isinstance(severity, str) else (set(severity) if severity else None)
+        categories = {category} if isinstance(category, str) else (set(category) if category else None)
+        first, start, end = self._range(exchange, date_from, date_to, cursor)
+        severity_codes = {c for c, name in enumerate(self._severity_names) if not severities or name in severities}
+        category_codes = {c for c, name in enumerate(self._category_names) if not categories or name in categories}
+        results = []
+        last_pos = None
+        for pos in self._unique(first, start, end):
+            if self._severity[pos] not in severity_codes or self._category[pos] not in category_codes:
+                continue
+            if len(results) == limit:
+                return results, self._cursor(last_pos)
+            results.append(self.item(pos))
+            last_pos = pos
+        return results, None
+
+    def _cursor(self, pos):
+        return encode_cursor(date.fromordinal(self._ordinals[pos]).isoformat(), self._keys[pos][7:])
@@ -0,0 +1,114 @@
+"""
+警报量异常检测
+基于风险矩阵（heatmap.SeverityMatrix）中各交易所每天的分类事件数和最高严重度：
+- 基线：目标日之前 BASELINE_DAYS 天的滚动窗口（不含当天），不足 MIN_HISTORY 天时不判断
+- 数量异常：当天事件数（全部或某一分类）的 z = (x - 均值) / max(标准差, MIN_STD) ≥ Z_THRESHOLD，且 x ≥ MIN_COUNT
+- 严重度异常：当天出现高危及以上警报，且高于基线窗口内的最高严重度
+- 窗口和与平方和由行切片的前缀和得到，每个交易所每一天 O(1)；
+  开销与检测的天数成正比（只切出 [起始日 - BASELINE_DAYS, 结束日] 这一段），与历史长度无关
+"""
+
+from collections import namedtuple
+from itertools import accumulate
+from math import sqrt
+
+from heatmap import SeverityMatrix
+from schema import ALERT_LEVELS, CATEGORIES
+
+BASELINE_DAYS = 28
+MIN_HISTORY = 7
+Z_THRESHOLD = 3.0
+MIN_STD = 0.5
+MIN_COUNT = 3
+
+METRIC_LABELS = {
+    'total': '警报',
+    'security_attack': '攻击类警报',
+    'dispute_compliance': '合规争议警报',
+    'operational_risk': '运营风险警报',
+}
+LEVEL_LABELS = {'none': '正常', 'low': '低危', 'medium': '中等', 'high': '高危', 'critical': '严重'}
+
+# metric 为 'total' / 分类名 / 'severity'；value / baseline 对严重度为级别名，z 为 None
+Anomaly = namedtuple('Anomaly', 'exchange date metric value baseline z level category')
+
+_SEVERITY_FLOOR = ALERT_LEVELS.index('high')
+
+
+def detect(matrix, date_from, date_to=None, exchanges=None):
+    """检测 [date_from, date_to] 内每天的异常，按日期倒序、z 值降序返回 Anomaly 列表"""
+    if matrix.start is None:
+        return []
+    first = max(matrix.offset(date_from), 0)
+    last = min(matrix.offset(date_to or date_from), matrix.length - 1)
+    if first > last:
+        return []
+    lo = max(first - BASELINE_DAYS, 0)
+
+    found = []
+    for exchange in exchanges or matrix.exchanges:
+        row = matrix.row(exchange)
+        if row is None:
+            continue
+        severity, counts = row
+        series = {category: counts[category][lo:last + 1] for category in CATEGORIES}
+        series = {'total': list(map(sum, zip(*series.values()))), **series}
+
+        def context(t):
+            """当天的最高严重度和事件最多的分类"""
+            col = lo + t
+            return ALERT_LEVELS[severity[col]], max(CATEGORIES, key=lambda c: counts[c][col])
+
+        for metric, values in series.items():
+            sums = [0, *accumulate(values)]
+            squares = [0, *accumulate(v * v for v in values)]
+            for t in range(first - lo, last - lo + 1):
+                start = max(t - BASELINE_DAYS, 0)
+                n = t - start
+                x = values[t]
+                if n < MIN_HISTORY or x < MIN_COUNT:
+                    continue
+                mean = (sums[t] - sums[start]) / n
+                std = sqrt(max((squares[t] - squares[start]) / n - mean * mean, 0))
+                z = (x - mean) / max(std, MIN_STD)
+                if z >= Z_THRESHOLD:
+                    found.append(Anomaly(exchange, matrix.date_of(lo + t), metric, x, round(mean, 2),
+                                         round(z, 1), *context(t)))
+
+        for t in range(first - lo, last - lo + 1):
+            col = lo + t
+            start = max(t - BASELINE_DAYS, 0)
+            if t - start < MIN_HISTORY or severity[col] < _SEVERITY_FLOOR:
+                continue
+            previous = max(severity[lo + start:col])
+            if severity[col] > previous:
+                level, category = context(t)
+                found.append(Anomaly(exchange, matrix.date_of(col), 'severity', level,
+                                     ALERT_LEVELS[previous], None, level, category))
+
+    found.sort(key=lambda a: (a.date, a.z if a.z is not None else Z_THRESHOLD), reverse=True)
+    return found
+
+
+def detect_day(store, date_str):
+    """读取存储目录的风险矩阵，检测某一天的异常（简报用）"""
+    matrix = SeverityMatrix(store)
+    matrix.refresh(save=False)
+    return detect(matrix, date_str)
+
+
+def strongest(anomalies):
+    """每个交易所只保留最近、最显著的一条（输入需为 detect 的排序）"""
+    best = {}
+    for anomaly in anomalies:
+        best.setdefault(anomaly.exchange, anomaly)
+    return list(best.values())
+
+
+def describe(anomaly):
+    """异常的中文说明"""
+    if anomaly.metric == 'severity':
+        return (f"{anomaly.date} 出现{LEVEL_LABELS[anomaly.value]}警报，"
+                f"近 {BASELINE_DAYS} 天最高为{LEVEL_LABELS[anomaly.baseline]}")
+    return (f"{anomaly.date} {METRIC_LABELS[anomaly.metric]} {anomaly.value} 条，"
+            f"近 {BASELINE_DAYS} 天日均 {anomaly.baseline:g}（z={anomaly.z:g}）")
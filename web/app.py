@@ -1,18 +1,38 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, make_response
+from flask.signals import before_render_template, template_rendered
 from datetime import datetime, timedelta
 from pathlib import Path
-import json
 import os
 import pytz
 from functools import wraps
+import threading
+import time
+from werkzeug.http import is_resource_modified
+
+from alert_index import AlertIndex, ExchangeTimeline, is_event_id
+from anomalies import describe as describe_anomaly, detect as detect_anomalies, strongest
+from cache import ResponseCache, data_version, make_etag
+from correlation import CorrelationIndex
+from export import FORMATS as EXPORT_FORMATS, iter_alerts, stream as stream_export
+from heatmap import SeverityMatrix
+from live import LiveFeed, format_event
+from metrics import Metrics
+from schema import ALERT_LEVELS
+from scores import DEFAULT_WINDOW, ScoreIndex, score_status
+from store import DayStore
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'cex-intelligence-default-key-change-in-production')
+# 静态导出模式（static_export.py 设置）：关闭实时推送和服务端筛选，分页改为静态路径
+app.config.setdefault('STATIC_EXPORT', False)
 
 # 配置访问密码
 ACCESS_PASSWORD = os.environ.get('ACCESS_PASSWORD', 'cex2024')
 
-DATA_DIR = Path(__file__).parent / "data" / "intelligence"
+# 情报数据目录（CEX_DATA_DIR 可覆盖，压测时指向合成数据）
+DATA_DIR = Path(os.environ.get('CEX_DATA_DIR') or Path(__file__).parent / "data" / "intelligence")
+# 日报对象存储（refs.json 清单 + objects/，兼容目录下旧的 <日期>.json）
+day_store = DayStore(DATA_DIR)
 
 # CER.live 30个交易所列表
 CER_LIVE_EXCHANGES = [
@@ -23,6 +43,53 @@ CER_LIVE_EXCHANGES = [
     "Flipster", "BingX", "HashKey Exchange", "Nami.Exchange", "Bitstamp"
 ]
 
+# 历史数据文件（不属于每日情报）
+HISTORICAL_FILES = ['historical-2025', 'historical-2025-detailed']
+
+# 分页参数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 交易所页面时间线最多显示的警报数（统计仍按整个范围）
+EXCHANGE_PAGE_LIMIT = 200
+
+# 批量接口一次最多查询的交易所数
+MAX_BULK_EXCHANGES = 100
+
+# 交易所页面评分曲线的天数
+SCORE_CHART_DAYS = 90
+# 评分衰减半衰期上限（天）、单次返回的评分序列最长天数
+MAX_HALF_LIFE = 365
+MAX_SCORE_DAYS = 3660
+
+# 热力图默认天数（Dashboard 与 /api/heatmap）、单次返回的最多列数
+HEATMAP_DAYS = 30
+MAX_HEATMAP_COLUMNS = 3660
+
+# Dashboard 显示最近 N 天的跨交易所关联事件
+CORRELATION_DAYS = 30
+
+# SSE 心跳间隔（秒），用于保持连接和穿透代理超时
+SSE_HEARTBEAT = 25
+# 每个进程同时保持的 SSE 连接上限：每条连接占用一个 gthread 线程，须小于线程数，给普通请求留出余量
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 48))
+# 超过上限时建议客户端的重试间隔（毫秒）
+SSE_REJECT_RETRY = 60000
+
+# 渲染结果缓存（按数据版本失效）
+response_cache = ResponseCache(max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', 256)))
+
+# 请求计时与指标（METRICS_DIR 用于 gunicorn 多进程汇总）
+metrics = Metrics(snapshot_dir=os.environ.get('METRICS_DIR'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# 慢请求日志阈值（毫秒），0 表示关闭
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# 实时推送：单个后台线程检查数据版本变化
+live_feed = LiveFeed(lambda: data_version(DATA_DIR)[0],
+                     interval=float(os.environ.get('LIVE_CHECK_INTERVAL', 5)))
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
 def login_required(f):
     """登录验证装饰器"""
     @wraps(f)
@@ -32,59 +99,300 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def start_request_timer():
+    metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.endpoint or 'unknown'
+    total, phases = metrics.end_request(route, response.status_code)
+    if SLOW_REQUEST_MS and total * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning("慢请求 %s %s %.1fms (load=%.1fms compute=%.1fms render=%.1fms)",
+                           request.method, request.full_path.rstrip("?"), total * 1000,
+                           phases['load'] * 1000, phases['compute'] * 1000, phases['render'] * 1000)
+    return response
+
+_render_local = threading.local()
+
+@before_render_template.connect_via(app)
+def _render_started(sender, **extra):
+    _render_local.started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, **extra):
+    started = getattr(_render_local, 'started', None)
+    if started is not None:
+        metrics.add_phase('render', time.perf_counter() - started)
+        _render_local.started = None
+
+@app.context_processor
+def inject_static_export():
+    """模板中可用 static_export 判断是否为静态导出"""
+    return {'static_export': app.config['STATIC_EXPORT']}
+
+def static_alerts_path(cursor=None):
+    """静态导出时警报列表分页的路径"""
+    return f"/alerts/{cursor}/" if cursor else "/alerts/"
+
+def cached_response(f):
+    """条件请求 + 渲染缓存装饰器
+
+    ETag 由数据版本和 (路由, 当天日期, 参数) 计算，命中 If-None-Match / If-Modified-Since 时
+    直接返回 304；否则优先返回缓存的渲染结果。数据目录有新情报写入时版本变化，缓存自动失效；
+    页面中"今天"的状态等随日期变化的内容在跨过零点后也会重新渲染。
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version, last_modified = data_version(DATA_DIR)
+        now = datetime.now().astimezone()
+        key = (request.endpoint,
+               now.strftime("%Y-%m-%d"),
+               tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))))
+        # 只带 If-Modified-Since 的客户端也要在零点后重新验证
+        last_modified = max(last_modified, now.replace(hour=0, minute=0, second=0, microsecond=0))
+        etag = make_etag(version, key)
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = make_response('', 304)
+        else:
+            cached = response_cache.get(version, key)
+            metrics.inc('response_cache_hits_total' if cached is not None else 'response_cache_misses_total')
+            if cached is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                cached = (response.get_data(), response.mimetype)
+                response_cache.set(version, key, cached)
+            body, mimetype = cached
+            response = make_response(body, 200)
+            response.mimetype = mimetype
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # 页面需要登录，只允许浏览器私有缓存，且每次都需重新验证
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return decorated_function
+
+def memoize_by_version(f):
+    """按数据版本缓存无参函数的结果"""
+    state = {'version': None, 'value': None}
+    @wraps(f)
+    def decorated_function():
+        version, _ = data_version(DATA_DIR)
+        if state['version'] != version:
+            state['value'] = f()
+            state['version'] = version
+        return state['value']
+    return decorated_function
+
 def load_intel(date_str):
-    """加载指定日期的情报数据"""
-    filepath = DATA_DIR / f"{date_str}.json"
-    if filepath.exists():
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
+    """加载指定日期的情报数据（任意历史格式均转换为规范日报，alerts 为带日期的 Alert 记录）"""
+    metrics.inc('load_intel_calls_total')
+    with metrics.timed('load'):
+        return day_store.read(date_str)
+
+def list_intel_dates():
+    """获取全部每日情报日期（按时间倒序，最新的在前）"""
+    # 日期格式YYYY-MM-DD可以直接字符串排序，排除历史数据文件
+    return [d for d in day_store.dates() if d not in HISTORICAL_FILES]
 
 def get_available_dates():
-    """获取可用的日期列表（按时间倒序，最新的在前）"""
-    dates = []
-    if DATA_DIR.exists():
-        # 获取所有json文件，排除历史数据文件
-        json_files = [f for f in DATA_DIR.glob("*.json") 
-                      if f.stem not in ['historical-2025', 'historical-2025-detailed']]
-        # 按文件名倒序（日期格式YYYY-MM-DD可以直接字符串排序）
-        for f in sorted(json_files, reverse=True):
-            dates.append(f.stem)
-    return dates[:30]
-
-def get_exchange_alerts(exchange_name, days=30):
-    """获取指定交易所的所有历史警报（去重）"""
-    alerts = []
-    seen_titles = set()  # 用于去重
-    dates = get_available_dates()
-    
-    for date_str in dates[:days]:
+    """获取可用的日期列表（最近30天，按时间倒序）"""
+    return list_intel_dates()[:30]
+
+_index_lock = threading.Lock()
+_index_state = {'version': None, 'index': None, 'timeline': None}
+
+def get_alert_index():
+    """获取全部历史警报索引和交易所时间线，数据版本变化时重建"""
+    version, _ = data_version(DATA_DIR)
+    if _index_state['version'] == version:
+        return _index_state['index']
+    with _index_lock:
+        if _index_state['version'] != version:
+            days = []
+            for date_str in list_intel_dates():
+                data = load_intel(date_str)
+                if data and data.get('alerts'):
+                    days.append((date_str, data['alerts'], data.get('runs') or ()))
+            # 历史汇总文件只并入交易所时间线，构建时按事件日期合并一次
+            historical = []
+            for name in HISTORICAL_FILES:
+                data = load_intel(name)
+                if data and data.get('alerts'):
+                    historical.append(data['alerts'])
+            _index_state['index'] = AlertIndex(days)
+            _index_state['timeline'] = ExchangeTimeline(days, historical)
+            _index_state['version'] = version
+            metrics.inc('alert_index_builds_total')
+    return _index_state['index']
+
+def get_exchange_timeline():
+    """各交易所按日期排列的警报（含历史汇总文件），与警报索引一起构建"""
+    get_alert_index()
+    return _index_state['timeline']
+
+@memoize_by_version
+def get_score_index():
+    """各交易所的风险评分（累计扣分数组），数据版本变化时只重新计算变化的日报"""
+    index = ScoreIndex(day_store)
+    # 写入方 upsert 后已保存最新索引，这里通常无需重新计算；web 进程不写文件
+    index.refresh(save=False)
+    return index
+
+def get_exchange_scores(exchange_name, window=DEFAULT_WINDOW, half_life=None, date_from=None, date_to=None):
+    """交易所截至 date_to 的评分和 [date_from, date_to] 的每日评分（默认最近 SCORE_CHART_DAYS 天）"""
+    dates = list_intel_dates()
+    date_to = date_to or (dates[0] if dates else datetime.now().strftime("%Y-%m-%d"))
+    if not date_from:
+        end = datetime.strptime(date_to, "%Y-%m-%d")
+        date_from = (end - timedelta(days=SCORE_CHART_DAYS - 1)).strftime("%Y-%m-%d")
+    span = (datetime.strptime(date_to, "%Y-%m-%d") - datetime.strptime(date_from, "%Y-%m-%d")).days + 1
+    if span > MAX_SCORE_DAYS:
+        raise ValueError(f"日期范围不能超过 {MAX_SCORE_DAYS} 天")
+    index = get_score_index()
+    series = index.series(exchange_name, date_from, date_to, window, half_life)
+    return index.score(exchange_name, date_to, window, half_life), series
+
+@memoize_by_version
+def get_severity_matrix():
+    """交易所 × 日期 风险矩阵，数据版本变化时只重算变化的日期"""
+    matrix = SeverityMatrix(day_store)
+    matrix.refresh(save=False)
+    return matrix
+
+def get_heatmap(date_from=None, date_to=None, exchanges=None, bucket=1):
+    """热力图数据（默认最近 HEATMAP_DAYS 天、全部交易所），参数错误时抛出 ValueError"""
+    dates = list_intel_dates()
+    date_to = date_to or (dates[0] if dates else datetime.now().strftime("%Y-%m-%d"))
+    if not date_from:
+        end = datetime.strptime(date_to, "%Y-%m-%d")
+        date_from = (end - timedelta(days=HEATMAP_DAYS - 1)).strftime("%Y-%m-%d")
+    span = (datetime.strptime(date_to, "%Y-%m-%d") - datetime.strptime(date_from, "%Y-%m-%d")).days + 1
+    if span > MAX_HEATMAP_COLUMNS * max(bucket, 1):
+        raise ValueError(f"列数不能超过 {MAX_HEATMAP_COLUMNS}，请缩小范围或增大 bucket")
+    matrix = get_severity_matrix()
+    return matrix.query(date_from, date_to, exchanges or sorted(matrix.exchanges), bucket)
+
+@memoize_by_version
+def get_correlation_index():
+    """跨交易所关联特征，数据版本变化时只重新提取变化的日报"""
+    index = CorrelationIndex(day_store)
+    index.refresh(save=False)
+    return index
+
+@memoize_by_version
+def get_incident_groups():
+    """全部历史的跨交易所事件组（按最近日期倒序）"""
+    return get_correlation_index().groups()
+
+def get_correlated_incidents(exchange=None, date_from=None, date_to=None):
+    """与 [date_from, date_to] 有交集、涉及 exchange 的事件组"""
+    return [group for group in get_incident_groups()
+            if (exchange is None or exchange in group['exchanges'])
+            and (not date_from or group['end'] >= date_from)
+            and (not date_to or group['start'] <= date_to)]
+
+def get_recent_incident_groups():
+    """最近 CORRELATION_DAYS 天的事件组（Dashboard）"""
+    dates = list_intel_dates()
+    if not dates:
+        return []
+    end = datetime.strptime(dates[0], "%Y-%m-%d")
+    return get_correlated_incidents(date_from=(end - timedelta(days=CORRELATION_DAYS - 1)).strftime("%Y-%m-%d"))
+
+def parse_score_options(args):
+    """解析评分参数：window（天，0 为全部历史）、half_life（衰减半衰期，天）、from / to，格式错误时抛出 ValueError"""
+    window = args.get('window', DEFAULT_WINDOW, type=int)
+    half_life = args.get('half_life', 0, type=int)
+    if window is None or window < 0:
+        raise ValueError("window 必须为非负整数")
+    if half_life is None or not 0 <= half_life <= MAX_HALF_LIFE:
+        raise ValueError(f"half_life 必须为 0-{MAX_HALF_LIFE} 的整数（0 为不衰减）")
+    options = {
+        'window': window or None,
+        'half_life': half_life or None,
+        'date_from': args.get('from') or None,
+        'date_to': args.get('to') or None,
+    }
+    for key in ('date_from', 'date_to'):
+        if options[key]:
+            datetime.strptime(options[key], "%Y-%m-%d")
+    if options['date_from'] and options['date_to'] and options['date_from'] > options['date_to']:
+        raise ValueError("from 不能晚于 to")
+    return options
+
+def warm_up():
+    """预加载索引和状态缓存（gunicorn preload_app 时在 fork 前调用，各 worker 共享）"""
+    get_alert_index()
+    get_score_index()
+    get_severity_matrix()
+    get_incident_groups()
+    get_all_exchange_status()
+
+def parse_alert_filters(args):
+    """解析分页与筛选参数（severity/category 支持逗号分隔多值），格式错误时抛出 ValueError"""
+    def multi(name):
+        values = [v for raw in args.getlist(name) for v in raw.split(',') if v]
+        return set(values) or None
+
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit 必须为正整数")
+    filters = {
+        'severity': multi('severity'),
+        'category': multi('category'),
+        'date_from': args.get('from') or None,
+        'date_to': args.get('to') or None,
+        'cursor': args.get('cursor') or None,
+        'limit': min(limit, MAX_PAGE_SIZE),
+    }
+    for key in ('date_from', 'date_to'):
+        if filters[key]:
+            datetime.strptime(filters[key], "%Y-%m-%d")
+    return filters
+
+def get_exchange_alerts(exchange_name, days=30, date_from=None, date_to=None, limit=None):
+    """获取指定交易所的警报（同一事件只保留最新一条）：默认为最近N天，也可指定 [date_from, date_to]"""
+    if not date_from:
+        dates = get_available_dates()[:days]
+        if not dates:
+            return []
+        date_from = dates[-1]
+    alerts, _ = get_exchange_timeline().query(exchange_name, date_from=date_from, date_to=date_to, limit=limit)
+    return alerts
+
+def get_timeline_ranges(exchange_name):
+    """交易所页面的时间范围选项 [(名称, from)]，from 为 None 表示默认的最近30天"""
+    dates = list_intel_dates()
+    if not dates:
+        return []
+    latest = datetime.strptime(dates[0], "%Y-%m-%d")
+    ranges = [('近30天', None), ('近1年', (latest - timedelta(days=365)).strftime("%Y-%m-%d"))]
+    first = get_exchange_timeline().first_date(exchange_name)
+    if first:
+        ranges.append(('全部', first))
+    return ranges
+
+@memoize_by_version
+def get_latest_status():
+    """各交易所的当前状态：最近7天内最新一天日报中该所第一条警报的严重度（一次读取7天，供所有交易所共用）"""
+    status = {}
+    for date_str in get_available_dates()[:7]:
         data = load_intel(date_str)
-        # 只从alerts获取，避免与key_alerts重复
-        if data and data.get('alerts'):
-            for alert in data['alerts']:
-                if alert.get('exchange') == exchange_name:
-                    title = alert.get('title', '')
-                    # 根据标题去重
-                    if title not in seen_titles:
-                        alert['date'] = date_str
-                        alerts.append(alert)
-                        seen_titles.add(title)
-    
-    return sorted(alerts, key=lambda x: x.get('date', ''), reverse=True)
+        for alert in (data or {}).get('alerts') or ():
+            status.setdefault(alert.get('exchange'), alert.get('severity', 'none'))
+    return status
 
 def get_exchange_current_status(exchange_name):
     """获取交易所当前最新状态"""
-    dates = get_available_dates()
-    
-    for date_str in dates[:7]:  # 查最近7天
-        data = load_intel(date_str)
-        if data and data.get('alerts'):
-            for alert in data.get('alerts', []):
-                if alert.get('exchange') == exchange_name:
-                    return alert.get('severity', 'none')
-    return 'none'
+    return get_latest_status().get(exchange_name, 'none')
 
+@memoize_by_version
 def get_all_exchange_status():
     """获取所有交易所的当前状态"""
     status = {}
@@ -92,6 +400,46 @@ def get_all_exchange_status():
         status[exchange] = get_exchange_current_status(exchange)
     return status
 
+def parse_exchange_names(args):
+    """解析 names（逗号分隔，保持顺序并去重），超过 MAX_BULK_EXCHANGES 个时抛出 ValueError"""
+    names = list(dict.fromkeys(v for raw in args.getlist('names') for v in raw.split(',') if v))
+    if len(names) > MAX_BULK_EXCHANGES:
+        raise ValueError(f"names 最多 {MAX_BULK_EXCHANGES} 个交易所")
+    return names
+
+def get_exchanges_bulk(names, **filters):
+    """多个交易所的状态和警报（每个交易所各自分页，游标可用于 /api/exchange/<名称>）"""
+    timeline = get_exchange_timeline()
+    result = {}
+    for name in names:
+        alerts, next_cursor = timeline.query(name, **filters)
+        result[name] = {
+            'status': get_exchange_current_status(name),
+            'alerts': [a.to_dict() for a in alerts],
+            'alert_count': len(alerts),
+            'next_cursor': next_cursor,
+        }
+    return {'exchanges': result, 'exchange_count': len(result)}
+
+def get_snapshot(date_str, names=None):
+    """某一天各交易所的状态（当天最高严重度）和警报；names 为空时为当天有警报的全部交易所"""
+    alerts, _ = get_alert_index().query(date_from=date_str, date_to=date_str, limit=None)
+    exchanges = {name: [] for name in names or ()}
+    for alert in alerts:
+        if not names or alert.exchange in exchanges:
+            exchanges.setdefault(alert.exchange, []).append(alert)
+    result = {
+        name: {
+            'status': max((a.severity for a in items if a.severity in ALERT_LEVELS),
+                          key=ALERT_LEVELS.index, default='none'),
+            'alerts': [a.to_dict() for a in items],
+            'alert_count': len(items),
+        }
+        for name, items in exchanges.items()
+    }
+    return {'date': date_str, 'exchanges': result, 'exchange_count': len(result),
+            'alert_count': sum(e['alert_count'] for e in result.values())}
+
 def get_problematic_exchanges(days=7):
     """获取近期负面舆论和争议较多的交易所列表（包含分类）"""
     problematic = {}
@@ -123,6 +471,22 @@ def get_problematic_exchanges(days=7):
                         if category == 'security_attack':
                             problematic[ex]['category'] = category
     
+    # 警报量 / 严重度明显高于自身基线的交易所（anomalies.py），即使没有高危警报也列出
+    if dates:
+        anomalies = detect_anomalies(get_severity_matrix(), dates[:days][-1], dates[0])
+        for anomaly in strongest(anomalies):
+            ex = anomaly.exchange
+            if ex not in problematic:
+                problematic[ex] = {
+                    'name': ex,
+                    'severity': anomaly.level,
+                    'category': anomaly.category,
+                    'latest_alert': describe_anomaly(anomaly),
+                    'alert_count': anomaly.value if anomaly.z is not None else 1,
+                    'latest_date': anomaly.date
+                }
+            problematic[ex]['anomaly'] = describe_anomaly(anomaly)
+    
     # 转换为列表，按警报数量排序
     result = list(problematic.values())
     result.sort(key=lambda x: (-x['alert_count'], x['latest_date']), reverse=False)
@@ -139,7 +503,6 @@ def get_significant_alerts(days=7):
         if data and data.get('alerts'):
             for alert in data['alerts']:
                 if alert.get('severity') in ['high', 'critical']:
-                    alert['date'] = date_str
                     alerts.append(alert)
     
     return sorted(alerts, key=lambda x: x.get('date', ''), reverse=True)[:10]
@@ -196,6 +559,7 @@ def index():
 
 @app.route("/dashboard")
 @login_required
+@cached_response
 def dashboard():
     """Dashboard - 首页，按分类展示情报"""
     # 获取最近7天的数据
@@ -210,7 +574,6 @@ def dashboard():
         data = load_intel(date_str)
         if data and data.get('alerts'):
             for alert in data['alerts']:
-                alert['date'] = date_str
                 category = alert.get('category', 'dispute_compliance')
                 if category == 'security_attack':
                     security_attacks.append(alert)
@@ -236,6 +599,12 @@ def dashboard():
     
     # 获取所有交易所的当前状态
     exchange_status = get_all_exchange_status()
+
+    # 监控交易所最近 HEATMAP_DAYS 天的风险热力图
+    heatmap = get_heatmap(exchanges=CER_LIVE_EXCHANGES)
+
+    # 涉及多家交易所的关联事件
+    incident_groups = get_recent_incident_groups()
     
     # 准备今日简报数据
     today_date = datetime.now().strftime("%Y-%m-%d")
@@ -273,34 +642,50 @@ def dashboard():
                           today_time=today_time,
                           today_summary=today_summary,
                           today_highlights=today_highlights,
+                          heatmap=heatmap,
+                          incident_groups=incident_groups,
                           get_severity_color=get_severity_color,
                           get_severity_badge=get_severity_badge)
 
 @app.route("/exchange/<exchange_name>")
 @login_required
+@cached_response
 def exchange_detail(exchange_name):
-    """交易所详情页 - 显示该所的时间线争议事件"""
-    # 获取该交易所的所有历史警报
-    alerts = get_exchange_alerts(exchange_name, days=30)
+    """交易所详情页 - 显示该所的时间线争议事件（from / to 指定范围，默认最近30天）"""
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError as e:
+        return render_template("error.html", message=f"参数错误: {e}"), 400
+    if not date_from:
+        dates = get_available_dates()
+        date_from = dates[-1] if dates else None
+    alerts = get_exchange_alerts(exchange_name, date_from=date_from, date_to=date_to, limit=EXCHANGE_PAGE_LIMIT)
     
-    # 获取今日状态
-    today = datetime.now().strftime("%Y-%m-%d")
-    today_data = load_intel(today)
+    # 当前状态取最新一期日报（不取服务器当天日期：零点后、当天日报写入前页面状态不变，静态导出可按日报判断是否重建）
+    latest_dates = list_intel_dates()
+    latest_data = load_intel(latest_dates[0]) if latest_dates else None
     current_status = 'none'
     
-    if today_data:
-        for alert in today_data.get('alerts', []):
+    if latest_data:
+        for alert in latest_data.get('alerts', []):
             if alert.get('exchange') == exchange_name:
                 current_status = alert.get('severity', 'none')
                 break
     
-    # 统计
+    # 统计（按整个范围计数，不解码警报）
+    counts = get_exchange_timeline().count(exchange_name, date_from, date_to) if date_from else {}
     stats = {
-        'total_alerts': len(alerts),
-        'high_alerts': len([a for a in alerts if a.get('severity') == 'high']),
-        'critical_alerts': len([a for a in alerts if a.get('severity') == 'critical']),
+        'total_alerts': sum(counts.values()),
+        'high_alerts': counts.get('high', 0),
+        'critical_alerts': counts.get('critical', 0),
         'last_alert': alerts[0].get('date') if alerts else None
     }
+    score, score_series = get_exchange_scores(exchange_name)
+    incident_groups = get_correlated_incidents(exchange_name)
     
     # 获取所有交易所的当前状态
     exchange_status = get_all_exchange_status()
@@ -310,6 +695,13 @@ def exchange_detail(exchange_name):
                           alerts=alerts,
                           current_status=current_status,
                           stats=stats,
+                          score=score,
+                          score_status=score_status(score),
+                          score_series=score_series,
+                          score_window=DEFAULT_WINDOW,
+                          incident_groups=incident_groups,
+                          timeline_ranges=get_timeline_ranges(exchange_name),
+                          timeline_from=request.args.get('from') or None,
                           cer_live_exchanges=CER_LIVE_EXCHANGES,
                           exchange_status=exchange_status,
                           get_severity_color=get_severity_color,
@@ -317,6 +709,7 @@ def exchange_detail(exchange_name):
 
 @app.route("/date/<date_str>")
 @login_required
+@cached_response
 def date_view(date_str):
     """查看指定日期的简报"""
     data = load_intel(date_str)
@@ -341,26 +734,33 @@ def date_view(date_str):
 
 @app.route("/alerts")
 @login_required
+@cached_response
 def alerts_list():
-    """所有警报列表"""
-    all_alerts = []
-    dates = get_available_dates()
-    
-    for date_str in dates[:30]:
-        data = load_intel(date_str)
-        if data and data.get('alerts'):
-            for alert in data['alerts']:
-                alert['date'] = date_str
-                all_alerts.append(alert)
-    
-    # 按日期排序
-    all_alerts = sorted(all_alerts, key=lambda x: x.get('date', ''), reverse=True)
+    """所有警报列表（游标分页 + 筛选）"""
+    try:
+        filters = parse_alert_filters(request.args)
+        exchange = request.args.get('exchange') or None
+        alerts, next_cursor = get_alert_index().query(exchange=exchange, **filters)
+    except ValueError as e:
+        return render_template("error.html", message=f"参数错误: {e}"), 400
     
     # 获取所有交易所的当前状态
     exchange_status = get_all_exchange_status()
 
+    # 下一页链接保留当前筛选条件
+    next_url = None
+    if next_cursor and app.config['STATIC_EXPORT']:
+        next_url = static_alerts_path(next_cursor)
+    elif next_cursor:
+        args = request.args.to_dict(flat=False)
+        args['cursor'] = [next_cursor]
+        next_url = url_for('alerts_list', **args)
+
     return render_template("alerts.html",
-                          alerts=all_alerts,
+                          alerts=alerts,
+                          next_url=next_url,
+                          is_first_page=not filters['cursor'],
+                          filters=request.args,
                           cer_live_exchanges=CER_LIVE_EXCHANGES,
                           exchange_status=exchange_status,
                           get_severity_color=get_severity_color,
@@ -369,17 +769,200 @@ def alerts_list():
 # API 路由
 @app.route("/api/exchange/<exchange_name>")
 @login_required
+@cached_response
 def api_exchange(exchange_name):
-    """API: 获取指定交易所的数据"""
-    alerts = get_exchange_alerts(exchange_name, days=30)
+    """API: 获取指定交易所的数据（含历史汇总文件；游标分页，支持 severity/category/from/to 筛选）"""
+    try:
+        filters = parse_alert_filters(request.args)
+        alerts, next_cursor = get_exchange_timeline().query(exchange_name, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
         'exchange': exchange_name,
-        'alerts': alerts,
-        'alert_count': len(alerts)
+        'alerts': [a.to_dict() for a in alerts],
+        'alert_count': len(alerts),
+        'next_cursor': next_cursor
     })
 
+@app.route("/api/exchanges")
+@login_required
+@cached_response
+def api_exchanges():
+    """API: 一次获取多个交易所的状态和警报（names 逗号分隔，默认全部监控交易所；
+    severity/category/from/to/limit 同 /api/exchange/<名称>，每个交易所各自分页）"""
+    try:
+        names = parse_exchange_names(request.args) or CER_LIVE_EXCHANGES
+        filters = parse_alert_filters(request.args)
+        if filters.pop('cursor'):
+            raise ValueError("批量接口不支持 cursor，请用返回的 next_cursor 请求 /api/exchange/<名称>")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_exchanges_bulk(names, **filters))
+
+@app.route("/api/snapshot")
+@login_required
+@cached_response
+def api_snapshot():
+    """API: 某一天（date，默认最新）各交易所的状态和全部警报（names 逗号分隔，默认当天有警报的交易所）"""
+    dates = list_intel_dates()
+    date_str = request.args.get('date') or (dates[0] if dates else None)
+    try:
+        if date_str:
+            datetime.strptime(date_str, "%Y-%m-%d")
+        names = parse_exchange_names(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if date_str not in dates:
+        return jsonify({'error': f"未找到 {date_str} 的数据"}), 404
+    return jsonify(get_snapshot(date_str, names))
+
+@app.route("/api/exchange/<exchange_name>/score")
+@login_required
+@cached_response
+def api_exchange_score(exchange_name):
+    """API: 交易所风险评分及每日评分序列（window / half_life / from / to）"""
+    try:
+        options = parse_score_options(request.args)
+        score, series = get_exchange_scores(exchange_name, **options)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'exchange': exchange_name,
+        'window': options['window'],
+        'half_life': options['half_life'],
+        'score': score,
+        'status': score_status(score),
+        'series': [{'date': d, 'score': v} for d, v in series],
+    })
+
+@app.route("/api/heatmap")
+@login_required
+@cached_response
+def api_heatmap():
+    """API: 交易所 × 日期 风险矩阵（from / to / exchanges 逗号分隔 / bucket 天数）"""
+    try:
+        bucket = request.args.get('bucket', 1, type=int)
+        exchanges = [e for raw in request.args.getlist('exchanges') for e in raw.split(',') if e] or None
+        for key in ('from', 'to'):
+            if request.args.get(key):
+                datetime.strptime(request.args[key], "%Y-%m-%d")
+        heatmap = get_heatmap(request.args.get('from') or None, request.args.get('to') or None, exchanges, bucket)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(heatmap)
+
+@app.route("/api/incidents/correlated")
+@login_required
+@cached_response
+def api_correlated_incidents():
+    """API: 跨交易所关联事件组（from / to / exchange）"""
+    try:
+        for key in ('from', 'to'):
+            if request.args.get(key):
+                datetime.strptime(request.args[key], "%Y-%m-%d")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    groups = get_correlated_incidents(request.args.get('exchange') or None,
+                                      request.args.get('from') or None, request.args.get('to') or None)
+    return jsonify({'groups': groups, 'group_count': len(groups)})
+
+@app.route("/api/export.<any(ndjson, csv):fmt>")
+@login_required
+def api_export(fmt):
+    """API: 流式导出警报（exchange / severity / category 逗号分隔，from / to，historical=1 并入历史汇总文件）
+
+    响应体为生成器，分块传输，逐天读取日报，导出多年历史也不会占用更多内存
+    """
+    def multi(name):
+        return {v for raw in request.args.getlist(name) for v in raw.split(',') if v} or None
+
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    items = iter_alerts(day_store, multi('exchange'), multi('severity'), multi('category'),
+                        date_from, date_to, historical=request.args.get('historical') == '1')
+    filename = "-".join(["cex-alerts", date_from or "start", date_to or "latest"]) + f".{fmt}"
+    response = Response(stream_export(items, fmt), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route("/api/stream")
+@login_required
+def api_stream():
+    """SSE: 推送新警报 (event: alert) 和交易所状态变化 (event: status)
+
+    客户端断线重连时浏览器会带上 Last-Event-ID，服务端据此补发期间遗漏的警报。
+    连接数达到 SSE_MAX_STREAMS 时返回 503（附 retry 与 Retry-After），页面退回轮询或稍后重连，
+    不让空闲的长连接占满 worker 线程。
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None and not is_event_id(last_event_id):
+        last_event_id = None
+    if not stream_slots.acquire(blocking=False):
+        metrics.inc('sse_rejected_total')
+        response = Response(f"retry: {SSE_REJECT_RETRY}\n\n", status=503, mimetype='text/event-stream')
+        response.headers['Retry-After'] = str(SSE_REJECT_RETRY // 1000)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    live_feed.start()
+
+    def generate():
+        generation = live_feed.generation
+        index = get_alert_index()
+        cursor = last_event_id if last_event_id is not None else index.latest_event_id()
+        status = get_all_exchange_status()
+        yield "retry: 5000\n"
+        yield format_event({'status': status}, event='hello', event_id=cursor)
+        while True:
+            # 补发 / 推送游标之后的所有新警报
+            while True:
+                events = index.events_since(cursor)
+                for cursor, alert in events:
+                    yield format_event(alert.to_dict(), event='alert', event_id=cursor)
+                if len(events) < 100:
+                    break
+
+            new_status = get_all_exchange_status()
+            changed = {ex: sev for ex, sev in new_status.items() if status.get(ex) != sev}
+            if changed:
+                status = new_status
+                yield format_event(changed, event='status')
+
+            new_generation = live_feed.wait(generation, timeout=SSE_HEARTBEAT)
+            if new_generation == generation:
+                yield ": keepalive\n\n"
+            generation = new_generation
+            index = get_alert_index()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    # 连接关闭时（含生成器未开始迭代）释放名额
+    response.call_on_close(stream_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 等反向代理的缓冲
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus 指标（设置 METRICS_TOKEN 后需携带 Bearer Token）"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return Response("unauthorized\n", status=401, mimetype='text/plain')
+    gauges = {
+        'response_cache_entries': len(response_cache),
+        'alert_index_size': len(_index_state['index']) if _index_state['index'] is not None else 0,
+    }
+    return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route("/api/dates")
 @login_required
+@cached_response
 def api_dates():
     """API: 获取可用日期列表"""
     return jsonify(get_available_dates())
@@ -0,0 +1,70 @@
+"""
+原子发布
+- atomic_write: 写临时文件 → fsync → rename → fsync 目录；读取方看到的要么是旧文件，要么是完整的新文件，断电也不会留下半个文件
+- write_lock: 写入方之间的跨进程互斥（目录下 .lock 文件上的 flock），防止两个采集任务同时改 refs.json / .generation 时互相覆盖
+- 读取方从不加锁：已发布的文件不会再被原地修改，版本变化由 .generation 通知
+"""
+
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+LOCK_FILE = ".lock"
+
+_held = {}
+_held_guard = threading.Lock()
+
+
+def fsync_dir(dirpath):
+    """把目录项（rename 结果）刷到磁盘"""
+    fd = os.open(dirpath, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(filepath, content):
+    """原子写入 bytes / str，返回文件路径"""
+    filepath = Path(filepath)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    tmp = filepath.with_name(f".{filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filepath)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    fsync_dir(filepath.parent)
+    return filepath
+
+
+@contextmanager
+def write_lock(dirpath):
+    """目录级写锁（跨进程；同一进程内可重入）"""
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+    key = str(dirpath.resolve())
+    with _held_guard:
+        entry = _held.setdefault(key, [threading.RLock(), None, 0])
+    lock = entry[0]
+    with lock:
+        if entry[2] == 0:
+            fd = os.open(dirpath / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            entry[1] = fd
+        entry[2] += 1
+        try:
+            yield
+        finally:
+            entry[2] -= 1
+            if entry[2] == 0:
+                fcntl.flock(entry[1], fcntl.LOCK_UN)
+                os.close(entry[1])
+                entry[1] = None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Web 压测
+通过 Flask test client 依次请求所有路由，输出吞吐量和延迟分位数，
+用于比较存储和缓存改动前后的表现。
+
+用法:
+    python synth_data.py --out /tmp/cex-synth --days 365 --exchanges 300
+    python benchmark.py --data /tmp/cex-synth --requests 50
+    python benchmark.py --data /tmp/cex-synth --no-cache --json before.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+
+def percentile(samples, pct):
+    """分位数（最近秩法）"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[rank]
+
+
+def build_routes(web, rng, samples):
+    """构造待测路由：固定页面 + 随机抽样的交易所 / 日期页"""
+    dates = web.list_intel_dates()
+    exchanges = web.get_alert_index().exchanges() or web.CER_LIVE_EXCHANGES
+    routes = {
+        'dashboard': ['/dashboard'],
+        'alerts_list': ['/alerts'],
+        'alerts_filtered': ['/alerts?severity=high&category=security_attack'],
+        'api_dates': ['/api/dates'],
+        'exchange_detail': [f"/exchange/{ex}" for ex in rng.sample(exchanges, min(samples, len(exchanges)))],
+        'api_exchange': [f"/api/exchange/{ex}" for ex in rng.sample(exchanges, min(samples, len(exchanges)))],
+        'api_exchanges': ['/api/exchanges'],
+        'api_snapshot': ['/api/snapshot'],
+    }
+    if dates:
+        routes['date_view'] = [f"/date/{d}" for d in rng.sample(dates, min(samples, len(dates)))]
+    return routes
+
+
+def run(requests_per_route=50, samples=20, seed=1):
+    """执行压测，返回 {路由: 统计}"""
+    import app as web
+
+    rng = random.Random(seed)
+    client = web.app.test_client()
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+
+    started = time.perf_counter()
+    web.get_alert_index()
+    index_build = time.perf_counter() - started
+
+    results = {'_index_build_ms': round(index_build * 1000, 2)}
+    for name, urls in build_routes(web, rng, samples).items():
+        latencies = []
+        cold = None
+        t0 = time.perf_counter()
+        for i in range(requests_per_route):
+            url = urls[i % len(urls)]
+            t = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - t
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} 返回 HTTP {response.status_code}")
+            if cold is None:
+                cold = elapsed
+            latencies.append(elapsed * 1000)
+        wall = time.perf_counter() - t0
+        results[name] = {
+            'requests': requests_per_route,
+            'throughput_rps': round(requests_per_route / wall, 1),
+            'cold_ms': round(cold * 1000, 2),
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2),
+        }
+    return results
+
+
+def print_report(results):
+    print(f"索引构建: {results['_index_build_ms']} ms")
+    header = f"{'路由':<18}{'req/s':>9}{'冷启动':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        if name.startswith('_'):
+            continue
+        print(f"{name:<18}{stats['throughput_rps']:>9}{stats['cold_ms']:>10}{stats['p50_ms']:>9}"
+              f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web 路由压测")
+    parser.add_argument("--data", help="情报数据目录 (默认使用 web/data/intelligence)")
+    parser.add_argument("--requests", type=int, default=50, help="每个路由的请求数 (默认 50)")
+    parser.add_argument("--samples", type=int, default=20, help="交易所 / 日期页抽样数量 (默认 20)")
+    parser.add_argument("--no-cache", action="store_true", help="关闭渲染缓存，测量完整渲染耗时")
+    parser.add_argument("--json", help="把结果保存为 JSON 文件，便于前后对比")
+    args = parser.parse_args()
+
+    # 必须在导入 app 之前设置
+    if args.data:
+        os.environ['CEX_DATA_DIR'] = args.data
+    if args.no_cache:
+        os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    results = run(args.requests, args.samples)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
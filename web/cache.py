@@ -0,0 +1,100 @@
+"""
+响应缓存与数据版本
+- 写入方每次发布新数据后更新情报目录下的 .generation 文件，各进程只需 stat 这一个文件即可感知变化
+- 数据文件均为原子发布（atomic.py），版本未变时缓存的渲染结果一定对应完整的数据
+- 没有 .generation 文件时，数据版本由目录中 JSON 文件的 (文件名, mtime, 大小) 计算得出
+- 渲染结果按 (路由, 参数) 缓存，数据版本变化时整体失效
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from atomic import atomic_write, write_lock
+
+
+GENERATION_FILE = ".generation"
+
+
+def current_generation(data_dir):
+    """当前代数（没有 .generation 文件时为 0）；只增不减，可作为发布序号"""
+    try:
+        return int((data_dir / GENERATION_FILE).read_text().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(data_dir):
+    """写入新数据后调用：在写锁内递增代数并原子替换 .generation，通知所有进程刷新"""
+    with write_lock(data_dir):
+        generation = current_generation(data_dir)
+        atomic_write(data_dir / GENERATION_FILE, str(generation + 1))
+    return generation + 1
+
+
+def data_version(data_dir):
+    """计算情报目录的数据版本，返回 (版本号, 最后修改时间)"""
+    try:
+        stat = (data_dir / GENERATION_FILE).stat()
+    except OSError:
+        stat = None
+    if stat is not None:
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+        return f"g{stat.st_mtime_ns:x}{stat.st_size:x}", last_modified
+
+    digest = hashlib.sha1()
+    latest_mtime = 0
+    if data_dir.exists():
+        for filepath in sorted(data_dir.glob("*.json")):
+            stat = filepath.stat()
+            digest.update(f"{filepath.name}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+            latest_mtime = max(latest_mtime, stat.st_mtime)
+    last_modified = datetime.fromtimestamp(int(latest_mtime), tz=timezone.utc)
+    return digest.hexdigest()[:16], last_modified
+
+
+def make_etag(version, key):
+    """根据数据版本和缓存键生成 ETag"""
+    return hashlib.sha1(f"{version}:{key!r}".encode()).hexdigest()[:20]
+
+
+class ResponseCache:
+    """按数据版本失效的渲染结果缓存 (LRU)"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        """读取缓存，数据版本变化时清空全部条目"""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, version, key, value):
+        """写入缓存（仅当版本仍为当前版本）"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """清空缓存（新情报写入后调用）"""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,180 @@
+"""
+情报分类器
+分类体系与关键词见 docs/INTELLIGENCE_CATEGORIES_DESIGN.md（三大类、子类别及第五节的关键词），
+此前分散在 migrate_categories.py 和同步脚本中的两套关键词也合并到这里。
+
+- 全部关键词编译为一个 Aho–Corasick 自动机，每条警报只需对文本扫描一遍（与关键词数量无关）
+- 英文关键词按词边界匹配（"fine" 不会命中 "define"），中文关键词按子串匹配
+- 大类按优先级判断：攻击 > 运营 > 合规，命中任一关键词即归入该类；子类别取该类中命中最多的一项；
+  都未命中时归为合规争议（与旧规则一致）
+- 返回命中的关键词作为依据
+"""
+
+from collections import Counter, namedtuple
+
+from records import DEFAULT_CATEGORY
+
+# 大类 → 子类别 → 关键词（按优先级排列）
+KEYWORDS = {
+    'security_attack': {
+        'fund_theft': ['hack', 'hacked', 'hacker', 'stolen', 'drain', 'drained', 'theft', 'private key',
+                       'wallet compromised', 'hot wallet', 'cold wallet', 'bridge exploit',
+                       '黑客', '被盗', '盗取', '私钥', '热钱包', '冷钱包', '卷款'],
+        'system_intrusion': ['breach', 'unauthorized access', 'malware', 'backdoor', 'data leak',
+                             'api key leak', 'phishing', '入侵', '数据泄露', '后门', '钓鱼'],
+        'service_disruption': ['ddos', 'ransomware', 'dns hijack', '勒索', 'dns劫持', '攻击'],
+        'vulnerability_exploit': ['exploit', 'exploited', 'vulnerability', 'bug', 'glitch', 'zero-day',
+                                  'smart contract', '漏洞', '零日'],
+    },
+    'operational_risk': {
+        'leadership_crisis': ['ceo arrested', 'founder detained', 'founder arrested', 'executive arrested',
+                              'ceo resigns', '被捕', '逮捕', '创始人被捕', '高管离职', '失联'],
+        'liquidity_crisis': ['withdrawal suspended', 'withdrawals suspended', 'liquidity crisis', 'run on',
+                             'bank run', 'insolvency', '挤兑', '暂停提现', '流动性危机', '储备金'],
+        'technical_failure': ['system down', 'outage', 'maintenance', 'rollback', '宕机', '系统故障', '回滚'],
+        'financial_risk': ['bankruptcy', 'bankrupt', 'liquidation', 'massive layoff', 'layoffs',
+                           'office closed', 'shutdown', 'acquisition', '破产', '裁员', '跑路', '清算', '收购'],
+    },
+    'dispute_compliance': {
+        'regulatory_action': ['regulatory', 'regulator', 'fine', 'fined', 'penalty', 'license revoked',
+                              'license suspended', 'suspended', 'banned', 'blacklist', 'warning list',
+                              '牌照', '监管', '罚款', '吊销', '禁止', '黑名单'],
+        'user_asset_issue': ['frozen', 'freeze', 'seized', 'confiscated', 'cannot withdraw', 'unable to withdraw',
+                             '冻结', '无法提现', '提现困难', '资产消失'],
+        'compliance_violation': ['compliance', 'aml', 'kyc', 'money laundering', 'sanction', 'sanctions', 'ofac',
+                                 'tax', '合规', '洗钱', '反洗钱', '制裁', '税务'],
+        'public_dispute': ['lawsuit', 'legal action', 'investigation', 'user complaint', 'controversy', 'fud',
+                           'whistleblower', '诉讼', '争议', '投诉', '维权', '调查'],
+        'commercial_dispute': ['copyright', 'plagiarism', 'piracy', 'contract dispute', 'fraud allegation',
+                               '盗用', '侵权', '合同纠纷', '终止合作'],
+    },
+}
+
+Classification = namedtuple('Classification', 'category subcategory terms')
+
+
+class KeywordAutomaton:
+    """Aho–Corasick 多模式匹配（输入需已 casefold）"""
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (index,)
+
+        # 广度优先计算失败指针，输出沿失败链合并
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def tables(self):
+        """(转移表, 失败指针, 输出)，供调用方内联扫描"""
+        return self._goto, self._fail, self._out
+
+    def finditer(self, text):
+        """产出 (结束位置, 关键词下标)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield pos + 1, index
+
+
+def _is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+
+class Classifier:
+    """编译后的分类器"""
+
+    def __init__(self, keywords=KEYWORDS):
+        self._labels = []  # 关键词下标 → (大类, 子类别)
+        terms = []
+        for category, subcategories in keywords.items():
+            for subcategory, words in subcategories.items():
+                for word in words:
+                    terms.append(word.casefold())
+                    self._labels.append((category, subcategory))
+        self._priority = {category: i for i, category in enumerate(keywords)}
+        self._order = {category: list(subcategories) for category, subcategories in keywords.items()}
+        self._automaton = KeywordAutomaton(terms)
+        # 各关键词首 / 尾是否需要词边界检查
+        self._bounded = [(_is_word_char(t[0]), _is_word_char(t[-1])) for t in terms]
+
+    def matches(self, text):
+        """文本中命中的 (关键词, 大类, 子类别)，按出现顺序"""
+        text = text.casefold()
+        terms, labels, bounded = self._automaton.terms, self._labels, self._bounded
+        goto, fail, out = self._automaton.tables()
+        hits = []
+        state = 0
+        size = len(text)
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                # 英文关键词两端须为词边界
+                left, right = bounded[index]
+                end = pos + 1
+                if left:
+                    start = end - len(terms[index])
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                if right and end < size and _is_word_char(text[end]):
+                    continue
+                hits.append((terms[index], *labels[index]))
+        return hits
+
+    def classify(self, title, description=""):
+        """返回 Classification(大类, 子类别, 命中关键词)"""
+        hits = self.matches(f"{title} {description}")
+        if not hits:
+            return Classification(DEFAULT_CATEGORY, "", ())
+        priority = self._priority
+        category = min((c for _, c, _ in hits), key=priority.__getitem__)
+        counts = Counter(s for _, c, s in hits if c == category)
+        # 命中最多的子类别，相同时取靠前的
+        subcategory = max(self._order[category], key=counts.__getitem__)
+        terms = tuple(dict.fromkeys(term for term, c, _ in hits if c == category))
+        return Classification(category, subcategory, terms)
+
+    def classify_many(self, alerts):
+        """批量分类（Alert 或字典），返回 Classification 列表"""
+        return [self.classify(alert.get('title', ""), alert.get('description', "")) for alert in alerts]
+
+
+_default = None
+
+
+def default_classifier():
+    """进程内共享的默认分类器（首次使用时编译）"""
+    global _default
+    if _default is None:
+        _default = Classifier()
+    return _default
+
+
+def classify(title, description=""):
+    return default_classifier().classify(title, description)
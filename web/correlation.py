@@ -0,0 +1,333 @@
+"""
+跨交易所事件关联
+同一事件常涉及多家交易所（如 Bybit 被盗后 OKX 冻结黑客资金），各交易所的警报却各自成行。
+这里把不同交易所、时间相近、共享实体 / 链接 / 关键词的警报连成事件组，界面和 API 按组展示。
+
+- 特征：来源链接（去掉协议、www、查询参数）、链上地址 / 交易哈希、黑客组织等实体（ACTORS）、
+  正文中提到的交易所、分类关键词（classifier.py）；实体名编译为一个自动机，每条警报扫描一遍
+- 提到的交易所不在提取时匹配：只记下正文中像名称的片段（含大写字母或点号的连续英文词，如 Coinbase Exchange、
+  crypto.com），关联时再与当前的交易所名单比对，名单变化不需要重新读取历史日报
+- 候选：按特征建倒排表，只在同一特征的倒排表中找 LINK_DAYS 天内、其他交易所的警报，
+  每个特征最多看最近 MAX_POSTINGS 条，不做两两比较，开销与警报数成正比
+- 打分：共享链接 / 地址 5 分，实体 3 分，提到对方（或同一家第三方交易所）3 分，共享关键词每个 1 分（最多 2 个），
+  达到 LINK_THRESHOLD 即相连；连通分量为一个事件组
+- 同一交易所的近似重复由 incidents.py 处理，这里每天每个事件只取一条（collapse）
+- 各日报的特征持久化在存储目录的 correlations.index，写入方在 upsert 后增量刷新（与 scores.py 相同）
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date
+import re
+from urllib.parse import urlsplit
+
+from atomic import atomic_write, write_lock
+from classifier import Classifier, default_classifier
+from incidents import collapse, incident_of
+from schema import ALERT_LEVELS
+
+INDEX_NAME = "correlations.index"
+INDEX_VERSION = 2
+
+LINK_DAYS = 30
+MAX_POSTINGS = 64
+
+# 特征前缀 → 共享时的得分
+WEIGHTS = {'u': 5, 'a': 5, 'p': 3, 'x': 3}
+KEYWORD_WEIGHT = 1
+MAX_KEYWORDS = 2
+LINK_THRESHOLD = 5
+
+# 常见的攻击者 / 洗钱渠道：规范名 → 别名
+ACTORS = {
+    'Lazarus': ['lazarus', 'lazarus group', 'lazarus集团', 'tradertraitor'],
+    'DPRK': ['north korea', 'north korean', 'dprk', '朝鲜'],
+    'Scattered Spider': ['scattered spider'],
+    'Tornado Cash': ['tornado cash'],
+    'THORChain': ['thorchain'],
+    'Garantex': ['garantex'],
+}
+
+_ADDRESS = re.compile(r'\b0x(?:[0-9a-f]{64}|[0-9a-f]{40})\b')
+_WORD = re.compile(r'[A-Za-z0-9](?:[A-Za-z0-9.\-]*[A-Za-z0-9])?')
+# 名称片段中参与比对的最多连续词数（多个词的交易所名）
+MAX_NAME_WORDS = 3
+
+
+def _ordinal(value):
+    """YYYY-MM-DD（或 YYYY-MM，记为当月 1 日）→ 序数；无法解析时返回 None"""
+    value = (value or "")[:10]
+    if len(value) == 7:
+        value += "-01"
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return None
+
+
+def url_key(url):
+    """来源链接 → 特征（只有域名、没有路径的链接不算）"""
+    parts = urlsplit((url or "").strip().casefold())
+    host = parts.netloc.removeprefix('www.')
+    path = parts.path.rstrip('/')
+    return f"u:{host}{path}" if host and path else None
+
+
+def _aliases(name):
+    """交易所名 → 匹配用的别名（多个词的名称另加首词，如 Coinbase Exchange → coinbase）"""
+    aliases = [name]
+    first = name.split()[0] if ' ' in name else ""
+    if len(first) >= 4:
+        aliases.append(first)
+    return aliases
+
+
+def name_spans(text):
+    """正文中可能是名称的片段（小写）：含大写字母或点号的词，空格相连的合为一段"""
+    spans, words, end = [], [], None
+    for match in _WORD.finditer(text):
+        word = match.group()
+        if not any(c.isupper() or c == '.' for c in word):
+            continue
+        if words and text[end:match.start()].isspace():
+            words.append(word)
+        else:
+            if words:
+                spans.append(" ".join(words).casefold())
+            words = [word]
+        end = match.end()
+    if words:
+        spans.append(" ".join(words).casefold())
+    return sorted(set(spans))
+
+
+def alias_table(exchanges):
+    """交易所名单 → {小写别名: 交易所名}"""
+    table = {}
+    for name in sorted(exchanges):
+        for alias in _aliases(name):
+            table.setdefault(alias.casefold(), name)
+    return table
+
+
+def mentions(spans, aliases):
+    """名称片段中提到的交易所（按 alias_table 比对连续 1 ~ MAX_NAME_WORDS 个词）"""
+    found = set()
+    for span in spans:
+        words = span.split()
+        for i in range(len(words)):
+            for n in range(1, min(MAX_NAME_WORDS, len(words) - i) + 1):
+                name = aliases.get(" ".join(words[i:i + n]))
+                if name:
+                    found.add(name)
+    return found
+
+
+class FeatureExtractor:
+    """警报 → (特征, 关键词, 名称片段)"""
+
+    def __init__(self):
+        self._entities = Classifier({'actor': ACTORS})
+
+    def features(self, alert):
+        text = f"{alert.title} {alert.description}"
+        keys = {f"p:{name}" for _, _, name in self._entities.matches(text)}
+        keys.update(f"a:{address}" for address in _ADDRESS.findall(text.casefold()))
+        url = url_key(alert.url)
+        if url:
+            keys.add(url)
+        terms = {term for term, _, _ in default_classifier().matches(text)}
+        return sorted(keys), sorted(terms), name_spans(text)
+
+
+def link_score(keys_a, terms_a, keys_b, terms_b):
+    """两条警报的关联得分和依据（共享的特征 / 关键词）"""
+    shared = sorted(keys_a & keys_b)
+    score = 0
+    mentioned = False
+    for key in shared:
+        if key[0] == 'x':
+            mentioned = True
+        else:
+            score += WEIGHTS[key[0]]
+    if mentioned:
+        score += WEIGHTS['x']
+    terms = sorted(terms_a & terms_b)[:MAX_KEYWORDS]
+    score += KEYWORD_WEIGHT * len(terms)
+    return score, [key[2:] for key in shared] + terms
+
+
+class CorrelationIndex:
+    """各日报警报的关联特征，及按时间窗口连成的事件组"""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.root / INDEX_NAME
+        self.days = {}    # 来源 → 索引时的版本
+        self.nodes = {}   # 来源 → [[序数, 交易所, 事件ID, 严重度, 特征, 关键词, 名称片段], ...]
+        self._timeline = None
+        self._aliases = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.days, self.nodes = data['days'], data['nodes']
+        except (OSError, ValueError):
+            pass
+
+    # ---------- 更新 ----------
+
+    def refresh(self, save=True):
+        """与存储同步：只重新提取新增或变化的来源，返回处理的来源数"""
+        current = {name: self.store.version(name) for name in self.store.dates()}
+        changed = [s for s, version in current.items() if self.days.get(s) != version]
+        removed = [s for s in self.days if s not in current]
+        if not changed and not removed:
+            return 0
+
+        extractor = FeatureExtractor()
+        for source in removed:
+            self.nodes.pop(source, None)
+        for source in changed:
+            self.nodes[source] = [self._node(extractor, alert, source) for alert in self._read(source)]
+            self.nodes[source] = [node for node in self.nodes[source] if node[0] is not None]
+        self.days = current
+        self._timeline = self._aliases = None
+        if save:
+            self.save()
+        return len(changed) + len(removed)
+
+    def _read(self, source):
+        day = self.store.read(source)
+        return [alert for alert in collapse(day['alerts']) if alert.exchange] if day else []
+
+    @staticmethod
+    def _node(extractor, alert, source):
+        # 按事件日期关联（历史汇总文件只有事件日期），没有时用日报日期
+        ordinal = _ordinal(alert.event_date) or _ordinal(source)
+        keys, terms, spans = extractor.features(alert)
+        return [ordinal, alert.exchange, incident_of(alert), alert.severity, keys, terms, spans]
+
+    def save(self):
+        with write_lock(self.store.root):
+            data = {'version': INDEX_VERSION, 'days': self.days, 'nodes': self.nodes}
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    # ---------- 读取 ----------
+
+    def timeline(self):
+        """按日期排列的 (序数, 来源, 下标)"""
+        if self._timeline is None:
+            self._timeline = sorted((node[0], source, i) for source, nodes in self.nodes.items()
+                                    for i, node in enumerate(nodes))
+        return self._timeline
+
+    def mentioned(self, node):
+        """警报提到的其他交易所的特征 x:名称（名单为索引中出现过的全部交易所；按名称片段缓存）"""
+        if self._aliases is None:
+            self._aliases = (alias_table({n[1] for nodes in self.nodes.values() for n in nodes}), {})
+        aliases, cache = self._aliases
+        key = (node[1], *node[6])
+        found = cache.get(key)
+        if found is None:
+            found = cache[key] = frozenset(f"x:{name}" for name in mentions(node[6], aliases) if name != node[1])
+        return found
+
+    def groups(self, date_from=None, date_to=None, window=LINK_DAYS):
+        """[date_from, date_to] 内（含 window 天前的关联警报）的事件组，按最近日期倒序
+
+        返回 [{'id', 'start', 'end', 'exchanges', 'severity', 'reasons', 'alerts'}]
+        """
+        timeline = self.timeline()
+        ordinals = [entry[0] for entry in timeline]
+        first = _ordinal(date_from) if date_from else None
+        lo = bisect_left(ordinals, first - window) if first is not None else 0
+        hi = bisect_right(ordinals, _ordinal(date_to)) if date_to else len(timeline)
+
+        parent = list(range(hi - lo))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        postings = {}
+        features = []
+        reasons = []
+        for i in range(hi - lo):
+            ordinal, source, k = timeline[lo + i]
+            node = self.nodes[source][k]
+            own = f"x:{node[1]}"
+            keys = set(node[4])
+            keys |= self.mentioned(node)
+            terms = set(node[5])
+            # 提到某交易所的警报既与该所自己的警报（o:）比较，也与同样提到它的警报比较；
+            # 自己的警报只与提到本所的警报比较，不扫描本所的全部警报
+            lookups = [own] + [f"o:{key[2:]}" for key in keys if key[0] == 'x'] + list(keys)
+            keys.add(own)
+            features.append((keys, terms))
+            seen = set()
+            for key in lookups:
+                bucket = postings.get(key, ())
+                for j in reversed(bucket[-MAX_POSTINGS:]):
+                    if ordinals[lo + j] < ordinal - window:
+                        break
+                    _, other_source, other_k = timeline[lo + j]
+                    other = self.nodes[other_source][other_k]
+                    identity = (other[1], other[2])
+                    if other[1] == node[1] or identity in seen:
+                        continue
+                    seen.add(identity)
+                    score, shared = link_score(keys, terms, *features[j])
+                    if score >= LINK_THRESHOLD:
+                        parent[find(i)] = find(j)
+                        reasons.append((i, shared))
+            for key in keys:
+                if key != own:
+                    postings.setdefault(key, []).append(i)
+            postings.setdefault(f"o:{node[1]}", []).append(i)
+
+        components = {}
+        for i in range(hi - lo):
+            components.setdefault(find(i), []).append(i)
+        labels = {}
+        for i, shared in reasons:
+            labels.setdefault(find(i), []).extend(shared)
+
+        result = []
+        for root, members in components.items():
+            if len(members) < 2 or (first is not None and ordinals[lo + members[-1]] < first):
+                continue
+            result.append(self._group([timeline[lo + i] for i in members], labels.get(root, [])))
+        result.sort(key=lambda g: (g['end'], g['start']), reverse=True)
+        return result
+
+    def _group(self, entries, labels):
+        """成员 (序数, 来源, 下标) → 事件组（同一交易所同一事件只保留最早的一条）"""
+        members = {}
+        for ordinal, source, k in entries:
+            node = self.nodes[source][k]
+            members.setdefault((node[1], node[2]), (ordinal, source, node))
+        days = {}
+        alerts = []
+        for ordinal, source, node in members.values():
+            if source not in days:
+                day = self.store.read(source)
+                days[source] = {(a.exchange, incident_of(a)): a for a in collapse(day['alerts'])} if day else {}
+            alert = days[source].get((node[1], node[2]))
+            if alert is not None:
+                alerts.append(dict(alert.to_dict(), date=date.fromordinal(ordinal).isoformat()))
+        ordinals = [ordinal for ordinal, _, _ in members.values()]
+        severity = max((node[3] for _, _, node in members.values()),
+                       key=lambda s: ALERT_LEVELS.index(s) if s in ALERT_LEVELS else 0)
+        first = min(members.values(), key=lambda m: m[0])
+        return {
+            'id': first[2][2],
+            'start': date.fromordinal(min(ordinals)).isoformat(),
+            'end': date.fromordinal(max(ordinals)).isoformat(),
+            'exchanges': list(dict.fromkeys(node[1] for _, _, node in members.values())),
+            'severity': severity,
+            'reasons': list(dict.fromkeys(labels)),
+            'alerts': alerts,
+        }
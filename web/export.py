@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+警报导出（NDJSON / CSV）
+按交易所、日期范围、严重度、分类筛选全部历史警报，逐天读取日报、逐块产出文本：
+内存占用只与单日日报大小有关，与导出的时间跨度无关。web 端的 /api/export.ndjson、/api/export.csv
+直接把生成器作为分块传输的响应体。
+
+- 按日期顺序输出（旧 → 新）；同一天内保持日报中的顺序
+- 历史汇总文件（historical-2025 等）的警报可选并入，按事件日期排序后与每日情报归并
+- NDJSON 每行一条警报（Alert.to_dict，含 date）；CSV 为 FIELDS 各列，tags 以分号连接
+
+用法:
+    python export.py --format csv --exchange Binance --from 2025-01-01 > binance.csv
+    python export.py --severity high,critical --historical --out alerts.ndjson
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import re
+import sys
+from pathlib import Path
+
+from records import dumps
+from store import DayStore
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# CSV 列（按顺序）
+FIELDS = ('date', 'exchange', 'category', 'subcategory', 'severity', 'title', 'description',
+          'event_date', 'source', 'url', 'discovered_at', 'tags', 'incident')
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _matches(alert, exchanges, severities, categories):
+    return ((not exchanges or alert.exchange in exchanges)
+            and (not severities or alert.severity in severities)
+            and (not categories or alert.category in categories))
+
+
+def _daily(store, dates, filters):
+    """每日情报，按天产出 [(日期, 警报), ...]"""
+    for date_str in dates:
+        day = store.read(date_str)
+        if day:
+            yield [(date_str, alert) for alert in day['alerts'] if _matches(alert, *filters)]
+
+
+def _historical(store, names, date_from, date_to, filters):
+    """历史汇总文件中事件日期在范围内的警报，按事件日期排序（文件很小，一次读入）"""
+    items = []
+    for name in names:
+        day = store.read(name)
+        for alert in day['alerts'] if day else ():
+            date_str = alert.event_date[:10]
+            if not _DATE_PATTERN.match(date_str):
+                continue
+            if (date_from and date_str < date_from) or (date_to and date_str > date_to):
+                continue
+            if _matches(alert, *filters):
+                items.append((date_str, alert.with_date(date_str)))
+    items.sort(key=lambda item: item[0])
+    return items
+
+
+def iter_alerts(store, exchanges=None, severities=None, categories=None,
+                date_from=None, date_to=None, historical=False):
+    """按条件逐条产出 (日期, 警报)，日期从旧到新；筛选条件为集合，None 表示不限"""
+    names = store.dates()
+    dates = sorted(d for d in names if _DATE_PATTERN.match(d)
+                   and (not date_from or d >= date_from) and (not date_to or d <= date_to))
+    filters = (exchanges, severities, categories)
+    daily = (item for batch in _daily(store, dates, filters) for item in batch)
+    if not historical:
+        return daily
+    others = [n for n in names if not _DATE_PATTERN.match(n)]
+    return heapq.merge(_historical(store, others, date_from, date_to, filters), daily, key=lambda item: item[0])
+
+
+def _csv_row(alert):
+    data = alert.to_dict()
+    data['tags'] = ";".join(alert.tags)
+    return [data.get(name, "") for name in FIELDS]
+
+
+def stream(items, fmt, chunk_size=500):
+    """(日期, 警报) → 文本块；每 chunk_size 条产出一次"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}（可选 {', '.join(FORMATS)}）")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == 'csv' else None
+    if writer:
+        writer.writerow(FIELDS)
+    count = 0
+    for _, alert in items:
+        if writer:
+            writer.writerow(_csv_row(alert))
+        else:
+            buffer.write(dumps(alert.to_dict()))
+            buffer.write("\n")
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _split(value):
+    return {v for v in (value or "").split(",") if v} or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出警报（NDJSON / CSV）")
+    parser.add_argument("--root", type=Path, default=Path(__file__).parent / "data" / "intelligence",
+                        help="存储目录 (默认 web/data/intelligence)")
+    parser.add_argument("--format", choices=list(FORMATS), default='ndjson', help="输出格式 (默认 ndjson)")
+    parser.add_argument("--exchange", help="交易所（逗号分隔）")
+    parser.add_argument("--severity", help="严重度（逗号分隔）")
+    parser.add_argument("--category", help="分类（逗号分隔）")
+    parser.add_argument("--from", dest="date_from", help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--historical", action="store_true", help="并入历史汇总文件（按事件日期）")
+    parser.add_argument("--out", type=Path, help="输出文件 (默认标准输出)")
+    args = parser.parse_args()
+
+    for value in (args.date_from, args.date_to):
+        if value and not _DATE_PATTERN.match(value):
+            parser.error(f"日期格式应为 YYYY-MM-DD: {value}")
+
+    items = iter_alerts(DayStore(args.root), _split(args.exchange), _split(args.severity), _split(args.category),
+                        args.date_from, args.date_to, args.historical)
+    out = open(args.out, 'w', encoding='utf-8', newline='') if args.out else sys.stdout
+    try:
+        for chunk in stream(items, args.format):
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
+    if args.out:
+        print(f"✅ 已导出到 {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+警报指纹索引
+- 全部历史日报中每个警报指纹（records.fingerprint）出现过的日期，判断"今日新增"只需一次字典查询，与历史长度无关
+- 按天分片持久化在存储目录的 fingerprints.d/<日期>.json（可随时删除重建），每片记录当天的对象摘要和指纹；
+  刷新时只重新索引、重写新增或变化的日期（通常只有今天），移除旧条目也只涉及这些日期的指纹。
+  加载时读取全部分片在内存中合并，写入量与历史长度无关
+- 回溯窗口可配置：lookback_days=None 表示全部历史
+"""
+
+import json
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from atomic import atomic_write, write_lock
+from records import fingerprint
+
+INDEX_DIR = "fingerprints.d"
+INDEX_VERSION = 3
+# 旧版本的单文件索引，分片写入后删除
+LEGACY_INDEX_NAME = "fingerprints.index"
+
+# 只索引每日情报（historical-2025 等汇总文件不参与）
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class FingerprintIndex:
+    """指纹 → 出现日期（升序）"""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.root / INDEX_DIR
+        self.days = {}  # 日期 → 索引时的版本（对象摘要，旧文件为 mtime/大小）
+        self.seen = {}  # 指纹 → [日期, ...]
+        self.by_day = {}  # 日期 → [指纹, ...]
+        self._load()
+
+    def _load(self):
+        # 按日期顺序合并分片，各指纹的日期列表自然有序
+        for filepath in sorted(self.path.glob("*.json")):
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get('version') != INDEX_VERSION:
+                continue
+            date_str = filepath.stem
+            self.days[date_str] = data['source']
+            self.by_day[date_str] = data['fingerprints']
+            for fp in data['fingerprints']:
+                self.seen.setdefault(fp, []).append(date_str)
+
+    def refresh(self):
+        """与存储同步，返回重新索引的天数"""
+        current = {d: self.store.version(d) for d in self.store.dates() if _DATE_PATTERN.match(d)}
+        changed = [d for d, version in current.items() if self.days.get(d) != version]
+        removed = [d for d in self.days if d not in current]
+        if not changed and not removed:
+            return 0
+
+        # 变化的日期先移除当天的指纹再重新索引
+        for date_str in changed + removed:
+            for fp in self.by_day.pop(date_str, ()):
+                dates = self.seen.get(fp, [])
+                i = bisect_left(dates, date_str)
+                if i < len(dates) and dates[i] == date_str:
+                    del dates[i]
+                if not dates:
+                    self.seen.pop(fp, None)
+        for date_str in changed:
+            day = self.store.read(date_str)
+            for alert in day['alerts'] if day else ():
+                self.add(alert, date_str)
+        self.days = current
+        self.save(changed, removed)
+        return len(changed)
+
+    def add(self, alert, date_str):
+        """记录警报在 date_str 出现过（仅内存，save() 持久化）"""
+        fp = fingerprint(alert)
+        dates = self.seen.setdefault(fp, [])
+        i = bisect_left(dates, date_str)
+        if i == len(dates) or dates[i] != date_str:
+            dates.insert(i, date_str)
+            self.by_day.setdefault(date_str, []).append(fp)
+
+    def save(self, dates=None, removed=()):
+        """写入指定日期的分片（默认全部），删除 removed 的分片"""
+        with write_lock(self.store.root):
+            self.path.mkdir(exist_ok=True)
+            for date_str in self.days if dates is None else dates:
+                data = {'version': INDEX_VERSION, 'source': self.days[date_str],
+                        'fingerprints': self.by_day.get(date_str, [])}
+                atomic_write(self.path / f"{date_str}.json", json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            for date_str in removed:
+                (self.path / f"{date_str}.json").unlink(missing_ok=True)
+            (self.store.root / LEGACY_INDEX_NAME).unlink(missing_ok=True)
+
+    def last_seen(self, alert, before):
+        """警报在 before 之前最后一次出现的日期，没有则返回 None"""
+        dates = self.seen.get(fingerprint(alert))
+        if not dates:
+            return None
+        i = bisect_left(dates, before)
+        return dates[i - 1] if i else None
+
+    def is_new(self, alert, date_str, lookback_days=None):
+        """警报在 date_str 之前的回溯窗口内是否从未出现"""
+        last = self.last_seen(alert, date_str)
+        if last is None:
+            return True
+        if lookback_days is None:
+            return False
+        start = (datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+        return last < start
+
+    def has_history(self, before):
+        """before 之前是否有任何已索引的日报"""
+        return any(d < before for d in self.days)
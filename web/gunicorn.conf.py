@@ -0,0 +1,34 @@
+"""
+gunicorn 配置
+- preload_app: 主进程在 fork 前加载应用并构建警报索引，worker 以写时复制方式共享
+- gthread: 每个 worker 多线程；每条 SSE 长连接占用一个线程，app.py 按 SSE_MAX_STREAMS 限制连接数（默认 48，
+  须小于 WEB_THREADS），超出的连接返回 503，保证普通请求始终有空闲线程
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 64))
+preload_app = True
+
+
+def when_ready(server):
+    """主进程就绪、fork worker 之前：构建索引，并冻结 GC 以免回收扫描弄脏共享内存页"""
+    import app
+    app.warm_up()
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    """worker 退出前写入最后一次指标快照"""
+    import app
+    app.metrics.flush()
+
+
+def child_exit(server, worker):
+    """主进程回收 worker 后，把它的指标快照并入 retired.json"""
+    import app
+    app.metrics.retire(worker.pid)
@@ -0,0 +1,221 @@
+"""
+交易所 × 日期 风险矩阵（热力图）
+- 每个交易所一行、每天一列：最高严重度（ALERT_LEVELS 中的序号，bytearray）和各分类的事件数（array('H')），
+  同一天同一事件只计一次（incidents.collapse）；只包含每日情报，不含历史汇总文件
+- 一列只来自一天的日报，日报变化时整列重算；新的一天只追加一列，与历史长度无关
+- 按日期范围切片、按 N 天分桶聚合（严重度取最大、数量求和）都是对行切片的整体运算，不逐条读取警报
+- 持久化在存储目录的 heatmap.index：一行 JSON 头（日期轴、交易所、已索引日报的版本）+ 紧凑二进制矩阵，
+  写入方在 upsert 后刷新（与 scores.py 相同）
+"""
+
+import json
+import re
+import sys
+from array import array
+from datetime import date
+
+from atomic import atomic_write, write_lock
+from incidents import collapse
+from schema import ALERT_LEVELS, CATEGORIES
+
+INDEX_NAME = "heatmap.index"
+INDEX_VERSION = 1
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _level(severity):
+    return ALERT_LEVELS.index(severity) if severity in ALERT_LEVELS else 0
+
+
+def _window(row, first, last, empty):
+    """row[first:last]，超出日期轴的部分补零"""
+    size = len(row)
+    head = empty * (min(max(-first, 0), last - first))
+    tail = empty * (min(max(last - size, 0), last - first))
+    return head + row[max(first, 0):max(min(last, size), 0)] + tail
+
+
+class SeverityMatrix:
+    """交易所 × 日期 的严重度与分类数量矩阵"""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.root / INDEX_NAME
+        self.start = None   # 第 0 列的日期序数
+        self.length = 0     # 列数
+        self.days = {}      # 日期 → 索引时的版本
+        self.exchanges = []  # 行顺序
+        self.severity = []  # 每行一个 bytearray
+        self.counts = []    # 每行 {分类: array('H')}
+        self._rows = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return
+        if header.get('version') != INDEX_VERSION or header.get('categories') != list(CATEGORIES):
+            return
+        length = header['length']
+        offset = 0
+        for exchange in header['exchanges']:
+            severity = bytearray(body[offset:offset + length])
+            offset += length
+            counts = {}
+            for category in CATEGORIES:
+                counts[category] = array('H', body[offset:offset + 2 * length])
+                if header['byteorder'] != sys.byteorder:
+                    counts[category].byteswap()
+                offset += 2 * length
+            self._add_row(exchange, severity, counts)
+        self.start = header['start'] and date.fromisoformat(header['start']).toordinal()
+        self.length = length
+        self.days = header['days']
+
+    def _add_row(self, exchange, severity=None, counts=None):
+        self._rows[exchange] = len(self.exchanges)
+        self.exchanges.append(exchange)
+        self.severity.append(severity if severity is not None else bytearray(self.length))
+        self.counts.append(counts or {c: array('H', bytes(2 * self.length)) for c in CATEGORIES})
+        return self._rows[exchange]
+
+    # ---------- 更新 ----------
+
+    def refresh(self, save=True):
+        """与存储同步：只重算新增、变化或删除的日期所在列，返回处理的天数"""
+        current = {d: self.store.version(d) for d in self.store.dates() if _DATE_PATTERN.match(d)}
+        changed = [d for d, version in current.items() if self.days.get(d) != version]
+        removed = [d for d in self.days if d not in current]
+        if not changed and not removed:
+            return 0
+        for date_str in removed:
+            self._clear(self._column(date_str))
+        for date_str in changed:
+            day = self.store.read(date_str)
+            self._fill(self._column(date_str), day['alerts'] if day else [])
+        self.days = current
+        if save:
+            self.save()
+        return len(changed) + len(removed)
+
+    def _column(self, date_str):
+        """日期 → 列号（必要时扩展日期轴）"""
+        ordinal = date.fromisoformat(date_str).toordinal()
+        if self.start is None:
+            self.start = ordinal
+        if ordinal < self.start:
+            pad = self.start - ordinal
+            for row, severity in enumerate(self.severity):
+                severity[:0] = bytes(pad)
+                for values in self.counts[row].values():
+                    values[:0] = array('H', bytes(2 * pad))
+            self.start, self.length = ordinal, self.length + pad
+        if ordinal >= self.start + self.length:
+            pad = ordinal - self.start - self.length + 1
+            for row, severity in enumerate(self.severity):
+                severity.extend(bytes(pad))
+                for values in self.counts[row].values():
+                    values.extend(array('H', bytes(2 * pad)))
+            self.length += pad
+        return ordinal - self.start
+
+    def _clear(self, col):
+        for row, severity in enumerate(self.severity):
+            severity[col] = 0
+            for values in self.counts[row].values():
+                values[col] = 0
+
+    def _fill(self, col, alerts):
+        self._clear(col)
+        for alert in collapse(alerts):
+            if not alert.exchange:
+                continue
+            row = self._rows.get(alert.exchange)
+            if row is None:
+                row = self._add_row(alert.exchange)
+            self.severity[row][col] = max(self.severity[row][col], _level(alert.severity))
+            values = self.counts[row].get(alert.category)
+            if values is not None:
+                values[col] = min(values[col] + 1, 0xFFFF)
+
+    def save(self):
+        header = {
+            'version': INDEX_VERSION,
+            'start': date.fromordinal(self.start).isoformat() if self.start else None,
+            'length': self.length,
+            'byteorder': sys.byteorder,
+            'categories': list(CATEGORIES),
+            'exchanges': self.exchanges,
+            'days': self.days,
+        }
+        body = bytearray()
+        for row, severity in enumerate(self.severity):
+            body += severity
+            for category in CATEGORIES:
+                body += self.counts[row][category].tobytes()
+        with write_lock(self.store.root):
+            atomic_write(self.path, json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                         + b'\n' + bytes(body))
+
+    # ---------- 读取 ----------
+
+    def offset(self, date_str):
+        """日期相对第 0 列的偏移（不扩展日期轴，可能超出 [0, length)）"""
+        return date.fromisoformat(date_str).toordinal() - (self.start or 0)
+
+    def date_of(self, col):
+        return date.fromordinal(self.start + col).isoformat()
+
+    def row(self, exchange):
+        """交易所的 (严重度行, {分类: 数量行})；没有记录时返回 None"""
+        row = self._rows.get(exchange)
+        return None if row is None else (self.severity[row], self.counts[row])
+
+    def query(self, date_from, date_to, exchanges=None, bucket=1):
+        """[date_from, date_to] 的矩阵切片，每 bucket 天聚合为一列
+
+        返回 {'dates': 各列起始日期, 'exchanges', 'levels', 'severity': 行 × 列, 'counts': {分类: 行 × 列}}；
+        没有数据的交易所 / 日期为 0
+        """
+        first = date.fromisoformat(date_from).toordinal()
+        last = date.fromisoformat(date_to).toordinal()
+        if last < first:
+            raise ValueError("from 不能晚于 to")
+        if bucket < 1:
+            raise ValueError("bucket 必须为正整数")
+        exchanges = list(self.exchanges) if exchanges is None else list(exchanges)
+        lo = first - (self.start or first)
+        hi = lo + last - first + 1
+        starts = range(0, hi - lo, bucket)
+        width = hi - lo
+
+        result = {
+            'dates': [date.fromordinal(first + i).isoformat() for i in starts],
+            'exchanges': exchanges,
+            'levels': list(ALERT_LEVELS),
+            'severity': [],
+            'counts': {category: [] for category in CATEGORIES},
+        }
+        empty_counts = array('H', [0])
+        for exchange in exchanges:
+            row = self._rows.get(exchange)
+            if row is None:
+                severity = bytes(width)
+                counts = {category: array('H', bytes(2 * width)) for category in CATEGORIES}
+            else:
+                severity = _window(self.severity[row], lo, hi, b'\0')
+                counts = {c: _window(v, lo, hi, empty_counts) for c, v in self.counts[row].items()}
+            if bucket == 1:
+                result['severity'].append(list(severity))
+                for category in CATEGORIES:
+                    result['counts'][category].append(counts[category].tolist())
+            else:
+                result['severity'].append([max(severity[i:i + bucket]) for i in starts])
+                for category in CATEGORIES:
+                    values = counts[category]
+                    result['counts'][category].append([sum(values[i:i + bucket]) for i in starts])
+        return result
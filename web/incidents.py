@@ -0,0 +1,188 @@
+"""
+事件聚类（近似重复检测）
+同一事件常被多次报道：X 与网页结果、多批次采集的重叠、FinTelegram 转载、连续多天的重复报道。
+这里把近似重复的警报归为同一事件（incident），界面和简报按事件展示。
+
+- 分词：中文按字、英文按词（统一小写、去标点），相邻两个词元组成 shingle
+- MinHash：32 维签名，两段文本签名相同位置相等的比例估计 Jaccard 相似度。
+  用单置换哈希（one permutation hashing）：每个 shingle 只算一次哈希，按高位分到 32 个桶、桶内取最小值，
+  空桶从右侧最近的非空桶借值（densification），开销与 shingle 数成正比
+- LSH：签名分为 16 段（每段 2 个值），段哈希加上交易所名作为桶键；新警报只需查 16 个桶，
+  与历史规模无关。命中同一事件的段数达到 MIN_VOTES（约对应 Jaccard ≥ 0.4）即视为同一事件
+- 事件ID 为该事件第一条警报的指纹（records.fingerprint），新数据写入后已有事件的 ID 不变
+- IncidentIndex 把全部历史的桶持久化在存储目录的 incidents.index，写入方增量刷新（与 fingerprints.py 相同）
+"""
+
+import json
+import re
+import zlib
+from collections import Counter
+from dataclasses import replace
+
+from atomic import atomic_write, write_lock
+from records import fingerprint
+from schema import ALERT_LEVELS
+
+NUM_PERM = 32
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIN_VOTES = 3
+
+INDEX_NAME = "incidents.index"
+INDEX_VERSION = 1
+
+_MASK = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15  # 乘法散列常数，打散 crc32 的高位
+_BIN_SHIFT = 64 - (NUM_PERM.bit_length() - 1)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_TOKENS = re.compile(r'[\u3400-\u9fff]|[a-z0-9]+')
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def shingles(text):
+    """文本 → shingle 集合（中文单字、英文单词为词元，相邻两个词元一组）"""
+    tokens = _TOKENS.findall(text.casefold())
+    if len(tokens) < 2:
+        return set(tokens)
+    return {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def signature(text):
+    """MinHash 签名（NUM_PERM 个整数）；没有可用词元时返回 None"""
+    items = shingles(text)
+    if not items:
+        return None
+    bins = [None] * NUM_PERM
+    for item in items:
+        h = (zlib.crc32(item.encode('utf-8')) * _MIX) & _MASK
+        i, value = h >> _BIN_SHIFT, h & _VALUE_MASK
+        if bins[i] is None or value < bins[i]:
+            bins[i] = value
+    # 空桶借用右侧最近的非空桶，借用距离计入取值，保证两段文本在同一位置借到同一来源时才相等
+    sig = []
+    for i in range(NUM_PERM):
+        for step in range(NUM_PERM):
+            value = bins[(i + step) % NUM_PERM]
+            if value is not None:
+                sig.append(value + (step << _BIN_SHIFT))
+                break
+    return tuple(sig)
+
+
+def similarity(sig_a, sig_b):
+    """由签名估计 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def alert_text(alert):
+    return f"{alert.title} {alert.description}"
+
+
+def _band_keys(exchange, sig):
+    """签名 → 各段的桶键（含交易所，不同交易所的警报不会聚到一起）"""
+    prefix = exchange.casefold()
+    return [f"{zlib.crc32(f'{prefix}|{i}|{sig[i * ROWS:(i + 1) * ROWS]}'.encode('utf-8')):08x}{i:x}"
+            for i in range(BANDS)]
+
+
+class IncidentClusterer:
+    """内存中的 LSH 桶：桶键 → 事件ID"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def match(self, exchange, text):
+        """返回与文本近似重复的已有事件ID，没有则返回 None"""
+        sig = signature(text)
+        if sig is None:
+            return None
+        return self._vote(_band_keys(exchange, sig))
+
+    def _vote(self, keys):
+        votes = Counter(self.buckets[k] for k in keys if k in self.buckets)
+        if votes:
+            incident, count = votes.most_common(1)[0]
+            if count >= MIN_VOTES:
+                return incident
+        return None
+
+    def add(self, exchange, text, incident):
+        sig = signature(text)
+        if sig is not None:
+            for key in _band_keys(exchange, sig):
+                self.buckets.setdefault(key, incident)
+
+    def assign(self, alert):
+        """为警报确定事件ID（已有则沿用，否则匹配已有事件或以自身指纹开启新事件），并加入桶"""
+        incident = alert.incident
+        sig = signature(alert_text(alert))
+        keys = _band_keys(alert.exchange, sig) if sig is not None else []
+        if not incident:
+            incident = self._vote(keys) or fingerprint(alert)
+        for key in keys:
+            self.buckets.setdefault(key, incident)
+        return incident
+
+
+def incident_of(alert):
+    """警报的事件ID（尚未聚类的旧数据以指纹代替）"""
+    return alert.incident or fingerprint(alert)
+
+
+def collapse(alerts):
+    """按事件去重：每个事件保留严重度最高的一条（相同时取靠前的），保持原顺序"""
+    best = {}
+    for pos, alert in enumerate(alerts):
+        incident = incident_of(alert)
+        rank = _severity_rank(alert.severity)
+        if incident not in best or rank > best[incident][0]:
+            best[incident] = (rank, pos)
+    keep = {pos for _, pos in best.values()}
+    return [alert for pos, alert in enumerate(alerts) if pos in keep]
+
+
+def _severity_rank(severity):
+    return ALERT_LEVELS.index(severity) if severity in ALERT_LEVELS else 0
+
+
+class IncidentIndex(IncidentClusterer):
+    """全部历史的事件桶，持久化在 incidents.index"""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.path = store.root / INDEX_NAME
+        self.days = {}  # 日期 → 索引时的对象摘要
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.days, self.buckets = data['days'], data['buckets']
+        except (OSError, ValueError):
+            pass
+
+    def refresh(self):
+        """把新增或变化的日期加入桶（按日期顺序，保证事件ID取最早的警报），返回处理的天数"""
+        current = {d: self.store.digest(d) or "" for d in self.store.dates() if _DATE_PATTERN.match(d)}
+        changed = sorted(d for d, version in current.items() if self.days.get(d) != version)
+        if not changed and current.keys() == self.days.keys():
+            return 0
+        if any(d not in current for d in self.days) or (changed and self.days and changed[0] < max(self.days)):
+            # 历史被删改：桶只增不减，整体重建
+            self.buckets, changed = {}, sorted(current)
+        for date_str in changed:
+            day = self.store.read(date_str)
+            for alert in day['alerts'] if day else ():
+                self.assign(alert)
+        self.days = current
+        self.save()
+        return len(changed)
+
+    def save(self):
+        with write_lock(self.store.root):
+            data = {'version': INDEX_VERSION, 'days': self.days, 'buckets': self.buckets}
+            atomic_write(self.path, json.dumps(data, separators=(',', ':')))
+
+    def label(self, alerts):
+        """为尚无事件ID的警报聚类并写入 incident，返回新列表"""
+        return [alert if alert.incident else replace(alert, incident=self.assign(alert)) for alert in alerts]
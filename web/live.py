@@ -0,0 +1,62 @@
+"""
+实时推送 (Server-Sent Events)
+- 每个进程只有一个后台线程检查数据版本，所有 SSE 连接共享同一个通知
+- 空闲连接阻塞在条件变量上，不会各自定时访问数据层
+"""
+
+import json
+import threading
+import time
+
+
+class LiveFeed:
+    """数据版本变化广播器"""
+
+    def __init__(self, get_version, interval=5.0):
+        self.get_version = get_version
+        self.interval = interval
+        self.generation = 0
+        self._version = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """启动后台检查线程（首次有连接时调用，避免在 gunicorn 主进程 fork 前启动）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._version = self.get_version()
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                version = self.get_version()
+            except OSError:
+                continue
+            if version != self._version:
+                with self._cond:
+                    self._version = version
+                    self.generation += 1
+                    self._cond.notify_all()
+
+    def wait(self, generation, timeout):
+        """等待数据版本变化，返回最新的 generation（超时则原样返回）"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+def format_event(data, event=None, event_id=None):
+    """格式化一条 SSE 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    lines.append(f"data: {payload}")
+    return "\n".join(lines) + "\n\n"
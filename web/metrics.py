@@ -0,0 +1,237 @@
+"""
+请求计时与 Prometheus 指标
+- 每个请求的耗时拆分为 数据加载 / 计算 / 模板渲染 三部分
+- 统计 load_intel 调用次数、渲染缓存命中与未命中
+- gunicorn 多进程下，设置 METRICS_DIR 后各进程定期把快照写入该目录，/metrics 汇总所有进程
+- 进程退出时写入最后一次快照；已退出进程的快照并入 retired.json 后删除（gunicorn child_exit，
+  或汇总时发现进程已不存在），计数器不因 worker 重启而回退，也不会重复累加
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from atomic import atomic_write, write_lock
+
+# 请求耗时直方图的桶（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('load', 'compute', 'render')
+# 已退出进程累计的指标
+RETIRED_NAME = "retired.json"
+
+
+def merge_snapshots(snapshots):
+    """把多个快照逐项相加为一个"""
+    counters, histograms, phase_seconds = {}, {}, {}
+    for snap in snapshots:
+        for k, v in snap['counters'].items():
+            counters[k] = counters.get(k, 0) + v
+        for k, v in snap['phase_seconds'].items():
+            phase_seconds[k] = phase_seconds.get(k, 0.0) + v
+        for k, v in snap['histograms'].items():
+            hist = histograms.setdefault(k, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            hist['buckets'] = [a + b for a, b in zip(hist['buckets'], v['buckets'])]
+            hist['sum'] += v['sum']
+            hist['count'] += v['count']
+    return {'counters': counters, 'histograms': histograms, 'phase_seconds': phase_seconds}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """进程内指标（线程安全）"""
+
+    def __init__(self, snapshot_dir=None, snapshot_interval=10.0):
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._last_snapshot = 0.0
+        self._local = threading.local()
+        self.counters = {}
+        self.histograms = {}
+        self.phase_seconds = {}
+        self._flush_at_exit = False
+
+    # ---------- 单个请求 ----------
+
+    def start_request(self):
+        """请求开始：重置本线程的分段计时"""
+        self._local.phases = dict.fromkeys(PHASES, 0.0)
+        self._local.started = time.perf_counter()
+
+    def add_phase(self, phase, seconds):
+        """累加当前请求某一阶段的耗时（不在请求中时忽略）"""
+        phases = getattr(self._local, 'phases', None)
+        if phases is not None:
+            phases[phase] += seconds
+
+    def timed(self, phase):
+        """计时上下文管理器"""
+        return _PhaseTimer(self, phase)
+
+    def end_request(self, route, status):
+        """请求结束：记录总耗时和分段耗时，返回 (总耗时, 分段耗时)"""
+        phases = getattr(self._local, 'phases', None)
+        if phases is None:
+            return 0.0, {}
+        total = time.perf_counter() - self._local.started
+        phases['compute'] = max(0.0, total - phases['load'] - phases['render'])
+        self._local.phases = None
+
+        with self._lock:
+            hist = self.histograms.setdefault(route, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    hist['buckets'][i] += 1
+            hist['sum'] += total
+            hist['count'] += 1
+            for phase, seconds in phases.items():
+                key = f"{route}|{phase}"
+                self.phase_seconds[key] = self.phase_seconds.get(key, 0.0) + seconds
+            status_key = f"requests|{route}|{status}"
+            self.counters[status_key] = self.counters.get(status_key, 0) + 1
+        self._maybe_snapshot()
+        return total, phases
+
+    def inc(self, name, value=1):
+        """计数器加一"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # ---------- 多进程汇总 ----------
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {k: {'buckets': list(v['buckets']), 'sum': v['sum'], 'count': v['count']}
+                               for k, v in self.histograms.items()},
+                'phase_seconds': dict(self.phase_seconds),
+            }
+
+    def _maybe_snapshot(self, force=False):
+        if self.snapshot_dir is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_snapshot < self.snapshot_interval:
+            return
+        self._last_snapshot = now
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.snapshot_dir / f".{os.getpid()}.json.tmp"
+        tmp.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(tmp, self.snapshot_dir / f"{os.getpid()}.json")
+        # 写过快照的进程（即处理过请求的 worker）退出时再写一次；gunicorn 主进程不会留下快照
+        if not self._flush_at_exit:
+            self._flush_at_exit = True
+            atexit.register(self.flush)
+
+    def flush(self):
+        """立即写入本进程的快照（进程退出时调用，避免丢失上次快照之后的计数）"""
+        self._maybe_snapshot(force=True)
+
+    def retire(self, pid):
+        """把已退出进程的快照并入 retired.json 并删除（gunicorn child_exit 中调用）"""
+        if self.snapshot_dir is None:
+            return
+        filepath = self.snapshot_dir / f"{pid}.json"
+        with write_lock(self.snapshot_dir):
+            try:
+                snap = json.loads(filepath.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                filepath.unlink(missing_ok=True)
+                return
+            retired = self.snapshot_dir / RETIRED_NAME
+            try:
+                snapshots = [json.loads(retired.read_text(encoding='utf-8')), snap]
+            except (OSError, ValueError):
+                snapshots = [snap]
+            atomic_write(retired, json.dumps(merge_snapshots(snapshots)))
+            filepath.unlink()
+
+    def collect(self):
+        """汇总所有进程的快照（未设置 METRICS_DIR 时只有本进程）；顺带并入已不存在的进程的快照"""
+        if self.snapshot_dir is None:
+            return [self.snapshot()]
+        self._maybe_snapshot(force=True)
+        snapshots = []
+        with write_lock(self.snapshot_dir):
+            for filepath in self.snapshot_dir.glob("*.json"):
+                if filepath.stem.isdigit() and not _alive(int(filepath.stem)):
+                    self.retire(int(filepath.stem))
+            for filepath in self.snapshot_dir.glob("*.json"):
+                try:
+                    snapshots.append(json.loads(filepath.read_text(encoding='utf-8')))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    # ---------- Prometheus 文本格式 ----------
+
+    def render_prometheus(self, gauges=None):
+        """以 Prometheus 文本格式输出所有指标"""
+        merged = merge_snapshots(self.collect())
+        counters, histograms, phase_seconds = merged['counters'], merged['histograms'], merged['phase_seconds']
+
+        lines = [
+            "# HELP cex_http_request_duration_seconds 请求总耗时",
+            "# TYPE cex_http_request_duration_seconds histogram",
+        ]
+        for route, hist in sorted(histograms.items()):
+            for bound, count in zip(BUCKETS, hist['buckets']):
+                lines.append(f'cex_http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {count}')
+            lines.append(f'cex_http_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'cex_http_request_duration_seconds_sum{{route="{route}"}} {hist["sum"]:.6f}')
+            lines.append(f'cex_http_request_duration_seconds_count{{route="{route}"}} {hist["count"]}')
+
+        lines += [
+            "# HELP cex_http_request_phase_seconds_total 请求耗时拆分（load=数据加载, compute=计算, render=模板渲染）",
+            "# TYPE cex_http_request_phase_seconds_total counter",
+        ]
+        for key, seconds in sorted(phase_seconds.items()):
+            route, phase = key.split('|')
+            lines.append(f'cex_http_request_phase_seconds_total{{route="{route}",phase="{phase}"}} {seconds:.6f}')
+
+        lines += [
+            "# HELP cex_http_requests_total 请求数",
+            "# TYPE cex_http_requests_total counter",
+        ]
+        other = {}
+        for key, value in sorted(counters.items()):
+            if key.startswith("requests|"):
+                _, route, status = key.split('|')
+                lines.append(f'cex_http_requests_total{{route="{route}",status="{status}"}} {value}')
+            else:
+                other[key] = value
+        for name, value in sorted(other.items()):
+            lines.append(f"# TYPE cex_{name} counter")
+            lines.append(f"cex_{name} {value}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE cex_{name} gauge")
+            lines.append(f"cex_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _PhaseTimer:
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_phase(self.phase, time.perf_counter() - self.started)
+        return False
@@ -0,0 +1,168 @@
+"""
+增量数据迁移
+- 迁移按编号登记（@migration），每个迁移是对规范日报的幂等变换：日报 → 日报
+- 存储目录下的 migrations.manifest 记录每一天的内容摘要和已应用到的迁移编号；
+  摘要未变且已是最新编号的日期不再读取，日报被写入方改过（摘要变化）时重新应用全部迁移
+- 需要迁移的日期在进程池中并行处理：读取 → 依次应用未应用的迁移 → 写入新对象（按内容命名，无需加锁）
+- 所有结果在目录写锁内一次性替换清单（DayStore.swap）：期间被采集任务改过的日期跳过，下次运行再处理；
+  web 进程读到的要么是迁移前、要么是迁移后的日报，可在服务运行时执行
+- 尚未收入存储的旧 <日期>.json 在迁移时一并收入存储
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from functools import partial
+
+from atomic import atomic_write, write_lock
+from classifier import classify
+from schema import CATEGORIES, read_day
+from store import DayStore
+
+MANIFEST_NAME = "migrations.manifest"
+MANIFEST_VERSION = 1
+
+# 需要迁移的天数少于该值时不启动进程池
+PARALLEL_THRESHOLD = 32
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+MIGRATIONS = []  # [(编号, 说明, 函数)]，按编号升序
+
+
+def migration(number, description):
+    """登记迁移；编号必须递增，已发布的迁移不要修改（已应用的日期不会重跑）"""
+    def register(func):
+        if MIGRATIONS and number <= MIGRATIONS[-1][0]:
+            raise ValueError(f"迁移编号必须递增: {number}")
+        MIGRATIONS.append((number, description, func))
+        return func
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+# ---------- 迁移 ----------
+
+@migration(1, "补全缺失或无效的大类")
+def fill_categories(day):
+    alerts = []
+    for alert in day['alerts']:
+        if alert.category not in CATEGORIES:
+            result = classify(alert.title, alert.description)
+            alert = replace(alert, category=result.category, subcategory=alert.subcategory or result.subcategory)
+        alerts.append(alert)
+    return dict(day, alerts=alerts)
+
+
+@migration(2, "补全子类别（与现有大类一致时）")
+def fill_subcategories(day):
+    alerts = []
+    for alert in day['alerts']:
+        if not alert.subcategory:
+            result = classify(alert.title, alert.description)
+            if result.category == alert.category and result.subcategory:
+                alert = replace(alert, subcategory=result.subcategory)
+        alerts.append(alert)
+    return dict(day, alerts=alerts)
+
+
+# ---------- 执行 ----------
+
+class Manifest:
+    """日期 → [内容摘要, 已应用的迁移编号]"""
+
+    def __init__(self, root):
+        self.path = root / MANIFEST_NAME
+        self.files = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.files = data['files']
+        except (OSError, ValueError):
+            pass
+
+    def applied(self, date_str, digest):
+        """该摘要的内容已应用到的迁移编号（内容变化后为 0）"""
+        entry = self.files.get(date_str)
+        return entry[1] if entry and entry[0] == digest else 0
+
+    def save(self):
+        data = {'version': MANIFEST_VERSION, 'files': dict(sorted(self.files.items()))}
+        atomic_write(self.path, json.dumps(data, separators=(',', ':')))
+
+
+def _content_digest(store, date_str):
+    """存储中的日报用对象摘要，旧文件用文件内容的 sha256；返回 (摘要, 是否旧文件)"""
+    digest = store.digest(date_str)
+    if digest:
+        return digest, False
+    return hashlib.sha256(store.path(date_str).read_bytes()).hexdigest(), True
+
+
+def plan(store, manifest, target=None):
+    """列出需要迁移的日期，返回 [(日期, 文件路径, 摘要, 是否旧文件, 已应用编号)]"""
+    target = latest_version() if target is None else target
+    tasks = []
+    for date_str in sorted(d for d in store.dates() if _DATE_PATTERN.match(d)):
+        digest, legacy = _content_digest(store, date_str)
+        applied = manifest.applied(date_str, digest)
+        if legacy or applied < target:
+            tasks.append((date_str, str(store.path(date_str)), digest, legacy, applied))
+    return tasks
+
+
+def migrate_day(root, task, target, dry_run=False):
+    """在工作进程中迁移一天，返回 (日期, 原摘要, 新摘要, 是否旧文件, 修改的警报数)；文件已被替换时新摘要为 None"""
+    date_str, filepath, digest, legacy, applied = task
+    try:
+        day = read_day(filepath, date_str)
+    except FileNotFoundError:
+        # 规划后被采集任务发布了新版本（旧对象已删除），留待下次运行
+        return date_str, digest, None, legacy, 0
+    before = day['alerts']
+    for number, _, func in MIGRATIONS:
+        if applied < number <= target:
+            day = func(day)
+    touched = sum(a is not b for a, b in zip(before, day['alerts']))
+    if dry_run or (not legacy and not touched):
+        return date_str, digest, digest, legacy, touched
+    return date_str, digest, DayStore(root).put(day), legacy, touched
+
+
+def run(root, target=None, jobs=None, dry_run=False):
+    """把目录下的日报迁移到 target 编号（默认最新），返回 (检查天数, 迁移天数, 修改的警报数, 跳过的日期)"""
+    store = DayStore(root)
+    manifest = Manifest(store.root)
+    target = latest_version() if target is None else target
+    tasks = plan(store, manifest, target)
+    if not tasks:
+        return 0, 0, 0, []
+
+    jobs = jobs or os.cpu_count() or 1
+    worker = partial(migrate_day, str(store.root), target=target, dry_run=dry_run)
+    if jobs == 1 or len(tasks) < PARALLEL_THRESHOLD:
+        results = [worker(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(worker, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+    touched = sum(r[4] for r in results)
+    if dry_run:
+        return len(tasks), sum(1 for r in results if r[3] or r[4]), touched, []
+
+    changes = {d: (None if legacy else old, new) for d, old, new, legacy, _ in results
+               if new and (legacy or new != old)}
+    with write_lock(store.root):
+        swapped = set(store.swap(changes)) if changes else set()
+        skipped = sorted(d for d, _, new, _, _ in results if new is None or (d in changes and d not in swapped))
+        for date_str, old, new, _, _ in results:
+            if date_str in swapped or (new and date_str not in changes):
+                manifest.files[date_str] = [new, target]
+        manifest.save()
+    return len(tasks), len(swapped), touched, skipped
@@ -0,0 +1,177 @@
+"""
+警报记录
+- Alert: 不可变的 __slots__ 记录，交易所 / 严重度 / 分类等取值有限的字符串做驻留，同值共享同一对象
+- date（所属日报日期）是构造时给定的派生字段，需要不同日期时用 with_date() 得到新记录，不修改共享数据
+- 紧凑 JSON 编解码：记录按字段顺序编码为数组（无缩进、中文不转义），解析和存储开销都远小于带缩进的字典
+- fingerprint(): 同一天多次采集中识别同一条警报，用于合并（schema.merge_day）
+"""
+
+import hashlib
+import json
+import re
+import sys
+from dataclasses import dataclass, fields, replace
+
+DEFAULT_CATEGORY = 'dispute_compliance'
+
+# 取值有限、大量重复的字段，解码时驻留
+_INTERNED = ('exchange', 'category', 'subcategory', 'severity', 'source')
+# 存储为 JSON 数组、内存中为 tuple 的字段
+_TUPLE_FIELDS = ('tags', 'runs')
+
+
+@dataclass(frozen=True, slots=True)
+class Alert:
+    """警报记录（只读）"""
+    exchange: str = ""
+    category: str = DEFAULT_CATEGORY  # security_attack, dispute_compliance, operational_risk
+    subcategory: str = ""
+    severity: str = ""  # critical, high, medium, low
+    title: str = ""
+    description: str = ""
+    event_date: str = ""
+    source: str = ""
+    url: str = ""
+    discovered_at: str = ""
+    tags: tuple = ()
+    id: str = ""
+    last_seen: str = ""  # 最后一次采集到的时间（首次发现时间为 discovered_at）
+    runs: tuple = ()  # 采集到该警报的批次（日报 runs 列表的下标）
+    incident: str = ""  # 所属事件（近似重复的警报共用，见 incidents.py）
+    extra: tuple = ()  # 未知字段 ((键, 值), ...)，原样保留
+    date: str = ""  # 所属日报日期，不写入存储
+
+    def __post_init__(self):
+        for name in _INTERNED:
+            value = getattr(self, name)
+            if value.__class__ is str:
+                object.__setattr__(self, name, sys.intern(value))
+        for name in _TUPLE_FIELDS:
+            value = getattr(self, name)
+            if value.__class__ is not tuple:
+                object.__setattr__(self, name, tuple(value or ()))
+
+    @classmethod
+    def from_dict(cls, data, date=""):
+        """由字典构造；None 视为缺省，未知字段放入 extra"""
+        known, extra = {}, []
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                if value is not None:
+                    known[key] = value
+            elif key != 'date':
+                extra.append((key, value))
+        return cls(**known, extra=tuple(extra), date=date or data.get('date') or "")
+
+    def to_row(self):
+        """按字段顺序编码为数组（不含 date；尾部的空 extra 省略）"""
+        row = [getattr(self, name) for name in STORED_FIELDS]
+        for i in _TUPLE_POSITIONS:
+            row[i] = list(row[i])
+        if self.extra:
+            row.append([list(pair) for pair in self.extra])
+        return row
+
+    def to_dict(self, with_date=True):
+        """转换为字典（JSON API / 兼容旧代码），省略空字段"""
+        data = {name: getattr(self, name) for name in STORED_FIELDS if getattr(self, name)}
+        for name in _TUPLE_FIELDS:
+            if name in data:
+                data[name] = list(data[name])
+        data.update(self.extra)
+        if with_date and self.date:
+            data['date'] = self.date
+        return data
+
+    def with_date(self, date):
+        """返回所属日期为 date 的新记录"""
+        return replace(self, date=date)
+
+    def get(self, name, default=None):
+        """兼容字典读取：字段为空或不存在时返回 default"""
+        if name in _FIELD_SET or name == 'date':
+            value = getattr(self, name)
+        else:
+            value = dict(self.extra).get(name)
+        return value if value not in (None, "", ()) else default
+
+
+STORED_FIELDS = tuple(f.name for f in fields(Alert) if f.name not in ('extra', 'date'))
+_FIELD_SET = frozenset(STORED_FIELDS)
+_STORED_COUNT = len(STORED_FIELDS)
+_TUPLE_POSITIONS = tuple(STORED_FIELDS.index(name) for name in _TUPLE_FIELDS)
+_INTERNED_POSITIONS = tuple(STORED_FIELDS.index(name) for name in _INTERNED)
+# 全部字段（含 extra、date）的 slot 写入器，顺序与 to_row() + (extra, date) 一致
+_SLOT_SETTERS = tuple(getattr(Alert, f.name).__set__ for f in fields(Alert))
+# 各存储字段的默认值（JSON 形式），旧文件缺少新增字段时补齐
+_ROW_DEFAULTS = tuple([] if name in _TUPLE_FIELDS else f.default
+                      for name, f in zip(STORED_FIELDS, fields(Alert)))
+
+
+def _row_to_alert(row, date):
+    """解码热路径：绕过 dataclass 的 __init__，直接写入 slot"""
+    extra = tuple(tuple(pair) for pair in row.pop()) if len(row) > _STORED_COUNT else ()
+    for i in _INTERNED_POSITIONS:
+        if row[i].__class__ is str:
+            row[i] = sys.intern(row[i])
+    for i in _TUPLE_POSITIONS:
+        row[i] = tuple(row[i])
+    row += (extra, date)
+    alert = object.__new__(Alert)
+    for setter, value in zip(_SLOT_SETTERS, row):
+        setter(alert, value)
+    return alert
+
+
+def to_alert(alert, date=""):
+    """Alert / 字典 → Alert"""
+    if isinstance(alert, Alert):
+        return alert if not date or alert.date == date else alert.with_date(date)
+    return Alert.from_dict(alert, date)
+
+
+def dumps(obj):
+    """紧凑 JSON（无缩进、中文不转义）"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_alert(alert):
+    """单条警报 → 紧凑 JSON 数组文本"""
+    return dumps(alert.to_row())
+
+
+def decode_alert(text, date=""):
+    """encode_alert() 的逆操作"""
+    return _row_to_alert(json.loads(text), date)
+
+
+def encode_alerts(alerts):
+    """警报列表 → 行数组（可直接嵌入 JSON 文档）"""
+    return [alert.to_row() for alert in alerts]
+
+
+def decode_alerts(rows, date="", fields=STORED_FIELDS):
+    """行数组 → 警报列表；fields 为写入时的字段顺序，与当前不同时按字段名映射"""
+    fields = tuple(fields)
+    if fields == STORED_FIELDS:
+        return [_row_to_alert(row, date) for row in rows]
+    if fields == STORED_FIELDS[:len(fields)]:
+        # 旧文件只是缺少末尾新增的字段：补默认值后仍走快速路径
+        n, padding = len(fields), list(_ROW_DEFAULTS[len(fields):])
+        return [_row_to_alert(row[:n] + padding + row[n:], date) for row in rows]
+    alerts = []
+    for row in rows:
+        data = dict(zip(fields, row))
+        if len(row) > len(fields):
+            data.update(tuple(pair) for pair in row[len(fields)])
+        alerts.append(Alert.from_dict(data, date))
+    return alerts
+
+
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(alert):
+    """警报指纹：同一交易所的同一链接（无链接时为规范化后的标题）视为同一条警报"""
+    key = alert.url.strip() or _SPACES.sub(" ", alert.title).strip().casefold()
+    return hashlib.sha1(f"{alert.exchange.casefold()}\n{key}".encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,305 @@
+"""
+规范日报格式
+所有日报文件统一为一种带版本号的结构，警报只存一份（Alert 行数组），分类视图和统计在读取时计算。
+历史上的各种格式在读取时由 normalize() 转换：
+- cex_monitor 的 DailyIntel（items: IntelItem）
+- grok_cex 的 ExchangeIntel（exchanges 内含 x_posts / web_articles，alerts 为文字列表）
+- grok_cex_v2 的采集结果（all_alerts + categories）
+- daily_briefing 的日报（alerts + exchange_status + 文字 summary）
+- sync_data / sync_data_v2 的网站格式（alerts / key_alerts / categories 三份副本）
+同一天的多次采集（09:00 / 15:00 / 21:00）由 merge_day() 按警报指纹合并，不互相覆盖。
+
+磁盘格式:
+    {"schema": 1, "date": "YYYY-MM-DD", "collected_at": "...", "summary": {...},
+     "exchanges": [{"exchange": ..., "alert_level": ...}, ...],
+     "fields": [...], "alerts": [[...], ...],
+     "briefing": "...", "sources": [...], "fintelegram": [...], "meta": {...},
+     "runs": [{"at": ..., "source": ..., "alerts": n, "new": n, "seq": n}, ...]}   # 后五项可省略
+
+内存格式与磁盘格式相同，只是 alerts 为带日期的 Alert 列表。
+"""
+
+import json
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+from atomic import atomic_write
+from classifier import classify
+from records import (Alert, DEFAULT_CATEGORY, STORED_FIELDS, decode_alerts, dumps, encode_alert,
+                     encode_alerts, fingerprint)
+
+SCHEMA_VERSION = 1
+
+CATEGORIES = ('security_attack', 'dispute_compliance', 'operational_risk')
+
+# cex_monitor IntelItem 的分类 → 规范分类（原分类保留在 subcategory）
+CATEGORY_ALIASES = {
+    'security': 'security_attack',
+    'regulatory': 'dispute_compliance',
+    'scam': 'dispute_compliance',
+    'announcement': 'dispute_compliance',
+    'service': 'operational_risk',
+}
+
+# daily_briefing 的交易所状态 → 警报级别
+STATUS_LEVELS = {'normal': 'none', 'warning': 'medium', 'critical': 'critical'}
+
+# 警报级别由低到高（合并多次采集时取最高）
+ALERT_LEVELS = ('none', 'low', 'medium', 'high', 'critical')
+
+# 旧格式字段名 → 规范字段名
+_ALERT_RENAMES = {'source_name': 'source', 'content': 'description', 'timestamp': 'discovered_at'}
+
+# 旧格式中可由规范字段推导、转换时丢弃的顶层字段
+_DERIVED_KEYS = {'alerts', 'key_alerts', 'all_alerts', 'items', 'categories', 'exchange_status',
+                 'timestamp', 'discovered_at', 'total_alerts', 'total_exchanges', 'exchanges_monitored',
+                 'fintelegram_highlights'}
+_OPTIONAL_KEYS = ('briefing', 'sources', 'fintelegram', 'meta', 'runs')
+_CANONICAL_KEYS = {'schema', 'date', 'collected_at', 'summary', 'exchanges', 'fields', 'alerts', *_OPTIONAL_KEYS}
+
+
+def normalize_alert(raw, date="", discovered_at=""):
+    """任意旧格式的单条警报 → Alert"""
+    if isinstance(raw, Alert):
+        return raw.with_date(date) if date and raw.date != date else raw
+    if isinstance(raw, str):
+        return _text_alert(raw, date, discovered_at)
+
+    data = {k: v for k, v in raw.items() if k not in _ALERT_RENAMES and k != 'date' and v is not None}
+    for old, new in _ALERT_RENAMES.items():
+        if raw.get(old) and not data.get(new):
+            data[new] = raw[old]
+    # 旧采集格式中警报的 date 是事件日期
+    if raw.get('date') and not data.get('event_date'):
+        data['event_date'] = raw['date']
+    category = data.get('category')
+    if category in CATEGORY_ALIASES:
+        data['category'] = CATEGORY_ALIASES[category]
+        data.setdefault('subcategory', category)
+    elif not category:
+        # 缺少分类的旧警报按关键词归类（classifier.py）
+        result = classify(data.get('title', ""), data.get('description', ""))
+        data['category'] = result.category
+        if not data.get('subcategory'):
+            data['subcategory'] = result.subcategory
+    if discovered_at and not data.get('discovered_at'):
+        data['discovered_at'] = discovered_at
+    return Alert.from_dict(data, date)
+
+
+def _text_alert(text, date, discovered_at):
+    """grok_cex 的文字警报，如 "🚨 Binance: 严重安全问题" """
+    severity = 'critical' if text.startswith('🚨') else 'high'
+    head, sep, _ = text.lstrip('🚨⚠️ ').partition(':')
+    return Alert(exchange=head.strip() if sep else "", severity=severity, title=text,
+                 discovered_at=discovered_at, date=date)
+
+
+def _legacy_alerts(data):
+    """从旧格式中取出唯一的一份警报列表"""
+    for key in ('alerts', 'all_alerts', 'key_alerts', 'items'):
+        items = data.get(key)
+        if items and any(isinstance(item, dict) for item in items):
+            return [item for item in items if isinstance(item, dict)]
+    categories = data.get('categories')
+    if isinstance(categories, dict):
+        merged = [a for cat in categories.values() if isinstance(cat, dict) for a in cat.get('alerts', [])]
+        if merged:
+            return merged
+    return data.get('alerts') or []
+
+
+def _legacy_exchanges(data):
+    """交易所状态统一为 [{"exchange": ..., "alert_level": ...}]"""
+    exchanges = data.get('exchanges') or []
+    if exchanges and isinstance(exchanges[0], dict):
+        return [{'alert_level': 'none', **entry} for entry in exchanges]
+    status = data.get('exchange_status')
+    if isinstance(status, dict):
+        return [{'exchange': ex, 'alert_level': STATUS_LEVELS.get(info.get('status'), 'none'), **info}
+                for ex, info in status.items()]
+    return [{'exchange': ex, 'alert_level': 'none'} for ex in exchanges if isinstance(ex, str)]
+
+
+def summarize(alerts, exchanges, total_exchanges=None):
+    """根据警报计算日报统计"""
+    return {
+        'total_exchanges': total_exchanges if total_exchanges is not None else len(exchanges),
+        'total_alerts': len(alerts),
+        'alerted_exchanges': len({a.exchange for a in alerts if a.exchange}),
+        'critical_alerts': sum(1 for a in alerts if a.severity == 'critical'),
+        'high_alerts': sum(1 for a in alerts if a.severity == 'high'),
+    }
+
+
+def by_category(alerts):
+    """分类视图（读取时计算），返回 {分类: [Alert]}"""
+    views = {cat: [] for cat in CATEGORIES}
+    for alert in alerts:
+        views.get(alert.category, views[DEFAULT_CATEGORY]).append(alert)
+    return views
+
+
+def _level_rank(level):
+    return ALERT_LEVELS.index(level) if level in ALERT_LEVELS else 0
+
+
+def _union(first, second):
+    """按内容去重合并两个列表，保持先后顺序"""
+    seen, merged = set(), []
+    for item in (*first, *second):
+        key = dumps(item)
+        if key not in seen:
+            seen.add(key)
+            merged.append(item)
+    return merged
+
+
+def merge_day(existing, incoming, source="", seq=None):
+    """把一次采集（incoming）合并进当天已有的日报（existing，可为 None），返回新的日报
+
+    - 警报按 fingerprint() 去重：已有的警报用本次的非空字段更新（严重度取较高者），discovered_at 保留首次发现时间，
+      last_seen 更新为本次采集时间；本次没有采集到的警报保留不删
+    - runs 记录每次采集（时间、来源、警报数、新增数），警报的 runs 为采集到它的批次下标
+    - 同一批次（时间和来源相同）重复合并时复用原下标，结果不变
+    - seq 为本次发布的序号（store.upsert 传入）：有新增警报的批次记下 seq，SSE 按它排序推送
+    """
+    at = incoming.get('collected_at') or datetime.now().isoformat()
+    if existing is None:
+        existing = {**incoming, 'alerts': [], 'exchanges': [], 'runs': [],
+                    'sources': [], 'fintelegram': [], 'meta': {}, 'briefing': ""}
+    date = existing['date']
+
+    runs = list(existing.get('runs') or [])
+    run = next((i for i, r in enumerate(runs) if r.get('at') == at and r.get('source') == source), None)
+    if run is None:
+        run = len(runs)
+        runs.append({'at': at, 'source': source})
+
+    alerts = {fingerprint(a): a for a in existing['alerts']}
+    seen, new = set(), 0
+    for alert in incoming['alerts']:
+        key = fingerprint(alert)
+        if key in seen:
+            continue
+        seen.add(key)
+        old = alerts.get(key)
+        if old is None:
+            new += 1
+            alerts[key] = replace(alert, date=date, discovered_at=alert.discovered_at or at,
+                                  last_seen=at, runs=(run,))
+            continue
+        updates = {name: getattr(alert, name) for name in STORED_FIELDS if getattr(alert, name)}
+        # 交易所名和所属事件保持首次的值（指纹不区分大小写），严重度取两次中较高的
+        updates.update(exchange=old.exchange, incident=old.incident or alert.incident,
+                       severity=max(old.severity, alert.severity, key=_level_rank),
+                       discovered_at=min(filter(None, (old.discovered_at, alert.discovered_at)), default=at),
+                       last_seen=max(old.last_seen, at),
+                       runs=tuple(sorted({*old.runs, run})),
+                       extra=tuple({**dict(old.extra), **dict(alert.extra)}.items()))
+        alerts[key] = replace(old, **updates)
+    entry = {'at': at, 'source': source, 'alerts': len(seen), 'new': runs[run].get('new', new)}
+    if new and seq is not None:
+        entry['seq'] = seq
+    elif 'seq' in runs[run]:
+        entry['seq'] = runs[run]['seq']
+    runs[run] = entry
+
+    # 交易所状态取各次采集中的最高级别
+    exchanges = {e['exchange']: e for e in existing['exchanges']}
+    for entry in incoming['exchanges']:
+        old = exchanges.get(entry['exchange'], {})
+        level = max(old.get('alert_level', 'none'), entry.get('alert_level', 'none'), key=_level_rank)
+        exchanges[entry['exchange']] = {**old, **entry, 'alert_level': level}
+
+    merged = list(alerts.values())
+    total = max(existing['summary'].get('total_exchanges') or 0, incoming['summary'].get('total_exchanges') or 0)
+    return {
+        **existing,
+        'collected_at': max(existing.get('collected_at') or "", at),
+        'summary': summarize(merged, list(exchanges.values()), total or None),
+        'exchanges': list(exchanges.values()),
+        'alerts': merged,
+        'briefing': incoming.get('briefing') or existing.get('briefing', ""),
+        'sources': _union(existing.get('sources') or [], incoming.get('sources') or []),
+        'fintelegram': _union(existing.get('fintelegram') or [], incoming.get('fintelegram') or []),
+        'meta': {**existing.get('meta', {}), **incoming.get('meta', {})},
+        'runs': runs,
+    }
+
+
+def normalize(data, date=None):
+    """任意格式的日报 → 规范日报（内存格式）"""
+    if 'schema' in data:
+        return decode_day(data, date)
+
+    collected_at = data.get('collected_at') or data.get('timestamp') or data.get('discovered_at') or ""
+    date = date or data.get('date') or collected_at[:10]
+    seen = set()
+    alerts = []
+    for raw in _legacy_alerts(data):
+        alert = normalize_alert(raw, date, collected_at)
+        key = encode_alert(alert)
+        # alerts / key_alerts / categories 中的重复副本只保留一份
+        if key not in seen:
+            seen.add(key)
+            alerts.append(alert)
+    exchanges = _legacy_exchanges(data)
+
+    legacy_summary = data.get('summary') if isinstance(data.get('summary'), dict) else {}
+    total = legacy_summary.get('total_exchanges') or data.get('total_exchanges') or data.get('exchanges_monitored')
+    summary = summarize(alerts, exchanges, total)
+    if 'alerted_exchanges' in legacy_summary:
+        summary['alerted_exchanges'] = legacy_summary['alerted_exchanges']
+
+    # 其余字段（model、focus、period 等）原样放入 meta
+    meta = {k: v for k, v in data.items() if k not in _DERIVED_KEYS and k not in _CANONICAL_KEYS}
+    return {
+        'schema': SCHEMA_VERSION,
+        'date': date,
+        'collected_at': collected_at,
+        'summary': summary,
+        'exchanges': exchanges,
+        'alerts': alerts,
+        'briefing': data.get('summary') if isinstance(data.get('summary'), str) else data.get('briefing', ""),
+        'sources': data.get('sources') or [],
+        'fintelegram': data.get('fintelegram') or data.get('fintelegram_highlights') or [],
+        'meta': {**data.get('meta', {}), **meta},
+        'runs': data.get('runs') or [],
+    }
+
+
+def decode_day(data, date=None):
+    """磁盘上的规范日报 → 内存格式"""
+    if data.get('schema', 0) > SCHEMA_VERSION:
+        raise ValueError(f"不支持的日报格式版本: {data.get('schema')}")
+    date = date or data.get('date', "")
+    day = {key: data.get(key, default) for key, default in
+           (('briefing', ""), ('sources', []), ('fintelegram', []), ('meta', {}), ('runs', []))}
+    day.update({k: v for k, v in data.items() if k != 'fields'})
+    day['date'] = date
+    day['alerts'] = decode_alerts(data.get('alerts', []), date, data.get('fields', STORED_FIELDS))
+    return day
+
+
+def encode_day(day):
+    """内存格式 → 可直接 JSON 序列化的磁盘格式（省略空的可选字段）"""
+    data = {k: v for k, v in day.items() if k != 'alerts' and not (k in _OPTIONAL_KEYS and not v)}
+    data['schema'] = SCHEMA_VERSION
+    data['fields'] = list(STORED_FIELDS)
+    data['alerts'] = encode_alerts(day['alerts'])
+    return data
+
+
+def read_day(filepath, date=None):
+    """读取任意格式的日报文件，返回规范日报"""
+    filepath = Path(filepath)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return normalize(data, date)
+
+
+def write_day(filepath, day):
+    """以紧凑格式原子写入规范日报（读取方不会看到半个文件）"""
+    return atomic_write(filepath, dumps(encode_day(day)))
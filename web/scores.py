@@ -0,0 +1,239 @@
+"""
+交易所风险评分
+满分 100，按警报严重度扣分（严重 -25、高危 -15、中等 -5、低危 -2，沿用旧版 app_old.analyze_30_days），
+同一天同一事件只扣一次（incidents.collapse）。
+
+- 每个交易所存一条按天排列的累计扣分数组 totals[ex][i] = 第 i 天之前的扣分合计，
+  任意窗口 [a, b] 的扣分 = totals[b + 1] - totals[a]，读取为 O(1)
+- 衰减评分：半衰期 h 天，第 t 天的衰减扣分 E[t] = E[t-1]·λ + d[t]（λ = 0.5^(1/h)），
+  窗口 W 天内的衰减扣分 = E[t] - λ^W·E[t-W]，同样 O(1)；各半衰期的 E 序列首次使用时计算并缓存在内存中
+- 每个日报对各交易所各天的扣分（contrib）随索引保存，日报变化时先减去旧值再加上新值；
+  新的一天或当天再次采集只改动数组末尾，与历史长度无关
+- 历史汇总文件（historical-2025 等）合并为一个来源，按事件日期计入；各文件中同一交易所同一天的事件只计一次
+- 持久化在存储目录的 scores.index，写入方在 upsert 后刷新（与 fingerprints.py / incidents.py 相同）
+"""
+
+import json
+import re
+from datetime import date
+
+from atomic import atomic_write, write_lock
+from incidents import collapse
+
+INDEX_NAME = "scores.index"
+INDEX_VERSION = 1
+
+FULL_SCORE = 100
+DEDUCTIONS = {'critical': 25, 'high': 15, 'medium': 5, 'low': 2}
+DEFAULT_WINDOW = 30
+
+# 历史汇总文件合并后的来源名
+HISTORICAL_SOURCE = "historical"
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _ordinal(value):
+    """YYYY-MM-DD（或只有年月的 YYYY-MM，记为当月 1 日）→ 序数；无法解析时返回 None"""
+    value = (value or "")[:10]
+    if len(value) == 7:
+        value += "-01"
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return None
+
+
+def score_status(score):
+    """评分 → 状态（与旧版一致：低于 60 为严重，低于 80 为警告）"""
+    if score < 60:
+        return 'critical'
+    if score < 80:
+        return 'warning'
+    return 'normal'
+
+
+def day_contrib(alerts, date_str):
+    """一天的警报 → {交易所: {日期: 扣分}}"""
+    contrib = {}
+    for alert in collapse(alerts):
+        points = DEDUCTIONS.get(alert.severity)
+        if points and alert.exchange:
+            by_date = contrib.setdefault(alert.exchange, {})
+            by_date[date_str] = by_date.get(date_str, 0) + points
+    return contrib
+
+
+def historical_contrib(days):
+    """历史汇总文件 → {交易所: {事件日期: 扣分}}；各文件中同一交易所同一天的事件视为同一事件，取最严重的一条"""
+    events = {}
+    for day in days:
+        for alert in day['alerts']:
+            ordinal = _ordinal(alert.event_date)
+            points = DEDUCTIONS.get(alert.severity)
+            if ordinal and points and alert.exchange:
+                key = (alert.exchange, ordinal)
+                events[key] = max(events.get(key, 0), points)
+    contrib = {}
+    for (exchange, ordinal), points in events.items():
+        contrib.setdefault(exchange, {})[date.fromordinal(ordinal).isoformat()] = points
+    return contrib
+
+
+class ScoreIndex:
+    """全部交易所的累计扣分数组"""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.root / INDEX_NAME
+        self.start = None   # 第 0 天的序数
+        self.length = 0     # 天数
+        self.days = {}      # 来源 → 索引时的版本
+        self.contrib = {}   # 来源 → {交易所: {日期: 扣分}}
+        self.totals = {}    # 交易所 → 累计扣分（length + 1 项）
+        self._decayed = {}  # (交易所, 半衰期) → 衰减扣分序列
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.start = _ordinal(data['start'])
+                self.length = data['length']
+                self.days, self.contrib, self.totals = data['days'], data['contrib'], data['totals']
+        except (OSError, ValueError):
+            pass
+
+    # ---------- 更新 ----------
+
+    def _versions(self):
+        """来源 → 当前版本（历史汇总文件合并为一个来源）"""
+        current, historical = {}, []
+        for name in self.store.dates():
+            if _DATE_PATTERN.match(name):
+                current[name] = self.store.version(name)
+            else:
+                historical.append(f"{name}={self.store.version(name)}")
+        if historical:
+            current[HISTORICAL_SOURCE] = ",".join(sorted(historical))
+        return current
+
+    def _read(self, source):
+        if source == HISTORICAL_SOURCE:
+            days = [self.store.read(n) for n in self.store.dates() if not _DATE_PATTERN.match(n)]
+            return historical_contrib(d for d in days if d)
+        day = self.store.read(source)
+        return day_contrib(day['alerts'], source) if day else {}
+
+    def refresh(self, save=True):
+        """与存储同步：只重新计算新增、变化或删除的来源，返回处理的来源数"""
+        current = self._versions()
+        changed = [s for s, version in current.items() if self.days.get(s) != version]
+        removed = [s for s in self.days if s not in current]
+        for source in removed:
+            self._apply(self.contrib.pop(source, {}), -1)
+        for source in changed:
+            self._apply(self.contrib.pop(source, {}), -1)
+            self.contrib[source] = self._read(source)
+            self._apply(self.contrib[source], 1)
+        if not changed and not removed:
+            return 0
+        self.days = current
+        self._decayed = {}
+        if save:
+            self.save()
+        return len(changed) + len(removed)
+
+    def _apply(self, contrib, sign):
+        for exchange, by_date in contrib.items():
+            for date_str, points in by_date.items():
+                ordinal = _ordinal(date_str)
+                self._extend(ordinal)
+                totals = self.totals.setdefault(exchange, [0] * (self.length + 1))
+                for i in range(ordinal - self.start + 1, self.length + 1):
+                    totals[i] += sign * points
+
+    def _extend(self, ordinal):
+        """把日期轴扩展到包含 ordinal"""
+        if self.start is None:
+            self.start, self.length = ordinal, 1
+        elif ordinal < self.start:
+            pad = self.start - ordinal
+            for totals in self.totals.values():
+                totals[:0] = [0] * pad
+            self.start, self.length = ordinal, self.length + pad
+        elif ordinal >= self.start + self.length:
+            pad = ordinal - self.start - self.length + 1
+            for totals in self.totals.values():
+                totals.extend([totals[-1]] * pad)
+            self.length += pad
+
+    def save(self):
+        with write_lock(self.store.root):
+            data = {
+                'version': INDEX_VERSION,
+                'start': date.fromordinal(self.start).isoformat() if self.start else None,
+                'length': self.length,
+                'days': self.days,
+                'contrib': self.contrib,
+                'totals': self.totals,
+            }
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    # ---------- 读取 ----------
+
+    def exchanges(self):
+        return sorted(self.totals)
+
+    def _cumulative(self, totals, ordinal):
+        """ordinal 当天及之前的扣分合计"""
+        return totals[min(max(ordinal - self.start + 1, 0), self.length)]
+
+    def _decay_series(self, exchange, half_life):
+        key = (exchange, half_life)
+        if key not in self._decayed:
+            rate = 0.5 ** (1 / half_life)
+            totals = self.totals[exchange]
+            series, value = [], 0.0
+            for i in range(self.length):
+                value = value * rate + (totals[i + 1] - totals[i])
+                series.append(value)
+            self._decayed[key] = series
+        return self._decayed[key]
+
+    def _decayed_at(self, exchange, half_life, ordinal):
+        """ordinal 当天的衰减扣分（全部历史）"""
+        offset = ordinal - self.start
+        if offset < 0:
+            return 0.0
+        series = self._decay_series(exchange, half_life)
+        if offset < self.length:
+            return series[offset]
+        return series[-1] * 0.5 ** ((offset - self.length + 1) / half_life)
+
+    def deduction(self, exchange, date_str, window=DEFAULT_WINDOW, half_life=None):
+        """截至 date_str 的扣分：window 为窗口天数（None 为全部历史），half_life 为衰减半衰期（天）"""
+        totals = self.totals.get(exchange)
+        ordinal = _ordinal(date_str)
+        if totals is None or ordinal is None:
+            return 0
+        if half_life:
+            value = self._decayed_at(exchange, half_life, ordinal)
+            if window:
+                value -= 0.5 ** (window / half_life) * self._decayed_at(exchange, half_life, ordinal - window)
+            return value
+        value = self._cumulative(totals, ordinal)
+        if window:
+            value -= self._cumulative(totals, ordinal - window)
+        return value
+
+    def score(self, exchange, date_str, window=DEFAULT_WINDOW, half_life=None):
+        """截至 date_str 的评分（0-100）"""
+        deduction = self.deduction(exchange, date_str, window, half_life)
+        return max(0, round(FULL_SCORE - deduction, 1))
+
+    def series(self, exchange, date_from, date_to, window=DEFAULT_WINDOW, half_life=None):
+        """[date_from, date_to] 每天的评分 [(日期, 评分)]"""
+        first, last = _ordinal(date_from), _ordinal(date_to)
+        if first is None or last is None:
+            raise ValueError("日期格式应为 YYYY-MM-DD")
+        return [(day.isoformat(), self.score(exchange, day.isoformat(), window, half_life))
+                for day in map(date.fromordinal, range(first, last + 1))]
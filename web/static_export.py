@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+静态站点导出
+把 Dashboard、警报列表、所有交易所页、所有日期页以及 JSON API 渲染到 site/，
+由 CDN 直接提供服务（访问控制在边缘完成），读流量不再经过 Python。
+
+增量构建：site/.export-manifest.json 记录每个页面依赖的输入及其数据版本
+（日期文件摘要、某交易所在某天的警报切片摘要、警报列表每一页的内容摘要等）。新的一天只会重建该日期页、
+当天涉及的交易所页、Dashboard 和内容有变化的警报列表页；渲染在进程池中并行执行。
+上次清单中有、本次已不再导出的页面（日期被删除、交易所移出名单、警报列表页数减少）会删除其输出文件。
+
+用法:
+    python static_export.py              # 增量导出到 ../site
+    python static_export.py --full       # 忽略清单，全量重建
+    python static_export.py --out DIR    # 导出到指定目录
+    python static_export.py --jobs 8     # 渲染进程数
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote
+
+import app as web
+from atomic import atomic_write
+
+DEFAULT_OUT_DIR = Path(__file__).parent.parent / "site"
+MANIFEST_NAME = ".export-manifest.json"
+MANIFEST_VERSION = 8
+
+# 页面数少于该值时不启动进程池
+PARALLEL_THRESHOLD = 32
+
+_digest_cache = {}
+
+
+def file_digest(date_str):
+    """日期文件内容摘要：存储中的日报直接用对象摘要，旧文件按 mtime/大小缓存"""
+    digest = web.day_store.digest(date_str)
+    if digest:
+        return digest[:16]
+    filepath = web.day_store.path(date_str)
+    stat = filepath.stat()
+    key = (date_str, stat.st_mtime_ns, stat.st_size)
+    if key not in _digest_cache:
+        _digest_cache[key] = hashlib.sha1(filepath.read_bytes()).hexdigest()[:16]
+    return _digest_cache[key]
+
+
+def slice_digests(index):
+    """每个交易所在每一天的警报切片摘要，返回 {交易所: {日期: 摘要}}"""
+    slices = {}
+    for pos in range(len(index)):
+        alert = index.item(pos)
+        slices.setdefault(alert.exchange, {}).setdefault(alert.date, []).append(index.encoded(pos))
+    return {
+        exchange: {
+            date_str: hashlib.sha1("\n".join(sorted(encoded)).encode('utf-8')).hexdigest()[:16]
+            for date_str, encoded in by_date.items()
+        }
+        for exchange, by_date in slices.items()
+    }
+
+
+def alert_pages(index):
+    """警报列表的每一页（沿分页游标）→ 该页内容摘要，返回 {URL 路径: 摘要}"""
+    pages = {}
+    for cursor, start, stop in index.pages(web.DEFAULT_PAGE_SIZE):
+        content = "\n".join(f"{index.date_of(pos)}|{index.encoded(pos)}" for pos in range(start, stop))
+        # 是否有下一页也影响页面内容（"下一页"链接）
+        content += f"\n{stop < len(index)}"
+        pages[web.static_alerts_path(cursor)] = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    return pages
+
+
+def score_digest(exchange):
+    """交易所页面评分曲线的摘要"""
+    score, series = web.get_exchange_scores(exchange)
+    return hashlib.sha1(repr((score, series)).encode('utf-8')).hexdigest()[:16]
+
+
+def incidents_digest(groups):
+    """关联事件组的摘要（组可能包含更早的日期，单看日期文件无法判断是否变化）"""
+    return hashlib.sha1(json.dumps(groups, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def plan_pages():
+    """列出所有待导出页面及其依赖，返回 {URL 路径: {输入键: 数据版本}}"""
+    all_dates = web.list_intel_dates()
+    recent = all_dates[:30]
+    index = web.get_alert_index()
+    slices = slice_digests(index)
+    exchanges = sorted(set(web.CER_LIVE_EXCHANGES) | set(web.get_exchange_timeline().exchanges()))
+    historical = [name for name in web.HISTORICAL_FILES if web.day_store.path(name)]
+
+    def files(date_list):
+        return {f"file:{d}": file_digest(d) for d in date_list}
+
+    pages = {
+        '/dashboard': {**files(all_dates[:web.HEATMAP_DAYS]), 'date_count': len(all_dates),
+                       'incidents': incidents_digest(web.get_recent_incident_groups())},
+        '/api/dates.json': {'dates': ','.join(recent)},
+        '/api/status.json': files(all_dates[:7]),
+        '/api/heatmap.json': files(all_dates[:web.HEATMAP_DAYS]),
+        '/api/incidents/correlated.json': {'incidents': incidents_digest(web.get_incident_groups())},
+        '/api/exchanges.json': {**files(all_dates), **files(historical)},
+    }
+    # 警报列表每页单独规划（侧栏为最近 7 天的交易所状态），可并行渲染，只重建内容有变化的页
+    for url_path, digest in (alert_pages(index) or {'/alerts/': ''}).items():
+        pages[url_path] = {'page': digest, **files(all_dates[:7])}
+    if all_dates:
+        pages['/api/snapshot.json'] = files(all_dates[:1])
+    for exchange in exchanges:
+        by_date = slices.get(exchange, {})
+        pages[f"/exchange/{exchange}"] = {f"slice:{d}": by_date[d] for d in recent if d in by_date}
+        # 当前状态取最新一期日报：最新日期变化时（即使该所当天没有警报）也要重建
+        if all_dates:
+            pages[f"/exchange/{exchange}"]['latest'] = all_dates[0]
+        # 交易所时间线并入了历史汇总文件
+        pages[f"/exchange/{exchange}"].update(files(historical))
+        # 评分曲线依赖更长的历史，按曲线内容判断是否需要重建
+        pages[f"/exchange/{exchange}"]['score'] = score_digest(exchange)
+        pages[f"/exchange/{exchange}"]['incidents'] = incidents_digest(web.get_correlated_incidents(exchange))
+        pages[f"/api/exchange/{exchange}.json"] = {**{f"slice:{d}": v for d, v in by_date.items()}, **files(historical)}
+    for date_str in all_dates:
+        pages[f"/date/{date_str}"] = files([date_str])
+    return pages
+
+
+def output_path(out_dir, url_path):
+    """URL 路径 → 输出文件（HTML 页面写为 <路径>/index.html）"""
+    relative = unquote(url_path).strip('/')
+    if url_path.endswith('.json'):
+        return out_dir / relative
+    return out_dir / relative / "index.html"
+
+
+def render_json(url_path):
+    """渲染静态 JSON API（分页接口导出为完整列表）"""
+    if url_path == '/api/dates.json':
+        return web.get_available_dates()
+    if url_path == '/api/status.json':
+        return web.get_all_exchange_status()
+    if url_path == '/api/heatmap.json':
+        return web.get_heatmap()
+    if url_path == '/api/exchanges.json':
+        return web.get_exchanges_bulk(web.CER_LIVE_EXCHANGES, limit=None)
+    if url_path == '/api/snapshot.json':
+        return web.get_snapshot(web.list_intel_dates()[0])
+    if url_path == '/api/incidents/correlated.json':
+        groups = web.get_incident_groups()
+        return {'groups': groups, 'group_count': len(groups)}
+    exchange = unquote(url_path[len('/api/exchange/'):-len('.json')])
+    alerts, _ = web.get_exchange_timeline().query(exchange, limit=None)
+    return {'exchange': exchange, 'alerts': [a.to_dict() for a in alerts], 'alert_count': len(alerts), 'next_cursor': None}
+
+
+def write_file(filepath, content):
+    """原子写入（目录由 CDN 直接提供服务，访问者不会看到写了一半的文件）"""
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(filepath, content)
+
+
+_client = None
+
+
+def _init_renderer():
+    """初始化渲染器（每个工作进程一次）"""
+    global _client
+    web.app.config['STATIC_EXPORT'] = True
+    _client = web.app.test_client()
+    with _client.session_transaction() as session:
+        session['authenticated'] = True
+
+
+def render_page(url_path, out_dir):
+    """渲染单个页面并写入文件，返回写入的文件数"""
+    if _client is None:
+        _init_renderer()
+    out_dir = Path(out_dir)
+
+    if url_path.endswith('.json'):
+        content = json.dumps(render_json(url_path), ensure_ascii=False, separators=(',', ':'))
+        write_file(output_path(out_dir, url_path), content.encode('utf-8'))
+        return 1
+
+    if url_path.startswith('/alerts/'):
+        # /alerts/<游标>/ → /alerts?cursor=<游标>
+        cursor = unquote(url_path[len('/alerts/'):]).strip('/')
+        response = _client.get('/alerts', query_string={'cursor': cursor} if cursor else None)
+    else:
+        response = _client.get(url_path)
+    if response.status_code != 200:
+        print(f"⚠️ 跳过 {url_path}: HTTP {response.status_code}")
+        return 0
+    write_file(output_path(out_dir, url_path), response.get_data())
+    return 1
+
+
+def remove_page(out_dir, url_path):
+    """删除页面的输出文件，并清理因此变空的目录；返回是否删除了文件"""
+    filepath = output_path(out_dir, url_path)
+    if out_dir.resolve() not in filepath.resolve().parents or not filepath.is_file():
+        return False
+    filepath.unlink()
+    parent = filepath.parent
+    while parent != out_dir and not any(parent.iterdir()):
+        parent.rmdir()
+        parent = parent.parent
+    return True
+
+
+def export_pages(url_paths, out_dir, jobs=None):
+    """渲染指定页面，页面较多时使用进程池并行"""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(url_paths) < PARALLEL_THRESHOLD:
+        return sum(render_page(url_path, out_dir) for url_path in url_paths)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_renderer) as pool:
+        chunksize = max(1, len(url_paths) // (jobs * 4))
+        return sum(pool.map(render_page, url_paths, [str(out_dir)] * len(url_paths), chunksize=chunksize))
+
+
+def export_site(out_dir=DEFAULT_OUT_DIR, full=False, jobs=None):
+    """导出静态站点，返回写入的文件数"""
+    out_dir = Path(out_dir)
+    manifest_file = out_dir / MANIFEST_NAME
+    manifest = {}
+    if manifest_file.exists():
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    # 清单版本不同或 --full 时全部重新渲染；删除多余页面总是按上次清单判断
+    previous = manifest.get('pages', {}) if manifest.get('version') == MANIFEST_VERSION and not full else {}
+
+    pages = plan_pages()
+    changed = [path for path, inputs in pages.items() if previous.get(path) != inputs]
+    stale = [path for path in manifest.get('pages', {}) if path not in pages]
+    print(f"📄 共 {len(pages)} 个页面，需要重新渲染 {len(changed)} 个，删除 {len(stale)} 个")
+
+    removed = sum(remove_page(out_dir, path) for path in stale)
+    if removed:
+        print(f"🗑️ 已删除 {removed} 个不再导出的页面")
+    written = export_pages(changed, out_dir, jobs=jobs)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write(manifest_file, json.dumps({'version': MANIFEST_VERSION, 'pages': pages},
+                                           ensure_ascii=False, separators=(',', ':')))
+    print(f"✅ 已写入 {written} 个文件 → {out_dir}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出静态站点")
+    parser.add_argument("--out", default=str(DEFAULT_OUT_DIR), help="输出目录 (默认 ../site)")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全量重建")
+    parser.add_argument("--jobs", type=int, help="渲染进程数 (默认 CPU 核数)")
+    args = parser.parse_args()
+    export_site(args.out, full=args.full, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
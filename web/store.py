@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+内容寻址的日报存储
+- objects/<前两位>/<sha256>.json：规范日报（紧凑 JSON），文件名即内容摘要，写入后不再修改
+- refs.json：日期 → 对象摘要的清单，以及 latest 指针；发布新的一天只需原子替换这个小文件
+- 其他位置（site/latest.json 等）用硬链接指向对象，不再复制
+- 清单中没有的日期回退到目录下旧的 <日期>.json 文件，可用 --import-legacy 一次性收入存储
+- 同一天的多次采集用 upsert() 合并进当天日报（schema.merge_day），被取代的旧对象随即删除，不保留每次采集的全量文件；
+  合并时为新警报标注所属事件（incidents.py），发布后更新各交易所的风险评分（scores.py）、风险矩阵（heatmap.py）
+  和跨交易所关联特征（correlation.py）
+- 所有写入为原子发布，清单的读-改-写和 gc 在目录写锁内进行（atomic.py）；读取不加锁
+
+用法:
+    python store.py --import-legacy     # 把旧的 <日期>.json 收入对象存储
+    python store.py --gc                # 删除不再被引用的对象
+    python store.py --cluster           # 为历史警报做近似重复聚类，写入事件ID
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+from atomic import atomic_write, fsync_dir, write_lock
+from cache import bump_generation, current_generation
+from correlation import CorrelationIndex
+from heatmap import SeverityMatrix
+from incidents import IncidentIndex
+from records import dumps
+from scores import ScoreIndex
+from schema import encode_day, merge_day, normalize, read_day
+
+REFS_NAME = "refs.json"
+OBJECTS_DIR = "objects"
+REFS_VERSION = 1
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class DayStore:
+    """日报对象存储"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._refs_cache = (None, None)
+
+    # ---------- 读取 ----------
+
+    def refs(self, fresh=False):
+        """读取清单 {'version', 'dates': {日期: 摘要}, 'latest': 日期}（按 inode/mtime 缓存）"""
+        filepath = self.root / REFS_NAME
+        try:
+            stat = filepath.stat()
+        except OSError:
+            return {'version': REFS_VERSION, 'dates': {}, 'latest': None}
+        # 清单总是整体替换，inode 变化即内容变化
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if fresh or self._refs_cache[0] != key:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                self._refs_cache = (key, json.load(f))
+        return self._refs_cache[1]
+
+    def object_path(self, digest):
+        return self.root / OBJECTS_DIR / digest[:2] / f"{digest}.json"
+
+    def legacy_files(self):
+        """尚未收入存储的旧日报文件"""
+        if not self.root.exists():
+            return []
+        return [f for f in self.root.glob("*.json") if f.name != REFS_NAME]
+
+    def dates(self):
+        """全部日期（含旧文件，按时间倒序）"""
+        names = set(self.refs()['dates'])
+        names.update(f.stem for f in self.legacy_files())
+        return sorted(names, reverse=True)
+
+    def latest(self):
+        refs = self.refs()
+        return refs.get('latest') or (max(refs['dates']) if refs['dates'] else None)
+
+    def digest(self, date_str):
+        """日期对应的对象摘要（旧文件返回 None）"""
+        return self.refs()['dates'].get(date_str)
+
+    def version(self, date_str):
+        """日报的内容版本：存储中为对象摘要，旧文件为 mtime/大小"""
+        digest = self.digest(date_str)
+        if digest:
+            return digest
+        stat = self.path(date_str).stat()
+        return f"{stat.st_mtime_ns:x}:{stat.st_size:x}"
+
+    def path(self, date_str):
+        """日期对应的文件：存储对象优先，其次旧文件；都没有时返回 None"""
+        digest = self.digest(date_str)
+        if digest:
+            return self.object_path(digest)
+        legacy = self.root / f"{date_str}.json"
+        return legacy if legacy.exists() else None
+
+    def read(self, date_str):
+        """读取规范日报；不存在时返回 None"""
+        filepath = self.path(date_str)
+        if filepath is None:
+            return None
+        try:
+            return read_day(filepath, date_str)
+        except FileNotFoundError:
+            # 读到旧清单后对象被 gc / 旧文件被收入存储：重新读取清单再试一次
+            self.refs(fresh=True)
+            filepath = self.path(date_str)
+            return read_day(filepath, date_str) if filepath else None
+
+    # ---------- 写入 ----------
+
+    def put(self, day):
+        """写入对象（内容相同的对象只存一份），返回摘要"""
+        content = dumps(encode_day(day)).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        filepath = self.object_path(digest)
+        if not filepath.exists():
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(filepath, content)
+        return digest
+
+    def publish(self, day):
+        """发布一天的日报：写入对象 → 原子替换清单 → 通知 web 进程；返回摘要"""
+        date_str = day['date']
+        # 对象按内容命名，可在锁外写入；清单的读-改-写必须互斥，否则并发发布会丢失对方的日期
+        digest = self.put(day)
+        with write_lock(self.root):
+            if not self.object_path(digest).exists():
+                # 同内容的旧对象可能刚被另一个写入方删除
+                self.put(day)
+            refs = self.refs(fresh=True)
+            previous = refs['dates'].get(date_str)
+            dates = dict(refs['dates'], **{date_str: digest})
+            latest = max(date_str, refs.get('latest') or date_str)
+            self._write_refs(dates, latest)
+            # 旧文件 / 被取代的对象不再被引用，删除以免两份数据不一致
+            legacy = self.root / f"{date_str}.json"
+            if legacy.exists():
+                legacy.unlink()
+            if previous and previous != digest and previous not in dates.values():
+                self.object_path(previous).unlink(missing_ok=True)
+            bump_generation(self.root)
+        return digest
+
+    def upsert(self, day, source=""):
+        """把一次采集合并进当天的日报并发布，返回合并后的日报
+
+        新警报按全部历史做近似重复聚类，写入所属事件ID（incidents.py）；
+        发布后增量更新风险评分（scores.py）、风险矩阵（heatmap.py）和关联特征（correlation.py）
+        """
+        with write_lock(self.root):
+            incidents = IncidentIndex(self)
+            incidents.refresh()
+            # 发布序号 = 本次发布后的代数（写锁内只增不减），SSE 按它推送晚到的警报
+            merged = merge_day(self.read(day['date']), day, source, seq=current_generation(self.root) + 1)
+            merged['alerts'] = incidents.label(merged['alerts'])
+            incidents.days[day['date']] = self.publish(merged)
+            incidents.save()
+            ScoreIndex(self).refresh()
+            SeverityMatrix(self).refresh()
+            CorrelationIndex(self).refresh()
+        return merged
+
+    def swap(self, changes):
+        """批量替换清单中的对象：changes 为 {日期: (期望的当前摘要, 新摘要)}，期望为 None 表示旧文件
+
+        只替换当前摘要与期望一致的日期（期间被写入方改过的日期跳过），清单只写一次；返回已替换的日期
+        """
+        with write_lock(self.root):
+            refs = self.refs(fresh=True)
+            dates = dict(refs['dates'])
+            swapped, superseded = [], set()
+            for date_str, (expected, digest) in sorted(changes.items()):
+                if dates.get(date_str) != expected or not self.object_path(digest).exists():
+                    continue
+                if expected is None and not (self.root / f"{date_str}.json").exists():
+                    continue
+                dates[date_str] = digest
+                swapped.append(date_str)
+                if expected and expected != digest:
+                    superseded.add(expected)
+            if not swapped:
+                return []
+            self._write_refs(dates, max(swapped + [refs.get('latest') or swapped[0]]))
+            for date_str in swapped:
+                (self.root / f"{date_str}.json").unlink(missing_ok=True)
+            for digest in superseded - set(dates.values()):
+                self.object_path(digest).unlink(missing_ok=True)
+            bump_generation(self.root)
+        return swapped
+
+    def _write_refs(self, dates, latest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        refs = {'version': REFS_VERSION, 'latest': latest, 'dates': dict(sorted(dates.items()))}
+        atomic_write(self.root / REFS_NAME, json.dumps(refs, indent=1))
+
+    def link(self, date_str, dest):
+        """让 dest 指向某天的对象（硬链接，跨文件系统时复制），原子替换"""
+        source = self.path(date_str)
+        if source is None:
+            raise FileNotFoundError(f"没有 {date_str} 的日报")
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+            with open(tmp, 'rb') as f:
+                os.fsync(f.fileno())
+        os.replace(tmp, dest)
+        fsync_dir(dest.parent)
+        return dest
+
+    # ---------- 维护 ----------
+
+    def import_legacy(self):
+        """把旧的 <日期>.json 转换为规范格式并收入存储，返回收入的日期"""
+        imported = []
+        for filepath in sorted(self.legacy_files()):
+            if not _DATE_PATTERN.match(filepath.stem):
+                continue
+            with open(filepath, 'r', encoding='utf-8') as f:
+                day = normalize(json.load(f), filepath.stem)
+            self.publish(day)
+            imported.append(filepath.stem)
+        return imported
+
+    def label_incidents(self):
+        """按日期顺序为全部历史警报重新聚类、写入事件ID，返回有变化的天数"""
+        changed = 0
+        with write_lock(self.root):
+            incidents = IncidentIndex(self)
+            incidents.buckets, incidents.days = {}, {}
+            for date_str in sorted(d for d in self.dates() if _DATE_PATTERN.match(d)):
+                day = self.read(date_str)
+                labeled = incidents.label(day['alerts'])
+                if labeled != day['alerts']:
+                    day['alerts'] = labeled
+                    self.publish(day)
+                    changed += 1
+                incidents.days[date_str] = self.digest(date_str) or ""
+            incidents.save()
+        return changed
+
+    def gc(self):
+        """删除清单中不再引用的对象，返回删除数量"""
+        removed = 0
+        # 锁内进行，避免删掉刚写入、清单尚未引用的对象
+        with write_lock(self.root):
+            referenced = set(self.refs(fresh=True)['dates'].values())
+            for filepath in (self.root / OBJECTS_DIR).glob("*/*.json"):
+                if filepath.stem not in referenced:
+                    filepath.unlink()
+                    removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日报对象存储维护")
+    parser.add_argument("--root", type=Path, default=Path(__file__).parent / "data" / "intelligence",
+                        help="存储目录 (默认 web/data/intelligence)")
+    parser.add_argument("--import-legacy", action="store_true", help="把旧的 <日期>.json 收入存储")
+    parser.add_argument("--cluster", action="store_true", help="为历史警报做近似重复聚类，写入事件ID")
+    parser.add_argument("--gc", action="store_true", help="删除不再被引用的对象")
+    args = parser.parse_args()
+
+    store = DayStore(args.root)
+    if args.import_legacy:
+        imported = store.import_legacy()
+        print(f"✅ 已收入 {len(imported)} 天日报")
+    if args.cluster:
+        print(f"🧩 已更新 {store.label_incidents()} 天日报的事件ID")
+    if args.gc:
+        print(f"🧹 已删除 {store.gc()} 个未引用对象")
+    refs = store.refs()
+    print(f"📦 {len(refs['dates'])} 天日报，最新: {store.latest()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+合成情报数据生成器（压测用）
+按当前同步格式（规范日报，见 schema.py）生成任意天数、交易所数量的每日情报，
+与生产相同经 DayStore 发布（objects/ + refs.json + .generation），压测测到的是实际的读取路径；
+--legacy 生成旧的 alerts + key_alerts + categories 三份副本格式的 <日期>.json 文件，用于前后对比。
+
+用法:
+    python synth_data.py --out /tmp/cex-synth --days 365 --exchanges 300 --alerts-per-day 40
+    python synth_data.py --out /tmp/cex-legacy --legacy
+"""
+
+import argparse
+import json
+import random
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from app import CER_LIVE_EXCHANGES
+from schema import normalize
+from store import DayStore
+
+CATEGORIES = {
+    'security_attack': ['fund_theft', 'system_intrusion', 'service_disruption', 'vulnerability_exploit'],
+    'dispute_compliance': ['regulatory_action', 'user_asset_issue', 'compliance_violation', 'public_dispute'],
+    'operational_risk': ['leadership_crisis', 'liquidity_crisis', 'technical_failure', 'financial_risk'],
+}
+CATEGORY_WEIGHTS = [0.2, 0.6, 0.2]
+SEVERITIES = ['critical', 'high', 'medium', 'low']
+SEVERITY_WEIGHTS = [0.05, 0.25, 0.4, 0.3]
+
+TITLE_TEMPLATES = {
+    'security_attack': ['{ex} 热钱包遭黑客攻击，{n}万美元被盗', '{ex} hot wallet drained, ${n}M stolen',
+                        '{ex} 遭受 DDoS 攻击导致服务中断', '{ex} API vulnerability exploited'],
+    'dispute_compliance': ['{ex} 被监管机构罚款 {n} 万美元', '{ex} license suspended by regulator',
+                           '{ex} 用户反映提现被冻结', '{ex} faces lawsuit over AML violations'],
+    'operational_risk': ['{ex} 系统宕机超过 {n} 小时', '{ex} CEO arrested in money laundering probe',
+                         '{ex} 大规模裁员传闻', '{ex} withdrawal suspended amid liquidity crisis'],
+}
+SOURCES = ['CoinDesk', 'The Block', 'Cointelegraph', 'FinTelegram', 'X/Twitter', 'Reuters', '律动BlockBeats']
+
+
+def exchange_names(count):
+    """前 30 个使用 CER.live 交易所名，其余生成合成名称"""
+    names = list(CER_LIVE_EXCHANGES[:count])
+    names += [f"Exchange-{i:04d}" for i in range(len(names), count)]
+    return names
+
+
+def make_alert(rng, exchange, day):
+    category = rng.choices(list(CATEGORIES), CATEGORY_WEIGHTS)[0]
+    title = rng.choice(TITLE_TEMPLATES[category]).format(ex=exchange, n=rng.randint(1, 500))
+    discovered = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.choice([9, 15, 21]),
+                                                                         seconds=rng.randint(0, 3599))
+    return {
+        'exchange': exchange,
+        'category': category,
+        'subcategory': rng.choice(CATEGORIES[category]),
+        'severity': rng.choices(SEVERITIES, SEVERITY_WEIGHTS)[0],
+        'title': title,
+        'description': f"{title}。" + "据多方消息来源报道，相关情况仍在进一步核实中。" * rng.randint(1, 4),
+        'event_date': (day - timedelta(days=rng.randint(0, 3))).isoformat(),
+        'source': rng.choice(SOURCES),
+        'url': f"https://news.example.com/{day.isoformat()}/{rng.getrandbits(48):012x}",
+        'discovered_at': discovered.isoformat(),
+        'tags': rng.sample(['news', 'twitter', 'regulatory', 'security', 'user_report'], 2),
+    }
+
+
+def make_day(rng, day, exchanges, alerts_per_day):
+    """生成一天的数据（旧版 sync_data_v2 写出的格式）"""
+    count = max(0, int(rng.gauss(alerts_per_day, alerts_per_day * 0.3)))
+    # 少数交易所占多数警报，更接近真实分布
+    weights = [1.0 / (i + 1) for i in range(len(exchanges))]
+    alerts = [make_alert(rng, ex, day) for ex in rng.choices(exchanges, weights, k=count)]
+    categories = {cat: [a for a in alerts if a['category'] == cat] for cat in CATEGORIES}
+    timestamp = datetime.combine(day, datetime.min.time()).replace(hour=21).isoformat()
+    return {
+        'date': day.isoformat(),
+        'timestamp': timestamp,
+        'collected_at': timestamp,
+        'discovered_at': timestamp,
+        'summary': {
+            'total_exchanges': len(exchanges),
+            'total_alerts': len(alerts),
+            'alerted_exchanges': len({a['exchange'] for a in alerts}),
+            'critical_alerts': len([a for a in alerts if a['severity'] == 'critical']),
+            'high_alerts': len([a for a in alerts if a['severity'] == 'high']),
+        },
+        'categories': {cat: {'count': len(items), 'alerts': items} for cat, items in categories.items()},
+        'alerts': alerts,
+        'key_alerts': alerts,
+        'exchanges': [],
+    }
+
+
+def generate(out_dir, days=365, exchanges=100, alerts_per_day=30, end=None, seed=42, legacy=False):
+    """生成数据集，返回写入的文件数"""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = exchange_names(exchanges)
+    end = end or date.today()
+    store = DayStore(out_dir)
+    for i in range(days):
+        day = end - timedelta(days=i)
+        data = make_day(rng, day, names, alerts_per_day)
+        if legacy:
+            with open(out_dir / f"{day.isoformat()}.json", 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            store.publish(normalize(data, day.isoformat()))
+    return days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成情报数据集")
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--days", type=int, default=365, help="天数 (默认 365)")
+    parser.add_argument("--exchanges", type=int, default=100, help="交易所数量 (默认 100)")
+    parser.add_argument("--alerts-per-day", type=int, default=30, help="每天平均警报数 (默认 30)")
+    parser.add_argument("--end", type=date.fromisoformat, help="最后一天 YYYY-MM-DD (默认今天)")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--legacy", action="store_true", help="生成旧的三份副本格式")
+    args = parser.parse_args()
+
+    count = generate(args.out, args.days, args.exchanges, args.alerts_per_day, args.end, args.seed, args.legacy)
+    print(f"✅ 已生成 {count} 天数据 → {args.out}")
+
+
+if __name__ == "__main__":
+    main()